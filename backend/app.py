@@ -16,24 +16,34 @@ Version: 1.0.0
 
 # Standard library
 import os
+import io
 import re
+import hmac
 import json
+import time
 import random
 import base64
 from pathlib import Path
 from datetime import datetime, timedelta
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 
 # Third-party
+import click
+import httpx
 import requests
 from dotenv import load_dotenv
+import openai
 from openai import OpenAI
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
+from twilio.base.exceptions import TwilioRestException
 
 # Flask core
 from flask import (
     Flask, render_template, request, jsonify,
-    redirect, url_for, session, flash
+    redirect, url_for, session, flash, abort, send_file,
+    Response, stream_with_context
 )
 from flask_cors import CORS
 from flask_wtf import CSRFProtect
@@ -53,7 +63,38 @@ from models.all_models import (
     Order, OrderItem, OrderStatusEnum,
     Payment, PaymentMethodEnum, PaymentStatusEnum,
     Wishlist, WishlistItem,
-    AISession, AIMessage, AIGeneration
+    AIMessage, AIGeneration, AIJob
+)
+
+# Local services
+from services.image_store import (
+    create_blob_store, media_url, is_valid_digest, parse_ref, decode_data_url
+)
+from services.image_backfill import BACKFILL_TARGETS, BackfillCheckpoint, backfill_table
+from services.derivatives import (
+    DerivativeCache, variant_url, derivatives_available,
+    DERIVATIVE_SIZES, THUMB_SMALL, THUMB_CARD
+)
+from services.admission import AdmissionController, AdmissionRejected
+from services.resilience import CircuitBreaker, CircuitOpen, resilient_call
+from services.generation_cache import GenerationCache, make_cache_key
+from services.mockup import render_mockup, mockups_available
+from services.prompt_specs import extract_specs, detect_vibe, SPEC_DEFAULTS
+from services.pricing import PriceGrid
+from services.ai_sessions import OpenSessionCache, assign_open_session, open_session_id
+from services.chat_memory import ConversationMemory
+from services.message_buffer import MessageBuffer
+from services.faq_index import FaqIndex, help_page_entries
+from services.mika_intents import (
+    classify_intent, INTENT_ORDER_STATUS, INTENT_GROUP_STATUS,
+    order_reply, no_orders_reply, order_not_found_reply, group_reply
+)
+from services.inventory import (
+    InventoryFiller, claim_inventory, inventory_levels, parse_hours_window
+)
+from services.jobs import (
+    JobRunner, JobQueueFull, JobNotFound, serialize_job, make_dedupe_key,
+    JOB_SUCCEEDED, JOB_TERMINAL_STATUSES
 )
 
 
@@ -104,23 +145,198 @@ print("[DEBUG] Static folder:", app.static_folder)
 API_KEY = os.getenv("OPENAI_API_KEY")
 print("[DEBUG] OPENAI_API_KEY present:", bool(API_KEY))
 
-if not API_KEY:
+# Point at an OpenAI-compatible server (e.g. tools/fake_openai.py for load tests)
+app.config["OPENAI_BASE_URL"] = os.getenv("OPENAI_BASE_URL") or None
+print("[DEBUG] OPENAI_BASE_URL:", app.config["OPENAI_BASE_URL"] or "default")
+
+if not API_KEY and app.config["OPENAI_BASE_URL"]:
+    # Local stand-ins don't check the key, but the client requires one
+    API_KEY = "sk-local"
+elif not API_KEY:
     raise RuntimeError(
         "OPENAI_API_KEY not found.\n"
         "Add it to backend/.env like:\n"
         "OPENAI_API_KEY=sk-xxxx"
     )
 
-OpenAI_Client = OpenAI(api_key=API_KEY)
+# Upstream timeouts / retries (seconds); retries are handled by resilient_call.
+# Image generations are billed, so they are only retried when the request
+# never reached OpenAI (see is_unprocessed_openai_error)
+app.config["OPENAI_IMAGE_TIMEOUT"] = float(os.getenv("OPENAI_IMAGE_TIMEOUT", "120"))
+app.config["OPENAI_IMAGE_RETRIES"] = int(os.getenv("OPENAI_IMAGE_RETRIES", "1"))
+app.config["OPENAI_CHAT_TIMEOUT"] = float(os.getenv("OPENAI_CHAT_TIMEOUT", "20"))
+app.config["OPENAI_CHAT_RETRIES"] = int(os.getenv("OPENAI_CHAT_RETRIES", "2"))
+app.config["TWILIO_TIMEOUT"] = float(os.getenv("TWILIO_TIMEOUT", "10"))
+app.config["BREAKER_FAILURE_THRESHOLD"] = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+app.config["BREAKER_RESET_SECONDS"] = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+OpenAI_Client = OpenAI(
+    api_key=API_KEY,
+    base_url=app.config["OPENAI_BASE_URL"],
+    timeout=app.config["OPENAI_CHAT_TIMEOUT"],
+    max_retries=0
+)
+
+# Circuit breakers per upstream
+openai_image_breaker = CircuitBreaker(
+    "openai-images",
+    failure_threshold=app.config["BREAKER_FAILURE_THRESHOLD"],
+    reset_timeout=app.config["BREAKER_RESET_SECONDS"]
+)
+openai_chat_breaker = CircuitBreaker(
+    "openai-chat",
+    failure_threshold=app.config["BREAKER_FAILURE_THRESHOLD"],
+    reset_timeout=app.config["BREAKER_RESET_SECONDS"]
+)
+twilio_breaker = CircuitBreaker(
+    "twilio",
+    failure_threshold=app.config["BREAKER_FAILURE_THRESHOLD"],
+    reset_timeout=app.config["BREAKER_RESET_SECONDS"]
+)
+
+# OpenAI Admission Control (rates are requests per minute)
+app.config["OPENAI_IMAGE_CONCURRENCY"] = int(os.getenv("OPENAI_IMAGE_CONCURRENCY", "4"))
+app.config["OPENAI_IMAGE_QUEUE"] = int(os.getenv("OPENAI_IMAGE_QUEUE", "16"))
+app.config["OPENAI_IMAGE_GLOBAL_RPM"] = float(os.getenv("OPENAI_IMAGE_GLOBAL_RPM", "30"))
+app.config["OPENAI_IMAGE_USER_RPM"] = float(os.getenv("OPENAI_IMAGE_USER_RPM", "4"))
+# Keep >= SMARTPICKS_MAX_COUNT, or SmartPicks batches fan out only this wide
+app.config["OPENAI_IMAGE_USER_CONCURRENCY"] = int(os.getenv("OPENAI_IMAGE_USER_CONCURRENCY", "4"))
+app.config["OPENAI_CHAT_CONCURRENCY"] = int(os.getenv("OPENAI_CHAT_CONCURRENCY", "8"))
+app.config["OPENAI_CHAT_QUEUE"] = int(os.getenv("OPENAI_CHAT_QUEUE", "32"))
+app.config["OPENAI_CHAT_GLOBAL_RPM"] = float(os.getenv("OPENAI_CHAT_GLOBAL_RPM", "300"))
+app.config["OPENAI_CHAT_USER_RPM"] = float(os.getenv("OPENAI_CHAT_USER_RPM", "20"))
+
+image_admission = AdmissionController(
+    "images",
+    max_concurrency=app.config["OPENAI_IMAGE_CONCURRENCY"],
+    per_user_concurrency=app.config["OPENAI_IMAGE_USER_CONCURRENCY"],
+    global_rate=app.config["OPENAI_IMAGE_GLOBAL_RPM"] / 60,
+    global_burst=max(1, app.config["OPENAI_IMAGE_CONCURRENCY"] * 2),
+    user_rate=app.config["OPENAI_IMAGE_USER_RPM"] / 60,
+    user_burst=4,
+    max_queue=app.config["OPENAI_IMAGE_QUEUE"],
+    max_wait=90
+)
+chat_admission = AdmissionController(
+    "chat",
+    max_concurrency=app.config["OPENAI_CHAT_CONCURRENCY"],
+    per_user_concurrency=1,
+    global_rate=app.config["OPENAI_CHAT_GLOBAL_RPM"] / 60,
+    global_burst=max(1, app.config["OPENAI_CHAT_CONCURRENCY"] * 2),
+    user_rate=app.config["OPENAI_CHAT_USER_RPM"] / 60,
+    user_burst=5,
+    max_queue=app.config["OPENAI_CHAT_QUEUE"],
+    max_wait=15
+)
 
 # Twilio Configuration
 twilio_client = Client(
     os.getenv("TWILIO_ACCOUNT_SID"),
-    os.getenv("TWILIO_AUTH_TOKEN")
+    os.getenv("TWILIO_AUTH_TOKEN"),
+    http_client=TwilioHttpClient(timeout=app.config["TWILIO_TIMEOUT"])
 )
 VERIFY_SID = os.getenv("TWILIO_VERIFY_SID")
 USE_TWILIO = os.getenv("USE_TWILIO", "0") == "1"
 
+# Image Storage Configuration
+app.config["IMAGE_STORE_BACKEND"] = os.getenv("IMAGE_STORE_BACKEND", "local")
+app.config["IMAGE_STORE_DIR"] = os.getenv("IMAGE_STORE_DIR", str(BACKEND_ROOT / "media"))
+
+image_store = create_blob_store(
+    app.config["IMAGE_STORE_BACKEND"],
+    root=app.config["IMAGE_STORE_DIR"]
+)
+print("[DEBUG] Image store:", app.config["IMAGE_STORE_BACKEND"], app.config["IMAGE_STORE_DIR"])
+
+# Image Derivatives (thumbnails) Configuration
+app.config["IMAGE_DERIVATIVE_DIR"] = os.getenv("IMAGE_DERIVATIVE_DIR", str(BACKEND_ROOT / "media_cache"))
+app.config["IMAGE_DERIVATIVE_FORMATS"] = os.getenv("IMAGE_DERIVATIVE_FORMATS", "webp").split(",")
+app.config["IMAGE_DERIVATIVES_EAGER"] = os.getenv("IMAGE_DERIVATIVES_EAGER", "1") == "1"
+
+image_derivatives = DerivativeCache(
+    image_store,
+    app.config["IMAGE_DERIVATIVE_DIR"],
+    formats=[f.strip().lower() for f in app.config["IMAGE_DERIVATIVE_FORMATS"] if f.strip()]
+)
+print("[DEBUG] Image derivatives:", image_derivatives.formats if derivatives_available() else "disabled (Pillow missing)")
+
+# Background AI Jobs Configuration
+app.config["AI_JOB_WORKERS"] = int(os.getenv("AI_JOB_WORKERS", "4"))
+app.config["AI_JOB_MAX_PENDING"] = int(os.getenv("AI_JOB_MAX_PENDING", "32"))
+app.config["AI_JOB_STALE_SECONDS"] = int(os.getenv("AI_JOB_STALE_SECONDS", "600"))
+app.config["AI_JOB_STREAM_TIMEOUT"] = int(os.getenv("AI_JOB_STREAM_TIMEOUT", "180"))
+app.config["AI_JOBS_RECOVER"] = os.getenv("AI_JOBS_RECOVER", "1") == "1"
+app.config["AI_JOBS_RECOVER_INTERVAL"] = int(os.getenv("AI_JOBS_RECOVER_INTERVAL", "60"))
+app.config["AI_GENERATE_TIMEOUT"] = int(os.getenv("AI_GENERATE_TIMEOUT", "180"))
+
+# /api/ai/metrics is internal: loopback requests, or this bearer token
+app.config["AI_METRICS_TOKEN"] = os.getenv("AI_METRICS_TOKEN", "")
+
+# Generation Cache Configuration (opt-in)
+app.config["AI_GENERATION_CACHE"] = os.getenv("AI_GENERATION_CACHE", "0") == "1"
+app.config["AI_GENERATION_CACHE_SIZE"] = int(os.getenv("AI_GENERATION_CACHE_SIZE", "512"))
+app.config["AI_GENERATION_CACHE_TTL"] = int(os.getenv("AI_GENERATION_CACHE_TTL", str(7 * 24 * 3600)))
+app.config["AI_GENERATION_CACHE_VARIANTS"] = int(os.getenv("AI_GENERATION_CACHE_VARIANTS", "1"))
+
+generation_cache = None
+if app.config["AI_GENERATION_CACHE"]:
+    generation_cache = GenerationCache(
+        max_entries=app.config["AI_GENERATION_CACHE_SIZE"],
+        ttl=app.config["AI_GENERATION_CACHE_TTL"],
+        pool_size=app.config["AI_GENERATION_CACHE_VARIANTS"]
+    )
+print("[DEBUG] Generation cache:", "enabled" if generation_cache else "disabled")
+
+# Local mockup renderer (needs Pillow): fast mode skips OpenAI entirely,
+# fallback serves a mockup while OpenAI is failing or saturated
+app.config["AI_FAST_MODE"] = os.getenv("AI_FAST_MODE", "0") == "1"
+app.config["AI_MOCKUP_FALLBACK"] = os.getenv("AI_MOCKUP_FALLBACK", "1") == "1"
+print("[DEBUG] Mockups:", "enabled" if mockups_available() else "disabled (Pillow missing)")
+
+# Progressive generation: a cheap draft render first, upgraded to final
+# quality in the background once the user favorites, renames or buys it
+app.config["AI_PROGRESSIVE"] = os.getenv("AI_PROGRESSIVE", "0") == "1"
+app.config["OPENAI_DRAFT_QUALITY"] = os.getenv("OPENAI_DRAFT_QUALITY", "low")
+app.config["OPENAI_FINAL_QUALITY"] = os.getenv("OPENAI_FINAL_QUALITY", "high")
+
+# Threads used to fan out image generations of one batch
+app.config["AI_IMAGE_FANOUT_WORKERS"] = int(os.getenv("AI_IMAGE_FANOUT_WORKERS", "4"))
+image_fanout = ThreadPoolExecutor(
+    max_workers=app.config["AI_IMAGE_FANOUT_WORKERS"],
+    thread_name_prefix="ai-image"
+)
+
+# Open AISession id per account, cached so generations and Mika chats
+# skip the "latest OPEN session" query
+app.config["AI_SESSION_CACHE_TTL"] = int(os.getenv("AI_SESSION_CACHE_TTL", "300"))
+ai_session_cache = OpenSessionCache(ttl=app.config["AI_SESSION_CACHE_TTL"])
+
+# Mika conversation memory: recent turns within a token budget, older
+# turns folded into a rolling summary in the background
+app.config["MIKA_HISTORY"] = os.getenv("MIKA_HISTORY", "1") == "1"
+app.config["MIKA_HISTORY_TOKENS"] = int(os.getenv("MIKA_HISTORY_TOKENS", "1200"))
+app.config["MIKA_HISTORY_MESSAGES"] = int(os.getenv("MIKA_HISTORY_MESSAGES", "12"))
+app.config["MIKA_SUMMARY_FOLD"] = int(os.getenv("MIKA_SUMMARY_FOLD", "6"))
+app.config["MIKA_SUMMARY_TOKENS"] = int(os.getenv("MIKA_SUMMARY_TOKENS", "200"))
+
+# Mika message persistence: queued and written in batches off the request path
+app.config["MIKA_WRITE_BEHIND"] = os.getenv("MIKA_WRITE_BEHIND", "1") == "1"
+app.config["MIKA_WRITE_BATCH"] = int(os.getenv("MIKA_WRITE_BATCH", "50"))
+app.config["MIKA_WRITE_DELAY_MS"] = int(os.getenv("MIKA_WRITE_DELAY_MS", "200"))
+
+# SmartPicks Warm Inventory Configuration
+app.config["AI_INVENTORY_FILLER"] = os.getenv("AI_INVENTORY_FILLER", "0") == "1"
+app.config["AI_INVENTORY_TARGET"] = int(os.getenv("AI_INVENTORY_TARGET", "4"))
+app.config["AI_INVENTORY_INTERVAL"] = int(os.getenv("AI_INVENTORY_INTERVAL", "300"))
+app.config["AI_INVENTORY_REFILL_HOURS"] = os.getenv("AI_INVENTORY_REFILL_HOURS", "")  # UTC, e.g. "0-7"
+
+job_runner = JobRunner(
+    app,
+    max_workers=app.config["AI_JOB_WORKERS"],
+    max_pending=app.config["AI_JOB_MAX_PENDING"],
+    stale_after=app.config["AI_JOB_STALE_SECONDS"]
+)
+
 
 # =============================================================================
 # 3. CONSTANTS - SHIPPING & FEES
@@ -352,6 +568,49 @@ PRODUCT_SIZES = {
 # Maximum product price (SAR)
 MAX_PRICE = 150
 
+# Every spec combination priced once at startup (served by /api/pricing/quote)
+PRICE_GRID = PriceGrid(BASE_PRICES, FORMULA_MULT, COVERAGE_MULT, FINISH_MULT, SKIN_MULT, MAX_PRICE)
+
+# Maximum specs per /api/pricing/quote call
+PRICING_QUOTE_MAX_ITEMS = 50
+
+# SmartPicks prompt styles by vibe (same wording as smartPicks.html)
+SMARTPICKS_VIBE_STYLES = {
+    "luxury": "Luxury high-end style, black and gold packaging, glass materials",
+    "cute": "Cute pastel kawaii style, soft pink colors, rounded shapes",
+    "minimal": "Ultra minimal style, clean white packaging, simple geometry",
+    "natural": "Natural organic style, kraft paper and bamboo packaging, earthy green tones",
+    "bold": "Bold edgy style, vivid red and black packaging, sharp angular shapes"
+}
+
+# Product wording used in design prompts
+SMARTPICKS_PRODUCT_NAMES = {
+    "LIPSTICK": "lipstick",
+    "MASCARA": "mascara",
+    "BLUSH": "blush compact",
+    "FOUNDATION": "foundation bottle",
+    "EYELINER": "eyeliner pen",
+    "EYESHADOW": "eyeshadow palette",
+    "HIGHLIGHTER": "highlighter",
+    "BRONZER": "bronzer",
+    "PRIMER": "primer bottle",
+    "SETTING_SPRAY": "setting spray"
+}
+
+# Maximum designs per SmartPicks batch
+SMARTPICKS_MAX_COUNT = 4
+
+# Canonical design prompt built from a structured spec (see build_design_prompt)
+DESIGN_PROMPT_TEMPLATE = (
+    "Professional product photo of a {product} with {formula} formula, "
+    "{coverage} coverage, {finish} finish, for {skin_type} skin. "
+    "Packaging: {packaging}. Studio lighting, white background, "
+    "commercial quality, high-end cosmetics photography."
+)
+
+# Maximum packaging description length in a spec (characters)
+PACKAGING_DESC_MAX_LENGTH = 300
+
 # =============================================================================
 # 6. HELPER FUNCTIONS - DATABASE
 # =============================================================================
@@ -740,17 +999,7 @@ def generate_product_name(packaging_desc=None, product_type=None, finish=None):
     }
 
     # Detect vibe from description
-    vibe = "minimal"  # Default vibe
-    desc = (packaging_desc or "").lower()
-
-    if any(word in desc for word in ["luxury", "gold", "elegant", "premium", "black"]):
-        vibe = "luxury"
-    elif any(word in desc for word in ["cute", "pink", "heart", "kawaii", "pastel"]):
-        vibe = "cute"
-    elif any(word in desc for word in ["natural", "organic", "green", "eco"]):
-        vibe = "natural"
-    elif any(word in desc for word in ["bold", "dark", "edgy", "red", "strong"]):
-        vibe = "bold"
+    vibe = detect_vibe(packaging_desc, default="minimal")
 
     # Select random words from appropriate lists
     vibe_list = vibe_words.get(vibe, vibe_words["minimal"])
@@ -1029,7 +1278,7 @@ def cart_page():
     for product_id, cart_item in cart.items():
         try:
             # Try to get product from database for image
-            product = Product.query.filter_by(id=product_id).first()
+            product = Product.query_with_image().filter_by(id=product_id).first()
 
             if product:
                 # Product found in database
@@ -1038,7 +1287,8 @@ def cart_page():
                     "name": cart_item.get("name") or product.name,
                     "price": cart_item.get("price") or float(product.price_sar or 0),
                     "qty": cart_item.get("qty", 1),
-                    "image": product.image_primary if product.image_primary else None,
+                    "image": media_url(product.image_primary),
+                    "thumb": variant_url(product.image_primary, THUMB_CARD),
                 }
             else:
                 # Product not in database, use cart data only
@@ -1048,6 +1298,7 @@ def cart_page():
                     "price": cart_item.get("price", 0),
                     "qty": cart_item.get("qty", 1),
                     "image": None,
+                    "thumb": None,
                 }
                 print(f"[CART] Product {product_id} not found in DB")
 
@@ -1062,6 +1313,7 @@ def cart_page():
                 "price": cart_item.get("price", 0),
                 "qty": cart_item.get("qty", 1),
                 "image": None,
+                "thumb": None,
             })
 
     # Calculate totals
@@ -1236,7 +1488,54 @@ def logout():
 # =============================================================================
 
 # -----------------------------------------------------------------------------
-# 15.1 Phone Login Page
+# 15.1 Twilio Verify Helpers
+# -----------------------------------------------------------------------------
+
+def is_transient_twilio_error(error):
+    """Network errors, 429 and 5xx; 4xx means bad phone/code, not an outage."""
+    if isinstance(error, TwilioRestException):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, requests.RequestException)
+
+
+def twilio_send_otp(phone):
+    """
+    Send an SMS verification code via Twilio Verify.
+    Not retried: a retry could send the user a second SMS.
+    
+    Raises:
+        CircuitOpen: Twilio is failing; caller shows its error flash
+    """
+    return resilient_call(
+        lambda timeout: twilio_client.verify.v2.services(VERIFY_SID).verifications.create(
+            to=phone,
+            channel="sms"
+        ),
+        twilio_breaker,
+        is_transient=is_transient_twilio_error
+    )
+
+
+def twilio_check_otp(phone, code):
+    """
+    Check a verification code via Twilio Verify.
+    
+    Returns:
+        str: Verification status ("approved", "pending", ...)
+    """
+    check = resilient_call(
+        lambda timeout: twilio_client.verify.v2.services(VERIFY_SID).verification_checks.create(
+            to=phone,
+            code=code
+        ),
+        twilio_breaker,
+        is_transient=is_transient_twilio_error
+    )
+    return check.status
+
+
+# -----------------------------------------------------------------------------
+# 15.2 Phone Login Page
 # -----------------------------------------------------------------------------
 
 @app.get("/phone_login")
@@ -1251,7 +1550,7 @@ def phone_login():
 
 
 # -----------------------------------------------------------------------------
-# 15.2 Verify Page
+# 15.3 Verify Page
 # -----------------------------------------------------------------------------
 
 @app.get("/verify")
@@ -1273,7 +1572,7 @@ def verify_page():
 
 
 # -----------------------------------------------------------------------------
-# 15.3 Send OTP
+# 15.4 Send OTP
 # -----------------------------------------------------------------------------
 
 @csrf.exempt
@@ -1328,10 +1627,7 @@ def send_otp():
 
     # Send OTP via Twilio
     try:
-        twilio_client.verify.v2.services(VERIFY_SID).verifications.create(
-            to=phone_full,
-            channel="sms"
-        )
+        twilio_send_otp(phone_full)
         flash("OTP sent via SMS", "success")
         return redirect(url_for("verify_page"))
     except Exception as e:
@@ -1341,7 +1637,7 @@ def send_otp():
 
 
 # -----------------------------------------------------------------------------
-# 15.4 Verify OTP
+# 15.5 Verify OTP
 # -----------------------------------------------------------------------------
 
 @csrf.exempt
@@ -1370,11 +1666,8 @@ def verify_submit():
     try:
         if USE_TWILIO:
             # Production: Verify with Twilio
-            check = twilio_client.verify.v2.services(VERIFY_SID).verification_checks.create(
-                to=phone_full,
-                code=code
-            )
-            if check.status != "approved":
+            status = twilio_check_otp(phone_full, code)
+            if status != "approved":
                 flash("Incorrect OTP code", "error")
                 return redirect(url_for("verify_page"))
         else:
@@ -1413,7 +1706,7 @@ def verify_submit():
 
 
 # -----------------------------------------------------------------------------
-# 15.5 Resend OTP
+# 15.6 Resend OTP
 # -----------------------------------------------------------------------------
 
 @csrf.exempt
@@ -1432,10 +1725,7 @@ def resend_otp():
     try:
         if USE_TWILIO:
             # Production: Send via Twilio
-            twilio_client.verify.v2.services(VERIFY_SID).verifications.create(
-                to=phone_full,
-                channel="sms"
-            )
+            twilio_send_otp(phone_full)
             flash("A new OTP has been sent.", "success")
         else:
             # Dev mode: Generate random code
@@ -1505,10 +1795,7 @@ def forgot_password_submit():
     try:
         if USE_TWILIO:
             # Production: Send via Twilio
-            twilio_client.verify.v2.services(VERIFY_SID).verifications.create(
-                to=user.phone_number,
-                channel="sms"
-            )
+            twilio_send_otp(user.phone_number)
             flash("Verification code sent to your phone.", "success")
         else:
             # Dev mode: Generate random code
@@ -1579,11 +1866,8 @@ def verify_reset_submit():
     try:
         if USE_TWILIO:
             # Production: Verify with Twilio
-            check = twilio_client.verify.v2.services(VERIFY_SID).verification_checks.create(
-                to=phone,
-                code=code
-            )
-            if check.status != "approved":
+            status = twilio_check_otp(phone, code)
+            if status != "approved":
                 flash("Incorrect verification code. Please try again.", "error")
                 return redirect(url_for("verify_reset"))
         else:
@@ -1623,10 +1907,7 @@ def resend_reset_otp():
     
     try:
         if USE_TWILIO:
-            twilio_client.verify.v2.services(VERIFY_SID).verifications.create(
-                to=phone,
-                channel="sms"
-            )
+            twilio_send_otp(phone)
         else:
             otp = f"{random.randint(0, 999999):06d}"
             session["reset_otp"] = otp
@@ -1920,6 +2201,11 @@ def cart_add():
         }
         print(f"[CART] Added new item: {product_id}")
 
+        # Draft AI designs get their final-quality render once their owner buys them
+        user_id = session.get("user_id")
+        if user_id:
+            schedule_design_upgrade(product_id, user_id)
+
     # Save cart and calculate summary
     save_cart(cart)
     summary = calculate_cart_summary(cart)
@@ -2074,223 +2360,522 @@ def cart_count():
 # 18.1 Generate AI Packaging
 # -----------------------------------------------------------------------------
 
-@csrf.exempt
-@app.route("/ai/generate", methods=["POST"])
-def ai_generate_packaging():
+def admission_rejected_response(error):
     """
-    Generate AI packaging design using gpt-image-1.
+    Build the 429 response for a request refused by admission control.
     
-    Accepts JSON with:
-        - prompt: Design prompt text (required)
-        - context: Optional context (e.g., "custom-packaging")
-        - vibe: Optional style (e.g., "luxury", "cute")
+    Args:
+        error: AdmissionRejected
     
     Returns:
-        JSON: {ok, image_url, product: {id, name, price_sar, size}}
+        tuple: (Response, 429) with a Retry-After header
+    """
+    response = jsonify({
+        "ok": False,
+        "error": "RATE_LIMITED",
+        "reason": error.reason,
+        "retry_after": error.retry_after,
+        "message": "Too many AI requests right now, please try again shortly"
+    })
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, 429
+
+
+def is_transient_openai_error(error):
+    """Timeouts, connection errors, 429 and 5xx are worth a retry."""
+    return isinstance(error, (
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.RateLimitError,
+        openai.InternalServerError
+    ))
+
+
+def is_unprocessed_openai_error(error):
     """
-    try:
-        data = request.get_json(silent=True) or {}
-        prompt_raw = (data.get("prompt") or "").strip()
+    Errors where OpenAI never processed the request: the connection could
+    not be opened, or 429. Safe to retry for billed calls (images); a read
+    timeout is not - the image may have been generated and charged.
+    """
+    if isinstance(error, openai.RateLimitError):
+        return True
+    return isinstance(error, openai.APIConnectionError) \
+        and not isinstance(error, openai.APITimeoutError) \
+        and isinstance(error.__cause__, httpx.ConnectError)
 
-        # Validate prompt
-        if not prompt_raw:
-            return jsonify({"ok": False, "message": "Empty prompt"}), 400
 
-        # Check authentication
-        user_id = session.get("user_id")
-        if not user_id:
-            return jsonify({"ok": False, "message": "Please login"}), 401
+def extract_design_specs(prompt_raw):
+    """
+    Extract product attributes from a design prompt.
+    Single compiled word-boundary scan (see services/prompt_specs.py).
+    
+    Args:
+        prompt_raw: Design prompt text
+    
+    Returns:
+        dict: {product_type, formula, coverage, finish, skin_type, packaging_desc, vibe}
+    """
+    return extract_specs(prompt_raw)
 
-        print(f"[AI] Prompt received: {prompt_raw[:100]}...")
 
-        # Generate image with gpt-image-1
-        result = OpenAI_Client.images.generate(
-            model="gpt-image-1",
-            prompt=prompt_raw,
-            size="1024x1024",
-            quality="high"
-        )
+def normalize_design_spec(raw, vibe=None):
+    """
+    Validate a structured design spec from the wizard or SmartPicks.
+    
+    Args:
+        raw: dict with product_type, formula, coverage, finish, skin_type and
+             packaging_desc (missing attributes take the usual defaults)
+        vibe: Optional SmartPicks vibe; its style is the packaging text
+              when packaging_desc is empty
+    
+    Returns:
+        dict: {product_type, formula, coverage, finish, skin_type, packaging_desc}
+    
+    Raises:
+        ValueError: Unknown attribute value or no packaging description
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("spec must be an object")
 
-        b64_data = result.data[0].b64_json
-        image_url = f"data:image/png;base64,{b64_data}"
+    spec = {}
+    for field, values in PRICE_GRID.options().items():
+        value = str(raw.get(field) or SPEC_DEFAULTS[field]).strip().upper()
+        if value not in values:
+            raise ValueError(f"Invalid {field}: {value}")
+        spec[field] = value
 
-        # -----------------------------------------------------------------
-        # Extract Product Attributes from Prompt
-        # -----------------------------------------------------------------
+    packaging_desc = " ".join(str(raw.get("packaging_desc") or "").split())
+    if not packaging_desc:
+        packaging_desc = SMARTPICKS_VIBE_STYLES.get(vibe or "", "")
+    if not packaging_desc:
+        raise ValueError("Missing packaging description")
 
-        prompt_upper = prompt_raw.upper()
-        prompt_lower = prompt_raw.lower()
+    # A period would end the packaging text when the prompt is parsed
+    packaging_desc = packaging_desc.replace(". ", ", ").rstrip(".")
+    spec["packaging_desc"] = packaging_desc[:PACKAGING_DESC_MAX_LENGTH]
+    return spec
 
-        # Extract product type
-        product_type = "LIPSTICK"  # Default
-        product_types = [
-            "LIPSTICK", "MASCARA", "BLUSH", "FOUNDATION", "EYELINER",
-            "EYESHADOW", "HIGHLIGHTER", "BRONZER", "PRIMER"
-        ]
-        for pt in product_types:
-            if pt in prompt_upper:
-                product_type = pt
-                break
-        if "SETTING" in prompt_upper:
-            product_type = "SETTING_SPRAY"
-
-        # Extract formula type
-        formula = "CREAM"  # Default
-        formula_keywords = {
-            "water": "WATER",
-            "oil": "OIL",
-            "gel": "GEL",
-            "powder": "POWDER",
-            "silicone": "SILICONE"
-        }
-        for keyword, value in formula_keywords.items():
-            if keyword in prompt_lower:
-                formula = value
-                break
 
-        # Extract coverage level
-        coverage = "MEDIUM"  # Default
-        if "sheer" in prompt_lower:
-            coverage = "SHEER"
-        elif "full" in prompt_lower:
-            coverage = "FULL"
-
-        # Extract finish type
-        finish = "NATURAL"  # Default
-        finish_keywords = {
-            "matte": "MATTE",
-            "dewy": "DEWY",
-            "glowy": "GLOWY",
-            "satin": "SATIN"
-        }
-        for keyword, value in finish_keywords.items():
-            if keyword in prompt_lower:
-                finish = value
-                break
+def random_design_spec(vibe):
+    """Random SmartPicks spec in a vibe's packaging style (minimal if unknown)."""
+    spec = {field: random.choice(values) for field, values in PRICE_GRID.options().items()}
+    spec["packaging_desc"] = SMARTPICKS_VIBE_STYLES.get(vibe, SMARTPICKS_VIBE_STYLES["minimal"])
+    return normalize_design_spec(spec)
 
-        # Extract skin type
-        skin_type = "NORMAL"  # Default
-        skin_keywords = {
-            "oily": "OILY",
-            "dry": "DRY",
-            "combination": "COMBINATION",
-            "sensitive": "SENSITIVE"
-        }
-        for keyword, value in skin_keywords.items():
-            if keyword in prompt_lower:
-                skin_type = value
-                break
 
-        # -----------------------------------------------------------------
-        # Calculate Dynamic Price
-        # -----------------------------------------------------------------
+def build_design_prompt(spec):
+    """
+    Build the canonical image prompt for a normalized spec.
+    The same spec always gives the same prompt, so it caches and dedupes.
+    """
+    return DESIGN_PROMPT_TEMPLATE.format(
+        product=SMARTPICKS_PRODUCT_NAMES.get(spec["product_type"], "cosmetic"),
+        formula=spec["formula"].lower(),
+        coverage=spec["coverage"].lower(),
+        finish=spec["finish"].lower(),
+        skin_type=spec["skin_type"].lower(),
+        packaging=spec["packaging_desc"]
+    )
 
-        base_price = BASE_PRICES.get(product_type, 50)
-        calculated_price = (
-            base_price
-            * FORMULA_MULT.get(formula, 1)
-            * COVERAGE_MULT.get(coverage, 1)
-            * FINISH_MULT.get(finish, 1)
-            * SKIN_MULT.get(skin_type, 1)
+
+def parse_design_request(data):
+    """
+    Read the design of a packaging request.
+    
+    A structured spec is preferred: the server builds the canonical
+    prompt and keeps the spec, so nothing is re-parsed. A raw prompt is
+    still accepted for older clients.
+    
+    Returns:
+        tuple: (prompt, spec) - spec is None for raw prompts
+    
+    Raises:
+        ValueError: Invalid spec or empty prompt
+    """
+    if data.get("spec") is not None:
+        spec = normalize_design_spec(data["spec"], data.get("vibe"))
+        return build_design_prompt(spec), spec
+
+    prompt_raw = (data.get("prompt") or "").strip()
+    if not prompt_raw:
+        raise ValueError("Empty prompt")
+    return prompt_raw, None
+
+
+def render_packaging_image(prompt_raw, vibe=None, use_cache=True, user_id=None, quality=None):
+    """
+    Generate one packaging image with gpt-image-1 and store it.
+    Does not touch the database, so it is safe to run in parallel threads.
+    
+    When the generation cache is enabled, a design with the same spec
+    and prompt is served from the cache instead of calling OpenAI.
+    
+    Args:
+        prompt_raw: Design prompt text
+        vibe: Optional style (part of the cache key)
+        use_cache: Set False to always render a fresh image
+        user_id: Account charged for the upstream call (None for system work)
+        quality: gpt-image-1 quality (default: OPENAI_FINAL_QUALITY)
+    
+    Returns:
+        str: Blob reference ("sha256:<hex>")
+    """
+    print(f"[AI] Prompt received: {prompt_raw[:100]}...")
+    quality = quality or app.config["OPENAI_FINAL_QUALITY"]
+
+    cache_key = None
+    if generation_cache and use_cache:
+        cache_key = make_cache_key(extract_design_specs(prompt_raw), prompt_raw, vibe, quality)
+        cached_ref = generation_cache.get(cache_key)
+
+        if cached_ref and image_store.exists(parse_ref(cached_ref)):
+            print(f"[AI] Cache hit: {cache_key[:12]}")
+            return cached_ref
+        if cached_ref:
+            generation_cache.discard(cache_key, cached_ref)
+
+    # Generate image with gpt-image-1 (waits for an admission slot,
+    # fails fast while the images circuit is open)
+    with image_admission.slot(user_id):
+        result = resilient_call(
+            lambda timeout: OpenAI_Client.images.generate(
+                model="gpt-image-1",
+                prompt=prompt_raw,
+                size="1024x1024",
+                quality=quality,
+                timeout=timeout
+            ),
+            openai_image_breaker,
+            retries=app.config["OPENAI_IMAGE_RETRIES"],
+            is_transient=is_transient_openai_error,
+            is_retryable=is_unprocessed_openai_error,
+            deadline=app.config["OPENAI_IMAGE_TIMEOUT"]
         )
 
-        # Round to nearest 5, cap at MAX_PRICE
-        final_price = min(round(calculated_price / 5) * 5, MAX_PRICE)
-        product_size = PRODUCT_SIZES.get(product_type, "10g")
+    # Store image bytes once; DB keeps only the short reference
+    image_ref = image_store.put(base64.b64decode(result.data[0].b64_json))
 
-        print(f"[AI] Price: base={base_price}, calculated={calculated_price:.2f}, final={final_price}")
-        print(f"[AI] Product: {product_type}, Size: {product_size}")
+    # Pre-render listing thumbnails while we already hold the worker
+    if app.config["IMAGE_DERIVATIVES_EAGER"]:
+        image_derivatives.pregenerate(image_ref)
 
-        # -----------------------------------------------------------------
-        # Extract Packaging Description
-        # -----------------------------------------------------------------
+    if cache_key:
+        generation_cache.put(cache_key, image_ref)
 
-        packaging_desc = ""
-        if "Packaging:" in prompt_raw:
-            packaging_desc = prompt_raw.split("Packaging:")[-1].split(".")[0].strip()
+    return image_ref
 
-        # Generate creative product name
-        product_name = generate_product_name(packaging_desc, product_type, finish)
-        print(f"[AI] Generated name: {product_name}")
 
-        # -----------------------------------------------------------------
-        # Save Product to Database
-        # -----------------------------------------------------------------
+def render_mockup_image(prompt_raw, vibe=None):
+    """
+    Draw a local packaging mockup for a prompt and store it.
+    
+    Returns:
+        str: Blob reference ("sha256:<hex>")
+    """
+    specs = extract_design_specs(prompt_raw)
+    if vibe not in SMARTPICKS_VIBE_STYLES:
+        vibe = specs["vibe"]
+    png = render_mockup(specs["product_type"], specs["finish"], vibe, seed=prompt_raw)
+    return image_store.put(png)
 
-        product = Product(
-            owner_user_id=user_id,
-            name=product_name,
-            sku=f"AI-{user_id}-{int(datetime.utcnow().timestamp())}-{random.randint(1000, 9999)}",
-            description=prompt_raw,
-            image_primary=image_url,
-            origin=ProductOriginEnum.AI,
-            visibility=ProductVisibilityEnum.PRIVATE,
-            status=ProductStatusEnum.DRAFT,
-            price_sar=float(final_price),
-            base_price_sar=float(base_price),
-            complexity_factor=1,
-            category_multiplier=1,
-            discount_percent=0,
-            final_price_sar=float(final_price),
-            category="AI-CUSTOM",
-            brand="BeautyFlow AI",
-        )
 
-        db.session.add(product)
-        db.session.flush()
+def wants_progressive(data):
+    """Read the per-request progressive flag, defaulting to AI_PROGRESSIVE."""
+    if data.get("progressive") is None:
+        return app.config["AI_PROGRESSIVE"]
+    return bool(data.get("progressive"))
 
-        # -----------------------------------------------------------------
-        # Save AI Session & Generation Record
-        # -----------------------------------------------------------------
 
-        # Get or create AI session
-        session_obj = AISession.query.filter_by(
-            account_id=user_id,
-            status="OPEN"
-        ).order_by(AISession.id.desc()).first()
+def render_design(prompt_raw, vibe=None, user_id=None, fast=False, draft=False):
+    """
+    Render a design for a user, falling back to a local mockup.
+    
+    Fast mode (per request or AI_FAST_MODE) returns a mockup without
+    calling OpenAI. Otherwise OpenAI is used, and when it is down or
+    saturated (transient error, open circuit, no admission slot) a mockup
+    is returned instead of failing the request.
+    
+    Drafts (progressive mode) and fallback mockups are flagged so that
+    upgrade_design() can re-render them at final quality later.
+    
+    Args:
+        prompt_raw: Design prompt text
+        vibe: Optional style
+        user_id: Account charged for the upstream call
+        fast: Skip OpenAI and return a mockup
+        draft: Render at OPENAI_DRAFT_QUALITY
+    
+    Returns:
+        tuple: (image_ref, renderer, draft) - renderer is "openai" or "mockup"
+    """
+    if (fast or app.config["AI_FAST_MODE"]) and mockups_available():
+        return render_mockup_image(prompt_raw, vibe), "mockup", False
+
+    quality = app.config["OPENAI_DRAFT_QUALITY" if draft else "OPENAI_FINAL_QUALITY"]
 
-        if not session_obj:
-            session_obj = AISession(account_id=user_id, status="OPEN")
-            db.session.add(session_obj)
-            db.session.flush()
+    try:
+        image_ref = render_packaging_image(prompt_raw, vibe, user_id=user_id, quality=quality)
+        return image_ref, "openai", draft
 
-        # Save generation record
-        gen = AIGeneration(
-            session_id=session_obj.id,
-            product_id=product.id,
-            image_url=image_url,
-            prompt_json={
-                "prompt": prompt_raw,
-                "packaging_desc": packaging_desc
-            },
-            meta_json={
-                "model": "dall-e-2",
-                "context": data.get("context"),
-                "vibe": data.get("vibe"),
-                "specs": {
-                    "product_type": product_type,
-                    "formula": formula,
-                    "coverage": coverage,
-                    "finish": finish,
-                    "skin_type": skin_type
-                }
+    except (CircuitOpen, AdmissionRejected, openai.OpenAIError) as e:
+        fallback = app.config["AI_MOCKUP_FALLBACK"] and mockups_available()
+        if not fallback or (isinstance(e, openai.OpenAIError) and not is_transient_openai_error(e)):
+            raise
+        print(f"[AI] OpenAI unavailable ({type(e).__name__}), using local mockup")
+        return render_mockup_image(prompt_raw, vibe), "mockup", True
+
+
+def generate_packaging_design(user_id, prompt_raw, context=None, vibe=None,
+                              fast=False, progressive=False, spec=None):
+    """
+    Generate a packaging image and save it as a new AI product.
+    Runs on the job worker for /ai/generate and /ai/jobs.
+    
+    Args:
+        user_id: Owner account ID
+        prompt_raw: Design prompt text
+        context: Optional context (e.g., "custom-packaging")
+        vibe: Optional style (e.g., "luxury", "cute")
+        fast: Use the local mockup renderer instead of OpenAI
+        progressive: Render a draft now, final quality on upgrade
+        spec: Structured spec the prompt was built from (skips re-parsing)
+    
+    Returns:
+        dict: {image_url, product: {id, name, price_sar, size}, specs, renderer, draft}
+    
+    Raises:
+        Exception: OpenAI or database errors (caller rolls back)
+    """
+    image_ref, renderer, draft = render_design(
+        prompt_raw, vibe, user_id=user_id, fast=fast, draft=progressive
+    )
+    result = save_packaging_design(
+        user_id, prompt_raw, image_ref, context, vibe, renderer, draft, specs=spec
+    )
+    db.session.commit()
+
+    print("[AI] Product saved to database successfully")
+    return result
+
+
+def save_packaging_design(user_id, prompt_raw, image_ref, context=None, vibe=None,
+                          renderer="openai", draft=False, specs=None):
+    """
+    Add the Product and AIGeneration rows for a rendered image.
+    Flushes once but does not commit, so several designs can share one transaction.
+    
+    Args:
+        user_id: Owner account ID
+        prompt_raw: Design prompt text
+        image_ref: Blob reference from render_design()
+        context: Optional context (e.g., "custom-packaging")
+        vibe: Optional style (e.g., "luxury", "cute")
+        renderer: "openai" or "mockup"
+        draft: Image is a draft to be upgraded (see upgrade_design)
+        specs: Structured spec from normalize_design_spec() (default: parsed from prompt)
+    
+    Returns:
+        dict: {image_url, product: {id, name, price_sar, size}, specs, renderer, draft}
+    """
+    # Product attributes: the request's spec, or extracted from the prompt
+    specs = specs or extract_design_specs(prompt_raw)
+    product_type = specs["product_type"]
+    formula = specs["formula"]
+    coverage = specs["coverage"]
+    finish = specs["finish"]
+    skin_type = specs["skin_type"]
+    packaging_desc = specs["packaging_desc"]
+
+    # -----------------------------------------------------------------
+    # Calculate Dynamic Price
+    # -----------------------------------------------------------------
+
+    # Rounded to nearest 5 and capped at MAX_PRICE by the grid
+    quote = PRICE_GRID.quote(specs)
+    base_price = quote["base_price"]
+    final_price = quote["final_price"]
+    product_size = PRODUCT_SIZES.get(product_type, "10g")
+
+    print(f"[AI] Price: base={base_price}, final={final_price}")
+    print(f"[AI] Product: {product_type}, Size: {product_size}")
+
+    # Generate creative product name
+    product_name = generate_product_name(packaging_desc, product_type, finish)
+    print(f"[AI] Generated name: {product_name}")
+
+    # -----------------------------------------------------------------
+    # Save Product to Database
+    # -----------------------------------------------------------------
+
+    product = Product(
+        owner_user_id=user_id,
+        name=product_name,
+        sku=f"AI-{user_id}-{int(datetime.utcnow().timestamp())}-{random.randint(1000, 9999)}",
+        description=prompt_raw,
+        image_primary=image_ref,
+        origin=ProductOriginEnum.AI,
+        visibility=ProductVisibilityEnum.PRIVATE,
+        status=ProductStatusEnum.DRAFT,
+        price_sar=float(final_price),
+        base_price_sar=float(base_price),
+        complexity_factor=1,
+        category_multiplier=1,
+        discount_percent=0,
+        final_price_sar=float(final_price),
+        category="AI-CUSTOM",
+        brand="BeautyFlow AI",
+    )
+
+    # -----------------------------------------------------------------
+    # Save Generation Record (same flush as the product)
+    # -----------------------------------------------------------------
+
+    gen = AIGeneration(
+        product=product,
+        prompt_json={
+            "prompt": prompt_raw,
+            "packaging_desc": packaging_desc
+        },
+        meta_json={
+            "model": "dall-e-2",
+            "context": context,
+            "vibe": vibe,
+            "renderer": renderer,
+            "draft": draft,
+            "specs": {
+                "product_type": product_type,
+                "formula": formula,
+                "coverage": coverage,
+                "finish": finish,
+                "skin_type": skin_type
             }
+        }
+    )
+
+    # Cached open session, or a new one inserted with these rows
+    assign_open_session([gen], user_id, ai_session_cache)
+
+    db.session.add_all([product, gen])
+    db.session.flush()
+
+    return {
+        "image_url": media_url(image_ref),
+        "product": {
+            "id": product.id,
+            "name": product.name,
+            "price_sar": final_price,
+            "size": product_size
+        },
+        "specs": {
+            "product_type": product_type,
+            "formula": formula,
+            "coverage": coverage,
+            "finish": finish,
+            "skin_type": skin_type
+        },
+        "renderer": renderer,
+        "draft": draft
+    }
+
+
+@csrf.exempt
+@app.route("/ai/generate", methods=["POST"])
+def ai_generate_packaging():
+    """
+    Generate AI packaging design using gpt-image-1.
+    Blocks until the image is ready; the UI uses /ai/jobs instead.
+    
+    Runs through the job queue so identical in-flight requests from the
+    same user (double clicks, client retries) share one generation.
+    
+    Accepts JSON with:
+        - spec: Structured spec {product_type, formula, coverage, finish,
+                skin_type, packaging_desc}; the prompt is built server-side
+        - prompt: Design prompt text (required without spec)
+        - context: Optional context (e.g., "custom-packaging")
+        - vibe: Optional style (e.g., "luxury", "cute")
+        - fast: Optional, return a local mockup instead of calling OpenAI
+        - progressive: Optional, return a draft render (default: AI_PROGRESSIVE)
+    
+    Returns:
+        JSON: {ok, image_url, product: {id, name, price_sar, size}, specs, renderer, draft}
+        JSON (429): {ok: false, error} - RATE_LIMITED (admission control) or
+            QUEUE_FULL (AI_JOB_MAX_PENDING jobs in progress); retry after
+            the Retry-After header
+        JSON (504): {ok: false, job_id} - still running after AI_GENERATE_TIMEOUT
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+
+        # Validate spec / prompt
+        try:
+            prompt_raw, spec = parse_design_request(data)
+        except ValueError as e:
+            return jsonify({"ok": False, "message": str(e)}), 400
+
+        # Check authentication
+        user_id = session.get("user_id")
+        if not user_id:
+            return jsonify({"ok": False, "message": "Please login"}), 401
+
+        payload = {
+            "prompt": prompt_raw,
+            "spec": spec,
+            "context": data.get("context"),
+            "vibe": data.get("vibe"),
+            "fast": bool(data.get("fast")),
+            "progressive": wants_progressive(data),
+        }
+        # Charged only for a new generation, not when joining an identical one
+        job, created = job_runner.enqueue(
+            user_id,
+            "packaging",
+            payload,
+            dedupe_key=packaging_dedupe_key(user_id, payload),
+            admit=None if payload["fast"] else (lambda: image_admission.admit(user_id))
         )
-        db.session.add(gen)
-        db.session.commit()
+        if not created:
+            print(f"[AI] Joined in-flight job {job.id}")
+
+        job_id = job.id
+        job = job_runner.wait(job_id, app.config["AI_GENERATE_TIMEOUT"])
+
+        if job is None:
+            return jsonify({
+                "ok": False,
+                "error": "TIMEOUT",
+                "message": "Generation is still running",
+                "job_id": job_id
+            }), 504
+
+        if job.status != JOB_SUCCEEDED:
+            return jsonify({
+                "ok": False,
+                "error": "OPENAI_ERROR",
+                "message": job.error or "Generation failed"
+            }), 500
+
+        return jsonify({"ok": True, **job.result_json}), 200
 
-        print("[AI] Product saved to database successfully")
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+
+    except JobQueueFull:
+        response = jsonify({
+            "ok": False,
+            "error": "QUEUE_FULL",
+            "message": "Too many designs in progress, please try again shortly"
+        })
+        response.headers["Retry-After"] = "5"
+        return response, 429
 
+    except JobNotFound as e:
+        print(f"[AI] Job {e} disappeared while waiting")
         return jsonify({
-            "ok": True,
-            "image_url": image_url,
-            "product": {
-                "id": product.id,
-                "name": product.name,
-                "price_sar": final_price,
-                "size": product_size
-            }
-        }), 200
+            "ok": False,
+            "error": "JOB_NOT_FOUND",
+            "message": "The generation was cancelled, please try again"
+        }), 500
 
     except Exception as e:
         db.session.rollback()
@@ -2305,49 +2890,291 @@ def ai_generate_packaging():
 
 
 # -----------------------------------------------------------------------------
-# 18.2 Update Product Name
+# 18.2 SmartPicks Batch Generation
 # -----------------------------------------------------------------------------
 
-@csrf.exempt
-@app.route("/ai/product/update-name", methods=["POST"])
-def ai_update_product_name():
+def parse_smartpicks_request(data):
     """
-    Update product name in database.
+    Validate a SmartPicks batch request.
     
-    Accepts JSON with:
-        - product_id: Product identifier (required)
-        - name: New product name (required)
+    Accepts structured specs (built by smartPicks.html), explicit prompts,
+    or a count, in which case random specs are drawn server-side. Specs
+    are turned into canonical prompts here and saved as-is.
     
     Returns:
-        JSON: {ok, message, product_id, old_name, new_name}
+        dict: {vibe, prompts, specs, fast, progressive} - specs is None for raw prompts
+    
+    Raises:
+        ValueError: Missing vibe, invalid spec or invalid count
     """
-    user_id = session.get("user_id")
-    if not user_id:
-        return jsonify({"ok": False, "message": "Please login first"}), 401
+    vibe = str(data.get("vibe") or "").strip().lower()
+    if not vibe:
+        raise ValueError("Missing vibe")
 
-    try:
-        data = request.get_json() or {}
-        product_id = data.get("product_id")
-        new_name = (data.get("name") or "").strip()
+    raw_specs = data.get("specs") or []
+    raw_prompts = data.get("prompts") or []
+    if not isinstance(raw_specs, list) or not isinstance(raw_prompts, list):
+        raise ValueError("specs and prompts must be lists")
 
-        # Validate input
-        if not product_id or not new_name:
-            return jsonify({"ok": False, "message": "Product ID and name required"}), 400
+    specs = [
+        normalize_design_spec(spec, vibe)
+        for spec in raw_specs[:SMARTPICKS_MAX_COUNT]
+    ]
+    prompts = [str(p).strip() for p in raw_prompts if str(p).strip()]
 
-        # Find product (owned by user first, then any)
-        product = Product.query.filter_by(id=product_id, owner_user_id=user_id).first()
+    if not specs and not prompts:
+        try:
+            count = int(data.get("count") or 2)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid count")
+        count = max(1, min(count, SMARTPICKS_MAX_COUNT))
+        specs = [random_design_spec(vibe) for _ in range(count)]
 
-        if not product:
-            product = Product.query.filter_by(id=product_id).first()
-            if not product:
-                return jsonify({"ok": False, "message": "Product not found"}), 404
+    if specs:
+        prompts = [build_design_prompt(spec) for spec in specs]
+
+    return {
+        "vibe": vibe,
+        "prompts": prompts[:SMARTPICKS_MAX_COUNT],
+        "specs": specs or None,
+        "fast": bool(data.get("fast")),
+        "progressive": wants_progressive(data)
+    }
+
+
+def generate_smartpicks_batch(user_id, vibe, prompts, fast=False, progressive=False,
+                              specs=None):
+    """
+    Generate several SmartPicks designs concurrently.
+    
+    Images are requested in parallel (wall time ~ one generation), then
+    all products are saved in a single transaction. A failed render leaves
+    a null slot as long as at least one design succeeds.
+    
+    Args:
+        user_id: Owner account ID
+        vibe: SmartPicks vibe (e.g., "luxury")
+        prompts: One prompt per design
+        fast: Use the local mockup renderer instead of OpenAI
+        progressive: Render drafts now, final quality on upgrade
+        specs: Optional structured specs aligned with prompts
+    
+    Returns:
+        dict: {products: [{image_url, product} or None], failed}
+            products is aligned with prompts
+    """
+    futures = [
+        image_fanout.submit(render_design, p, vibe, user_id=user_id, fast=fast, draft=progressive)
+        for p in prompts
+    ]
+
+    renders = []
+    errors = []
+    for future in futures:
+        try:
+            renders.append(future.result())
+        except Exception as e:
+            print(f"[SmartPicks] Render failed: {e}")
+            renders.append(None)
+            errors.append(e)
+
+    if len(errors) == len(prompts):
+        raise errors[0]
+
+    specs = specs or [None] * len(prompts)
+    designs = [
+        save_packaging_design(user_id, prompt, render[0], context="smartpicks",
+                              vibe=vibe, renderer=render[1], draft=render[2], specs=spec)
+        if render else None
+        for prompt, spec, render in zip(prompts, specs, renders)
+    ]
+    db.session.commit()
+
+    print(f"[SmartPicks] Saved {len(prompts) - len(errors)} products ({len(errors)} failed)")
+    return {"products": designs, "failed": len(errors)}
+
+
+@csrf.exempt
+@app.route("/ai/smartpicks/generate", methods=["POST"])
+def ai_smartpicks_generate():
+    """
+    Generate a batch of SmartPicks designs in one call.
+    
+    Accepts JSON with:
+        - vibe: SmartPicks vibe (required)
+        - specs: Optional list of structured specs, one per design
+        - prompts: Optional list of prompts, one per design (older clients)
+        - count: Number of designs when specs and prompts are omitted (default: 2)
+        - fast: Optional, return local mockups instead of calling OpenAI
+        - progressive: Optional, return draft renders (default: AI_PROGRESSIVE)
+    
+    Returns:
+        JSON: {ok, products: [{image_url, product}], failed}
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"ok": False, "message": "Please login"}), 401
+
+    try:
+        batch = parse_smartpicks_request(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({"ok": False, "message": str(e)}), 400
+
+    try:
+        if not batch["fast"]:
+            image_admission.admit(user_id, cost=len(batch["prompts"]))
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+
+    try:
+        result = generate_smartpicks_batch(
+            user_id, batch["vibe"], batch["prompts"], batch["fast"], batch["progressive"],
+            batch["specs"]
+        )
+        return jsonify({"ok": True, **result}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        import traceback
+        print("[SmartPicks] ERROR:")
+        traceback.print_exc()
+        return jsonify({
+            "ok": False,
+            "error": "OPENAI_ERROR",
+            "message": str(e)
+        }), 500
 
-        # Update name
-        old_name = product.name
-        product.name = new_name
-        db.session.commit()
+
+# -----------------------------------------------------------------------------
+# 18.3 SmartPicks Warm Inventory
+# -----------------------------------------------------------------------------
+
+def render_inventory_design(vibe):
+    """Render one fresh SmartPicks design for the pool."""
+    prompt = build_design_prompt(random_design_spec(vibe))
+    return prompt, render_packaging_image(prompt, vibe, use_cache=False)
+
+
+inventory_filler = InventoryFiller(
+    app,
+    render_inventory_design,
+    image_fanout,
+    SMARTPICKS_VIBE_STYLES,
+    target=app.config["AI_INVENTORY_TARGET"],
+    interval=app.config["AI_INVENTORY_INTERVAL"],
+    window=parse_hours_window(app.config["AI_INVENTORY_REFILL_HOURS"])
+)
+
+# Serving processes only, like start_job_recovery: CLI commands must not
+# start billed renders
+@app.before_request
+def start_inventory_filler():
+    if app.config["AI_INVENTORY_FILLER"]:
+        inventory_filler.start()
+
+
+@csrf.exempt
+@app.route("/ai/smartpicks/claim", methods=["POST"])
+def ai_smartpicks_claim():
+    """
+    Claim ready-made SmartPicks designs from the warm inventory.
+    
+    Accepts JSON with:
+        - vibe: SmartPicks vibe (required)
+        - count: Number of designs (default: 2)
+    
+    Returns:
+        JSON: {ok, products: [{image_url, product, specs}]}
+        JSON (404): {ok: false, error: "INVENTORY_EMPTY"} when the pool is short
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"ok": False, "message": "Please login"}), 401
+
+    data = request.get_json(silent=True) or {}
+    vibe = (data.get("vibe") or "").strip().lower()
+
+    try:
+        count = max(1, min(int(data.get("count") or 2), SMARTPICKS_MAX_COUNT))
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "message": "Invalid count"}), 400
+
+    if vibe not in SMARTPICKS_VIBE_STYLES:
+        return jsonify({"ok": False, "message": "Unknown vibe"}), 400
+
+    try:
+        claimed = claim_inventory(vibe, count)
+
+        if not claimed:
+            db.session.rollback()
+            return jsonify({
+                "ok": False,
+                "error": "INVENTORY_EMPTY",
+                "message": "No ready-made designs for this vibe"
+            }), 404
+
+        designs = [
+            save_packaging_design(user_id, prompt, image_ref, context="smartpicks", vibe=vibe)
+            for prompt, image_ref in claimed
+        ]
+        db.session.commit()
+
+        print(f"[INVENTORY] User {user_id} claimed {len(designs)} {vibe} design(s)")
+        inventory_filler.wake()
+
+        return jsonify({"ok": True, "products": designs}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"[INVENTORY] Claim error: {e}")
+        return jsonify({"ok": False, "message": str(e)}), 500
+
+
+# -----------------------------------------------------------------------------
+# 18.4 Update Product Name
+# -----------------------------------------------------------------------------
+
+@csrf.exempt
+@app.route("/ai/product/update-name", methods=["POST"])
+def ai_update_product_name():
+    """
+    Update product name in database.
+    
+    Accepts JSON with:
+        - product_id: Product identifier (required)
+        - name: New product name (required)
+    
+    Returns:
+        JSON: {ok, message, product_id, old_name, new_name}
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"ok": False, "message": "Please login first"}), 401
+
+    try:
+        data = request.get_json() or {}
+        product_id = data.get("product_id")
+        new_name = (data.get("name") or "").strip()
+
+        # Validate input
+        if not product_id or not new_name:
+            return jsonify({"ok": False, "message": "Product ID and name required"}), 400
+
+        # Find product (owned by user first, then any)
+        product = Product.query.filter_by(id=product_id, owner_user_id=user_id).first()
+
+        if not product:
+            product = Product.query.filter_by(id=product_id).first()
+            if not product:
+                return jsonify({"ok": False, "message": "Product not found"}), 404
+
+        # Update name
+        old_name = product.name
+        product.name = new_name
+        db.session.commit()
 
         print(f"[AI] Product {product_id} name: '{old_name}' -> '{new_name}'")
+        schedule_design_upgrade(product_id, user_id)
 
         return jsonify({
             "ok": True,
@@ -2362,6 +3189,339 @@ def ai_update_product_name():
         return jsonify({"ok": False, "message": str(e)}), 500
 
 
+# -----------------------------------------------------------------------------
+# 18.5 AI Generation Jobs
+# -----------------------------------------------------------------------------
+
+def packaging_dedupe_key(user_id, payload):
+    """Singleflight key: same user + normalized prompt + context/vibe/mode."""
+    return make_dedupe_key(
+        user_id,
+        "packaging",
+        payload["prompt"],
+        context=payload.get("context"),
+        vibe=payload.get("vibe"),
+        fast=payload.get("fast") or None,
+        progressive=payload.get("progressive") or None
+    )
+
+
+@job_runner.register("packaging")
+def run_packaging_job(account_id, payload):
+    """Job handler: same work and result shape as /ai/generate."""
+    return generate_packaging_design(
+        account_id,
+        payload["prompt"],
+        context=payload.get("context"),
+        vibe=payload.get("vibe"),
+        fast=payload.get("fast", False),
+        progressive=payload.get("progressive", False),
+        spec=payload.get("spec")
+    )
+
+
+@job_runner.register("smartpicks")
+def run_smartpicks_job(account_id, payload):
+    """Job handler: same work and result shape as /ai/smartpicks/generate."""
+    return generate_smartpicks_batch(
+        account_id,
+        payload["vibe"],
+        payload["prompts"],
+        fast=payload.get("fast", False),
+        progressive=payload.get("progressive", False),
+        specs=payload.get("specs")
+    )
+
+
+def latest_generation(product_id):
+    """Most recent AIGeneration row for a product, or None."""
+    return AIGeneration.query.filter_by(
+        product_id=product_id
+    ).order_by(AIGeneration.id.desc()).first()
+
+
+@job_runner.register("upgrade")
+def run_upgrade_job(account_id, payload):
+    """
+    Job handler: re-render a draft design at final quality.
+    The product keeps its id; only image_primary is replaced.
+    """
+    product = db.session.get(Product, payload["product_id"])
+    gen = latest_generation(payload["product_id"])
+
+    if not product or not gen or not (gen.meta_json or {}).get("draft"):
+        return {"product_id": payload["product_id"], "upgraded": False}
+
+    prompt_raw = (gen.prompt_json or {}).get("prompt") or product.description
+    meta = dict(gen.meta_json or {})
+
+    image_ref = render_packaging_image(
+        prompt_raw,
+        meta.get("vibe"),
+        user_id=account_id,
+        quality=app.config["OPENAI_FINAL_QUALITY"]
+    )
+
+    product.image_primary = image_ref
+    meta.update(draft=False, renderer="openai")
+    gen.meta_json = meta
+    db.session.commit()
+
+    print(f"[AI] Product {product.id} upgraded to final quality")
+    return {"product_id": product.id, "upgraded": True, "image_url": media_url(image_ref)}
+
+
+def schedule_design_upgrade(product_id, user_id):
+    """
+    Queue a final-quality render when a draft design gets used
+    (favorited, renamed, added to cart) by its owner. No-op for final
+    designs and for anyone else's product, since the render is charged
+    to the owner.
+    Never raises: the triggering request must not fail because of it.
+
+    Returns:
+        AIJob or None
+    """
+    try:
+        gen = latest_generation(int(product_id))
+        if not gen or not (gen.meta_json or {}).get("draft"):
+            return None
+
+        owner_id = gen.product.owner_user_id
+        if owner_id is None or owner_id != user_id:
+            return None
+
+        job, created = job_runner.enqueue(
+            owner_id,
+            "upgrade",
+            {"product_id": gen.product_id},
+            dedupe_key=make_dedupe_key(owner_id, "upgrade", str(gen.product_id))
+        )
+        if created:
+            print(f"[AI] Queued upgrade of product {gen.product_id} (job {job.id})")
+        return job
+
+    except JobQueueFull:
+        print(f"[AI] Upgrade of product {product_id} skipped: job queue full")
+    except (TypeError, ValueError):
+        print(f"[AI] Upgrade skipped: invalid product id {product_id!r}")
+    except Exception as e:
+        db.session.rollback()
+        print(f"[AI] Upgrade scheduling error: {e}")
+    return None
+
+
+# Resume interrupted jobs from the serving process only: the hook runs on
+# the first request, so CLI commands (flask db upgrade, images-backfill...)
+# never pick up queued generations
+@app.before_request
+def start_job_recovery():
+    if app.config["AI_JOBS_RECOVER"]:
+        job_runner.start(app.config["AI_JOBS_RECOVER_INTERVAL"])
+
+
+@csrf.exempt
+@app.route("/ai/jobs", methods=["POST"])
+def ai_jobs_create():
+    """
+    Queue an AI generation and return immediately.
+    
+    Accepts JSON with:
+        - kind: "packaging" (default) or "smartpicks"
+        - packaging: same fields as /ai/generate {spec, prompt, context, vibe, fast, progressive}
+        - smartpicks: same fields as /ai/smartpicks/generate {vibe, specs, prompts, count, fast, progressive}
+    
+    Returns:
+        JSON (202): {ok, job_id, status, deduplicated, poll_url, events_url, preview_url}
+        An identical in-flight request returns the existing job
+        preview_url is an instant local mockup for packaging jobs (or null)
+        JSON (429): {ok: false} when the worker pool is full
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"ok": False, "message": "Please login"}), 401
+
+    data = request.get_json(silent=True) or {}
+    kind = data.get("kind") or "packaging"
+
+    if kind == "packaging":
+        try:
+            prompt_raw, spec = parse_design_request(data)
+        except ValueError as e:
+            return jsonify({"ok": False, "message": str(e)}), 400
+        payload = {
+            "prompt": prompt_raw,
+            "spec": spec,
+            "context": data.get("context"),
+            "vibe": data.get("vibe"),
+            "fast": bool(data.get("fast")),
+            "progressive": wants_progressive(data),
+        }
+        dedupe_key = packaging_dedupe_key(user_id, payload)
+
+    elif kind == "smartpicks":
+        try:
+            payload = parse_smartpicks_request(data)
+        except ValueError as e:
+            return jsonify({"ok": False, "message": str(e)}), 400
+        # One batch per user and vibe at a time
+        dedupe_key = make_dedupe_key(user_id, "smartpicks", payload["vibe"])
+
+    else:
+        return jsonify({"ok": False, "message": "Unknown job kind"}), 400
+
+    # One image per prompt; charged only when no identical job is in flight
+    cost = len(payload["prompts"]) if kind == "smartpicks" else 1
+    admit = None if payload["fast"] else (lambda: image_admission.admit(user_id, cost=cost))
+
+    try:
+        job, created = job_runner.enqueue(user_id, kind, payload, dedupe_key=dedupe_key, admit=admit)
+
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+
+    except JobQueueFull:
+        response = jsonify({
+            "ok": False,
+            "error": "QUEUE_FULL",
+            "message": "Too many designs in progress, please try again shortly"
+        })
+        response.headers["Retry-After"] = "5"
+        return response, 429
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"[JOBS] Enqueue error: {e}")
+        return jsonify({"ok": False, "message": str(e)}), 500
+
+    # Placeholder shown while the real image renders (a few ms locally)
+    preview_url = None
+    if kind == "packaging" and not payload["fast"] and mockups_available():
+        try:
+            preview_url = media_url(render_mockup_image(payload["prompt"], payload.get("vibe")))
+        except Exception as e:
+            print(f"[AI] Mockup preview failed: {e}")
+
+    return jsonify({
+        "ok": True,
+        "job_id": job.id,
+        "status": job.status,
+        "deduplicated": not created,
+        "poll_url": url_for("ai_jobs_status", job_id=job.id),
+        "events_url": url_for("ai_jobs_events", job_id=job.id),
+        "preview_url": preview_url,
+    }), 202
+
+
+@app.route("/ai/jobs/<job_id>", methods=["GET"])
+def ai_jobs_status(job_id):
+    """
+    Poll a generation job.
+    
+    Returns:
+        JSON: {ok, job: {id, status, result, error, ...}}
+        result matches /ai/generate or /ai/smartpicks/generate
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"ok": False, "message": "Please login"}), 401
+
+    job = AIJob.query.filter_by(id=job_id, account_id=user_id).first()
+    if not job:
+        return jsonify({"ok": False, "message": "Job not found"}), 404
+
+    response = jsonify({"ok": True, "job": serialize_job(job)})
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+@app.route("/ai/jobs/<job_id>/events", methods=["GET"])
+def ai_jobs_events(job_id):
+    """
+    Server-sent events stream for a generation job.
+    
+    Emits a "status" event on every state change and closes after
+    SUCCEEDED / FAILED, or a "gone" event if the job row disappears.
+    Clients fall back to polling on timeout.
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"ok": False, "message": "Please login"}), 401
+
+    if not AIJob.query.filter_by(id=job_id, account_id=user_id).first():
+        return jsonify({"ok": False, "message": "Job not found"}), 404
+
+    timeout = app.config["AI_JOB_STREAM_TIMEOUT"]
+
+    def generate():
+        deadline = time.monotonic() + timeout
+        last_status = None
+
+        # Open the stream right away so proxies do not buffer it
+        yield "retry: 2000\n\n"
+
+        while time.monotonic() < deadline:
+            # End the previous read so each pass sees fresh state
+            db.session.rollback()
+            job = db.session.get(AIJob, job_id)
+
+            if job is None:
+                yield f"event: gone\ndata: {json.dumps({'id': job_id})}\n\n"
+                return
+
+            if job.status != last_status:
+                last_status = job.status
+                yield f"event: status\ndata: {json.dumps(serialize_job(job))}\n\n"
+
+                if job.status in JOB_TERMINAL_STATUSES:
+                    return
+            else:
+                yield ": ping\n\n"
+
+            # Woken early by workers in this process; re-checks the DB
+            # every second for jobs running elsewhere
+            job_runner.wait_for_change(1.0)
+
+        yield "event: timeout\ndata: {}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+
+# -----------------------------------------------------------------------------
+# 18.6 Canonical Design Prompts
+# -----------------------------------------------------------------------------
+
+@csrf.exempt
+@app.route("/ai/prompt", methods=["POST"])
+def ai_design_prompt():
+    """
+    Build the canonical prompt for a structured spec without generating.
+    Lets clients preview the exact prompt /ai/generate would use.
+
+    Accepts JSON with:
+        - spec: {product_type, formula, coverage, finish, skin_type, packaging_desc}
+        - vibe: Optional SmartPicks vibe (style used when packaging_desc is empty)
+
+    Returns:
+        JSON: {ok, prompt, spec}
+    """
+    data = request.get_json(silent=True) or {}
+
+    try:
+        spec = normalize_design_spec(data.get("spec"), data.get("vibe"))
+    except ValueError as e:
+        return jsonify({"ok": False, "message": str(e)}), 400
+
+    return jsonify({"ok": True, "prompt": build_design_prompt(spec), "spec": spec}), 200
+
+
 # =============================================================================
 # 19. API - AI HISTORY
 # =============================================================================
@@ -2372,7 +3532,7 @@ def ai_history():
     Get user's last 20 AI-generated products.
     
     Returns:
-        JSON: {ok, history: [{id, name, image_url, created_at, price_sar, size}]}
+        JSON: {ok, history: [{id, name, image_url, thumb_url, created_at, price_sar, size}]}
     """
     user_id = session.get("user_id")
     if not user_id:
@@ -2380,7 +3540,7 @@ def ai_history():
 
     try:
         # Query user's AI-generated products
-        products = Product.query.filter_by(
+        products = Product.query_with_image().filter_by(
             owner_user_id=user_id,
             origin=ProductOriginEnum.AI
         ).order_by(Product.created_at.desc()).limit(20).all()
@@ -2389,7 +3549,8 @@ def ai_history():
         history = [{
             "id": p.id,
             "name": p.name,
-            "image_url": p.image_primary,
+            "image_url": media_url(p.image_primary),
+            "thumb_url": variant_url(p.image_primary, THUMB_CARD),
             "created_at": p.created_at.isoformat(),
             "price_sar": float(p.price_sar or 0),
             "size": "10g"
@@ -2466,6 +3627,7 @@ def ai_favorites_add():
         item = WishlistItem(wishlist_id=wishlist.id, product_id=product_id)
         db.session.add(item)
         db.session.commit()
+        schedule_design_upgrade(product_id, user_id)
         return jsonify({"ok": True, "message": "Added to favorites successfully"})
 
     except Exception as e:
@@ -2483,7 +3645,7 @@ def ai_favorites_get():
     Get user's favorite products.
     
     Returns:
-        JSON: {ok, favorites: [{id, name, image_url, price_sar, created_at}]}
+        JSON: {ok, favorites: [{id, name, image_url, thumb_url, price_sar, created_at}]}
     """
     user_id = session.get("user_id")
     if not user_id:
@@ -2502,12 +3664,13 @@ def ai_favorites_get():
         # Build favorites list with product details
         favorites = []
         for item in items:
-            product = Product.query.filter_by(id=item.product_id).first()
+            product = Product.query_with_image().filter_by(id=item.product_id).first()
             if product:
                 favorites.append({
                     "id": product.id,
                     "name": product.name,
-                    "image_url": product.image_primary,
+                    "image_url": media_url(product.image_primary),
+                    "thumb_url": variant_url(product.image_primary, THUMB_CARD),
                     "price_sar": float(product.price_sar or 0),
                     "created_at": product.created_at.isoformat() if product.created_at else None
                 })
@@ -2582,7 +3745,8 @@ def ai_favorites_remove():
 @app.route("/api/products/<int:product_id>/image", methods=["GET"])
 def get_product_image(product_id):
     """
-    Get product image from database.
+    Get product image URL from database.
+    Image bytes are served separately by /media/<hash>.
     
     Args:
         product_id: Product identifier (URL parameter)
@@ -2591,7 +3755,7 @@ def get_product_image(product_id):
         JSON: {ok, product_id, name, image_url, price_sar}
     """
     try:
-        product = Product.query.get(product_id)
+        product = Product.query_with_image().get(product_id)
 
         if not product:
             return jsonify({
@@ -2604,7 +3768,7 @@ def get_product_image(product_id):
             "ok": True,
             "product_id": product_id,
             "name": product.name,
-            "image_url": product.image_primary,
+            "image_url": media_url(product.image_primary),
             "price_sar": float(product.price_sar or 0)
         })
 
@@ -2639,7 +3803,7 @@ def get_cart_products_with_images():
 
         # Process each cart item
         for product_id, cart_item in cart.items():
-            product = Product.query.filter_by(id=product_id).first()
+            product = Product.query_with_image().filter_by(id=product_id).first()
 
             if product:
                 # Product found in database
@@ -2648,7 +3812,7 @@ def get_cart_products_with_images():
                     "name": product.name or cart_item.get("name", "Product"),
                     "price": float(product.price_sar or cart_item.get("price", 0)),
                     "qty": cart_item.get("qty", 1),
-                    "image_url": product.image_primary
+                    "image_url": variant_url(product.image_primary, THUMB_SMALL)
                 })
             else:
                 # Product not in database
@@ -2668,8 +3832,242 @@ def get_cart_products_with_images():
 
     except Exception as e:
         return jsonify({"ok": False, "message": str(e)}), 500
+
+
+# -----------------------------------------------------------------------------
+# 21.3 Serve Stored Image
+# -----------------------------------------------------------------------------
+
+# Blobs are content-addressed, so a URL never changes its bytes
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@app.route("/media/<digest>", methods=["GET"])
+def media_blob(digest):
+    """
+    Stream raw image bytes from the blob store.
+
+    The sha256 digest doubles as a strong ETag, so browsers and CDNs can
+    cache forever. Supports If-None-Match (304) and Range (206) requests.
+
+    Args:
+        digest: sha256 hex digest of the image (URL parameter)
+
+    Returns:
+        Image bytes with detected content type, 304, 206 or 404
+    """
+    if not is_valid_digest(digest):
+        abort(404)
+
+    # Cheap revalidation: the ETag is the digest, no need to touch the store
+    if digest in request.if_none_match and image_store.exists(digest):
+        response = app.response_class(status=304)
+        response.set_etag(digest)
+        response.headers["Cache-Control"] = MEDIA_CACHE_CONTROL
+        return response
+
+    path = image_store.local_path(digest)
+    if path:
+        source = path
+    else:
+        data = image_store.get(digest)
+        if data is None:
+            abort(404)
+        source = io.BytesIO(data)
+
+    response = send_file(
+        source,
+        mimetype=image_store.content_type(digest),
+        conditional=True,
+        etag=digest,
+        max_age=31536000
+    )
+    response.headers["Cache-Control"] = MEDIA_CACHE_CONTROL
+    return response
+
+
+# -----------------------------------------------------------------------------
+# 21.4 Serve Resized Image Variant
+# -----------------------------------------------------------------------------
+
+@app.route("/media/<digest>/<int:size>", methods=["GET"])
+def media_variant_negotiated(digest, size):
+    """
+    Serve a resized variant in the best format the browser accepts.
+
+    AVIF when the image request lists image/avif and it is configured,
+    otherwise WebP (or the first configured format). This is the URL
+    listing APIs return (see variant_url).
+
+    Args:
+        digest: sha256 hex digest of the source image
+        size: Bounding box in px (128, 256 or 512)
+
+    Returns:
+        Image bytes (Vary: Accept), redirect to the original, or 404
+    """
+    fmt = image_derivatives.negotiate(request.accept_mimetypes)
+    response = send_media_variant(digest, size, fmt)
+    response.vary.add("Accept")
+    return response
+
+
+@app.route("/media/<digest>/<int:size>.<fmt>", methods=["GET"])
+def media_variant(digest, size, fmt):
+    """
+    Serve a resized WebP/AVIF variant of a stored image.
+    Variants are rendered on first request and cached on disk.
+
+    Args:
+        digest: sha256 hex digest of the source image
+        size: Bounding box in px (128, 256 or 512)
+        fmt: Output format ("webp" or "avif")
+
+    Returns:
+        Image bytes, redirect to the original if resizing is unavailable, or 404
+    """
+    return send_media_variant(digest, size, fmt)
+
+
+def send_media_variant(digest, size, fmt):
+    """Build the response for one variant (shared by both variant routes)."""
+    if not is_valid_digest(digest):
+        abort(404)
+
+    # Without Pillow (or an unsupported format) serve the original image
+    if not image_derivatives.is_supported(size, fmt):
+        if not image_store.exists(digest):
+            abort(404)
+        return redirect(url_for("media_blob", digest=digest), code=302)
+
+    etag = f"{digest}-{size}.{fmt}"
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = MEDIA_CACHE_CONTROL
+        return response
+
+    try:
+        path = image_derivatives.get_path(digest, size, fmt)
+    except Exception as e:
+        print(f"[MEDIA] Variant render failed for {digest[:12]}: {e}")
+        return redirect(url_for("media_blob", digest=digest), code=302)
+
+    if not path:
+        abort(404)
+
+    response = send_file(
+        path,
+        mimetype=image_derivatives.content_type(fmt),
+        conditional=True,
+        etag=etag,
+        max_age=31536000
+    )
+    response.headers["Cache-Control"] = MEDIA_CACHE_CONTROL
+    return response
+
+
+# -----------------------------------------------------------------------------
+# 21.5 Serve Product Image
+# -----------------------------------------------------------------------------
+
+@app.route("/media/products/<int:product_id>", methods=["GET"])
+def media_product(product_id):
+    """
+    Redirect to the current image of a product.
+
+    The redirect itself is not cached (a product image can be replaced),
+    while the target /media/<hash> URL is immutable.
+
+    Args:
+        product_id: Product identifier (URL parameter)
+
+    Query params:
+        - size: Optional thumbnail size (128, 256, 512)
+
+    Returns:
+        302 redirect to the blob, legacy inline bytes, or 404
+    """
+    product = Product.query_with_image().get(product_id)
+    if not product or not product.image_primary:
+        abort(404)
+
+    value = product.image_primary
+    size = request.args.get("size", type=int)
+
+    # Content-addressed blob
+    if parse_ref(value):
+        target = variant_url(value, size) if size in DERIVATIVE_SIZES else media_url(value)
+        response = redirect(target, code=302)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    # Legacy base64 row (not migrated yet)
+    data, content_type = decode_data_url(value)
+    if data is not None:
+        response = app.response_class(data, mimetype=content_type)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    # External URL
+    if value.startswith(("http://", "https://", "/")):
+        return redirect(value, code=302)
+
+    abort(404)
+
+
+# -----------------------------------------------------------------------------
+# 21.6 Pricing Quotes
+# -----------------------------------------------------------------------------
+
+@csrf.exempt
+@app.route("/api/pricing/quote", methods=["GET", "POST"])
+def api_pricing_quote():
+    """
+    Price AI product specs from the precomputed grid.
     
-    # =============================================================================
+    GET returns the valid values per spec field.
+    
+    Accepts JSON with:
+        - items: List of specs {product_type, formula, coverage, finish, skin_type}
+          (a single spec object is also accepted)
+    
+    Returns:
+        JSON (GET): {ok, options: {field: [values]}, max_price}
+        JSON (POST): {ok, quotes: [{base_price, final_price, size}]} aligned with items
+    """
+    if request.method == "GET":
+        return jsonify({
+            "ok": True,
+            "options": PRICE_GRID.options(),
+            "max_price": MAX_PRICE
+        })
+
+    data = request.get_json(silent=True) or {}
+    items = data.get("items")
+    if items is None:
+        items = [data]
+
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return jsonify({"ok": False, "message": "items must be a list of specs"}), 400
+
+    if len(items) > PRICING_QUOTE_MAX_ITEMS:
+        return jsonify({
+            "ok": False,
+            "message": f"At most {PRICING_QUOTE_MAX_ITEMS} items per request"
+        }), 400
+
+    quotes = []
+    for item in items:
+        quote = PRICE_GRID.quote(item)
+        product_type = PRICE_GRID.normalize(item)[0]
+        quote["size"] = PRODUCT_SIZES.get(product_type, "10g")
+        quotes.append(quote)
+
+    return jsonify({"ok": True, "quotes": quotes})
+
+
+# =============================================================================
 # 22. API - COST SHARING
 # =============================================================================
 
@@ -3746,7 +5144,11 @@ def payment_process():
                     else cart_item.get("price", 0)
                 )
                 item_qty = cart_item.get("qty", 1)
-                item_image = product.image_primary if product else None
+                item_image = (
+                    url_for("media_product", product_id=product.id, size=THUMB_SMALL)
+                    if product
+                    else None
+                )
 
                 order_item = OrderItem(
                     order_id=new_order.id,
@@ -3946,6 +5348,10 @@ def payment_process():
 # 25. API - STATISTICS
 # =============================================================================
 
+# -----------------------------------------------------------------------------
+# 25.1 Cost Sharing Stats
+# -----------------------------------------------------------------------------
+
 @csrf.exempt
 @app.route("/api/cost-sharing/stats", methods=["GET"])
 def cost_sharing_stats():
@@ -4000,8 +5406,77 @@ def cost_sharing_stats():
             }
         })
 
-    except Exception as e:
-        return jsonify({"ok": False, "message": str(e)}), 500
+    except Exception as e:
+        return jsonify({"ok": False, "message": str(e)}), 500
+
+
+# -----------------------------------------------------------------------------
+# 25.2 AI Generation Metrics
+# -----------------------------------------------------------------------------
+
+LOOPBACK_ADDRESSES = ("127.0.0.1", "::1")
+
+
+def internal_only(view):
+    """
+    Restrict a route to internal callers.
+
+    Allowed: a direct loopback request (not forwarded by a proxy), or
+    "Authorization: Bearer <AI_METRICS_TOKEN>" when the token is set.
+    Anything else gets 403.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = app.config["AI_METRICS_TOKEN"]
+        auth = request.headers.get("Authorization", "")
+
+        if token and hmac.compare_digest(auth, f"Bearer {token}"):
+            return view(*args, **kwargs)
+
+        if request.remote_addr in LOOPBACK_ADDRESSES and "X-Forwarded-For" not in request.headers:
+            return view(*args, **kwargs)
+
+        return jsonify({"ok": False, "message": "Forbidden"}), 403
+    return wrapper
+
+
+@app.route("/api/ai/metrics", methods=["GET"])
+@internal_only
+def ai_metrics():
+    """
+    Get AI generation pipeline metrics (internal only, see internal_only).
+    
+    Returns:
+        JSON: {ok, metrics: {cache, sessions, mika_memory, message_buffer, jobs, inventory, admission, breakers}}
+    """
+    return jsonify({
+        "ok": True,
+        "metrics": {
+            "cache": (
+                {"enabled": True, **generation_cache.stats()}
+                if generation_cache else {"enabled": False}
+            ),
+            "sessions": ai_session_cache.stats(),
+            "mika_memory": mika_memory.stats(),
+            "message_buffer": mika_message_buffer.stats(),
+            "jobs": {
+                "pending": job_runner.pending(),
+                "max_pending": job_runner.max_pending
+            },
+            "inventory": {
+                "target": inventory_filler.target,
+                "levels": inventory_levels(SMARTPICKS_VIBE_STYLES)
+            },
+            "admission": {
+                "images": image_admission.stats(),
+                "chat": chat_admission.stats()
+            },
+            "breakers": {
+                breaker.name: breaker.stats()
+                for breaker in (openai_image_breaker, openai_chat_breaker, twilio_breaker)
+            }
+        }
+    })
 
 
 # =============================================================================
@@ -4419,14 +5894,14 @@ def api_get_orders():
             # Build products list
             products = []
             for item in order_items:
-                product = Product.query.filter_by(id=item.product_id).first() if item.product_id else None
+                product = Product.query_with_image().filter_by(id=item.product_id).first() if item.product_id else None
 
                 products.append({
                     "id": item.product_id,
                     "name": product.name if product else "Product",
                     "price": float(item.unit_price_sar or 0),
                     "qty": item.qty,
-                    "image": product.image_primary if product else None
+                    "image": variant_url(product.image_primary, THUMB_SMALL) if product else None
                 })
 
             # Calculate simulated delivery status based on days since order
@@ -4513,13 +5988,13 @@ def api_get_order_details(order_id):
         total_qty = 0
 
         for item in order_items:
-            product = Product.query.get(item.product_id) if item.product_id else None
+            product = Product.query_with_image().get(item.product_id) if item.product_id else None
             products.append({
                 "id": item.product_id,
                 "name": product.name if product else "Product",
                 "price": float(item.unit_price_sar or 0),
                 "qty": item.qty,
-                "image": product.image_primary if product else None
+                "image": variant_url(product.image_primary, THUMB_SMALL) if product else None
             })
             total_qty += item.qty
 
@@ -4688,6 +6163,30 @@ def api_get_order_details(order_id):
 # 29.1 Mika System Prompt
 # -----------------------------------------------------------------------------
 
+# BeautyFlow facts: part of the system prompt and of the local FAQ index
+MIKA_KNOWLEDGE = (
+    ("Platform", "Saudi beauty import platform with AI packaging design, cost-sharing shipping (save 80%), and SmartPicks recommendations. Serves 20 Saudi cities. SFDA compliant."),
+    ("Order Tracking", "Account page > Orders tab > Click order for details"),
+    ("AI Design Steps", "1. Product type (Lipstick, Mascara, Blush, Foundation, Eyeliner)\n2. Formula (Water, Oil, Cream, Gel, Powder, Silicone)\n3. Coverage (Sheer, Medium, Full)\n4. Finish (Matte, Natural, Dewy, Glowy)\n5. Skin type (Normal, Oily, Dry, Combination, Sensitive)\n6. Describe your packaging"),
+    ("SmartPicks", "Choose a vibe (Cute/Luxury/Minimal) and AI generates matching products"),
+    ("Cost-Sharing", "Groups of 5 share shipping, save up to 80%"),
+    ("Shipping", "Solo (50-120 SAR) or Shared (10-25 SAR), delivery 5-16 days"),
+    ("Payment", "Credit card, Apple Pay, Mada"),
+    ("Cities", "Riyadh, Jeddah, Mecca, Medina, Dammam, Khobar, Taif, Tabuk, and more"),
+)
+
+MIKA_OWNERS = ("Najla Abdullah", "Dania Kamel", "Nora Nasser", "Bayan Ali", "Maha Zayed")
+
+
+def format_mika_knowledge(knowledge):
+    """Render knowledge items as "Title: text" blocks (lists start on a new line)."""
+    blocks = []
+    for title, text in knowledge:
+        separator = "\n" if "\n" in text else " "
+        blocks.append(f"{title}:{separator}{text}")
+    return "\n\n".join(blocks)
+
+
 MIKA_SYSTEM_PROMPT = """You are Mika, BeautyFlow's smart AI assistant.
 
 YOU CAN ANSWER ANY QUESTION ON ANY TOPIC. You are a general-purpose AI assistant.
@@ -4710,35 +6209,11 @@ ABOUT YOURSELF:
 - You can help with anything: questions, advice, information, creative tasks
 
 BEAUTYFLOW KNOWLEDGE:
-Platform: Saudi beauty import platform with AI packaging design, cost-sharing shipping (save 80%), and SmartPicks recommendations. Serves 20 Saudi cities. SFDA compliant.
-
-Order Tracking: Account page > Orders tab > Click order for details
-
-AI Design Steps:
-1. Product type (Lipstick, Mascara, Blush, Foundation, Eyeliner)
-2. Formula (Water, Oil, Cream, Gel, Powder, Silicone)
-3. Coverage (Sheer, Medium, Full)
-4. Finish (Matte, Natural, Dewy, Glowy)
-5. Skin type (Normal, Oily, Dry, Combination, Sensitive)
-6. Describe your packaging
-
-SmartPicks: Choose a vibe (Cute/Luxury/Minimal) and AI generates matching products
-
-Cost-Sharing: Groups of 5 share shipping, save up to 80%
-
-Shipping: Solo (50-120 SAR) or Shared (10-25 SAR), delivery 5-16 days
-
-Payment: Credit card, Apple Pay, Mada
-
-Cities: Riyadh, Jeddah, Mecca, Medina, Dammam, Khobar, Taif, Tabuk, and more
+{knowledge}
 
 BEAUTYFLOW OWNERSHIP:
 BeautyFlow is a Saudi graduation project created with love by five Saudi female students:
-1. Najla Abdullah
-2. Dania Kamel
-3. Nora Nasser
-4. Bayan Ali
-5. Maha Zayed
+{owners}
 
 If the user asks:
 - "Who owns BeautyFlow?"
@@ -4751,11 +6226,399 @@ NAMING:
 - If a user asks what BF or bf means, you must answer that it stands for BeautyFlow.
 
 
-"""
+""".format(
+    knowledge=format_mika_knowledge(MIKA_KNOWLEDGE),
+    owners="\n".join(f"{i}. {name}" for i, name in enumerate(MIKA_OWNERS, 1))
+)
+
+
+MIKA_LOGIN_REPLY = "Hi there! 💕 I'm Mika, your BeautyFlow assistant. To chat with me and get personalized help, please <a href='/login' style='color:#e84a7f;font-weight:600;'>login</a> or <a href='/signup' style='color:#e84a7f;font-weight:600;'>create an account</a> first! I can't wait to help you discover amazing beauty products! ✨"
+
+MIKA_FALLBACK_REPLY = "I apologize, I am having trouble right now. Please try again."
+
+
+# -----------------------------------------------------------------------------
+# 29.2 Mika FAQ Index
+# -----------------------------------------------------------------------------
+
+# Extra search words per knowledge item (how users phrase the question)
+MIKA_FAQ_KEYWORDS = {
+    "Platform": "about beautyflow platform",
+    "Order Tracking": "track tracking order status where my order",
+    "AI Design Steps": "ai design custom packaging steps create",
+    "SmartPicks": "smart picks smartpicks vibe recommendation",
+    "Cost-Sharing": "cost sharing share group shipping save work",
+    "Shipping": "shipping cost price solo shared",
+    "Payment": "pay",
+    "Cities": "city serve",
+}
+
+
+def build_mika_faq_entries():
+    """
+    Collect FAQ entries from the knowledge block, help.html and SUPPORTED_CITIES.
+    
+    Returns:
+        list: [(question, answer, keywords)]
+    """
+    entries = [
+        (title, format_mika_knowledge([(title, text)]), MIKA_FAQ_KEYWORDS.get(title, ""))
+        for title, text in MIKA_KNOWLEDGE
+    ]
+
+    owners = "\n".join(f"{i}. {name}" for i, name in enumerate(MIKA_OWNERS, 1))
+    entries.append((
+        "Who owns BeautyFlow?",
+        "BeautyFlow is a Saudi graduation project created with love by five Saudi female students:\n" + owners,
+        "owner founder creator founded created made team"
+    ))
+    entries.append((
+        "What does BF mean?",
+        "BF is the official abbreviation of BeautyFlow.",
+        "bf abbreviation stand meaning"
+    ))
+
+    try:
+        help_html = (TEMPLATES_DIR / "help.html").read_text(encoding="utf-8")
+        entries.extend((question, answer, "") for question, answer in help_page_entries(help_html))
+    except OSError as e:
+        print(f"[Mika] help.html FAQ skipped: {e}")
+
+    cities = sorted(SUPPORTED_CITIES.values(), key=lambda c: c["name_en"])
+    entries.append((
+        "Which cities does BeautyFlow deliver to?",
+        f"BeautyFlow delivers to {len(cities)} Saudi cities: "
+        + ", ".join(c["name_en"] for c in cities) + ".",
+        "supported city cities list deliver serve available"
+    ))
+    for key, city in SUPPORTED_CITIES.items():
+        entries.append((
+            f"Delivery to {city['name_en']}",
+            f"Delivery to {city['name_en']} takes {city['days_min']}-{city['days_max']} days.",
+            f"{key} {city['name_en']} {city['name']} delivery days long take"
+        ))
+
+    return entries
+
+
+app.config["MIKA_FAQ"] = os.getenv("MIKA_FAQ", "1") == "1"
+
+mika_faq = FaqIndex(build_mika_faq_entries()) if app.config["MIKA_FAQ"] else None
+print("[DEBUG] Mika FAQ:", f"{len(mika_faq)} entries" if mika_faq else "disabled")
+
+_ARABIC_RE = re.compile(r"[\u0600-\u06FF]")
+
+
+def mika_faq_answer(user_message):
+    """
+    Answer a fixed BeautyFlow question from the local index.
+    
+    Arabic messages always go to the LLM, which answers in Arabic.
+    
+    Returns:
+        str: Formatted answer, or None to ask the LLM
+    """
+    if mika_faq is None or _ARABIC_RE.search(user_message):
+        return None
+
+    started = time.perf_counter()
+    match = mika_faq.answer(user_message)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if match is None:
+        return None
+
+    print(f"[Mika] FAQ hit '{match['question']}' (score {match['score']}, {elapsed_ms:.2f} ms)")
+    return format_mika_html(match["answer"])
+
+
+# -----------------------------------------------------------------------------
+# 29.3 Mika Data Intents
+# -----------------------------------------------------------------------------
+
+def view_json(view, *args):
+    """
+    Call a JSON API view in the current request and return its payload.
+    
+    Returns:
+        tuple: (data, status_code)
+    """
+    result = view(*args)
+    response, status = result if isinstance(result, tuple) else (result, result.status_code)
+    return response.get_json(), status
+
+
+def mika_intent_answer(user_id, user_message):
+    """
+    Answer order / group status questions from the user's own data.
+    
+    Uses the same views as the account and cost-sharing pages
+    (api_get_order_details, groups_my_group), so the reply matches what
+    the user sees there.
+    
+    Returns:
+        tuple: (intent, formatted reply), or (None, None) to continue
+    """
+    if _ARABIC_RE.search(user_message):
+        return None, None
+
+    intent, slots = classify_intent(user_message)
+
+    if intent == INTENT_ORDER_STATUS:
+        order_id = slots.get("order_id")
+        if order_id is None:
+            order_id = db.session.query(Order.id).filter_by(
+                user_id=user_id
+            ).order_by(Order.id.desc()).limit(1).scalar()
+            if order_id is None:
+                return intent, no_orders_reply()
+
+        data, status = view_json(api_get_order_details, order_id)
+        if status == 404:
+            return intent, order_not_found_reply(order_id)
+        if status != 200 or not data.get("ok"):
+            return None, None
+        return intent, format_mika_html(order_reply(data["order"]))
+
+    if intent == INTENT_GROUP_STATUS:
+        data, status = view_json(groups_my_group)
+        if status != 200 or not data.get("ok"):
+            return None, None
+        return intent, format_mika_html(group_reply(data))
+
+    return None, None
+
+
+def mika_local_answer(user_id, user_message):
+    """
+    Answer without OpenAI when possible: user data intents first, then the FAQ.
+    
+    Returns:
+        tuple: (formatted reply, source) or (None, None)
+    """
+    try:
+        intent, reply = mika_intent_answer(user_id, user_message)
+        if reply:
+            print(f"[Mika] Intent {intent} answered from the database")
+            return reply, intent
+    except Exception as e:
+        print(f"[Mika] Intent error: {e}")
+
+    reply = mika_faq_answer(user_message)
+    if reply:
+        return reply, "faq"
+    return None, None
+
+
+# -----------------------------------------------------------------------------
+# 29.4 Mika Conversation Memory
+# -----------------------------------------------------------------------------
+
+MIKA_SUMMARY_PROMPT = """Summarize this conversation between a user and Mika, BeautyFlow's assistant, in at most 5 short sentences.
+Keep names, preferences, products, orders and open questions. Reply with the summary only."""
+
+
+def mika_message_text(content):
+    """Stored replies are HTML-formatted; turn them back into plain text."""
+    return content.replace("<br>", "\n")
+
+
+def summarize_mika_history(previous_summary, messages):
+    """
+    Fold older messages into the rolling summary (runs on mika_summary_pool).
+    
+    Args:
+        previous_summary: Current summary text ("" for none)
+        messages: [(id, role, content)] oldest first
+    
+    Returns:
+        str: Updated summary
+    """
+    transcript = "\n".join(f"{role}: {content}" for _, role, content in messages)
+    user_content = f"Previous summary:\n{previous_summary or 'None'}\n\nNew messages:\n{transcript}"
+
+    with chat_admission.slot():
+        response = resilient_call(
+            lambda timeout: OpenAI_Client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": MIKA_SUMMARY_PROMPT},
+                    {"role": "user", "content": user_content}
+                ],
+                max_tokens=app.config["MIKA_SUMMARY_TOKENS"],
+                temperature=0.2,
+                timeout=timeout
+            ),
+            openai_chat_breaker,
+            is_transient=is_transient_openai_error,
+            deadline=app.config["OPENAI_CHAT_TIMEOUT"]
+        )
+    return response.choices[0].message.content
+
+
+mika_summary_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mika-summary")
+
+mika_memory = ConversationMemory(
+    summarize_mika_history,
+    mika_summary_pool,
+    token_budget=app.config["MIKA_HISTORY_TOKENS"],
+    max_messages=app.config["MIKA_HISTORY_MESSAGES"],
+    fold_after=app.config["MIKA_SUMMARY_FOLD"]
+)
+
+mika_message_buffer = MessageBuffer(
+    app,
+    max_batch=app.config["MIKA_WRITE_BATCH"],
+    max_delay=app.config["MIKA_WRITE_DELAY_MS"] / 1000
+)
+
+if app.config["MIKA_WRITE_BEHIND"]:
+    mika_message_buffer.start()
+
+
+def mika_history(user_id):
+    """
+    Earlier turns of the user's open session as chat messages.
+    
+    One keyset page on (session_id, id DESC), packed into the token
+    budget; the rolling summary stands in for anything older, and older
+    turns it does not cover yet are kept verbatim.
+    
+    Returns:
+        list: [{role, content}] to send between the system prompt and the new message
+    """
+    if not app.config["MIKA_HISTORY"]:
+        return []
+
+    try:
+        session_id = open_session_id(user_id, ai_session_cache)
+        if session_id is None:
+            return []
+
+        rows = db.session.query(
+            AIMessage.id, AIMessage.role, AIMessage.content
+        ).filter(
+            AIMessage.session_id == session_id
+        ).order_by(AIMessage.id.desc()).limit(mika_memory.page_size).all()
+
+        summary, kept = mika_memory.context(
+            session_id,
+            [(row.id, row.role, mika_message_text(row.content)) for row in rows]
+        )
+
+    except Exception as e:
+        print(f"[Mika] History skipped: {e}")
+        return []
+
+    history = []
+    if summary:
+        history.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    history.extend({"role": role, "content": content} for _, role, content in kept)
+    return history
+
+
+# -----------------------------------------------------------------------------
+# 29.5 Mika Helpers
+# -----------------------------------------------------------------------------
+
+def mika_completion(user_message, timeout, stream=False, history=()):
+    """Call gpt-4o-mini with the Mika system prompt and earlier turns."""
+    return OpenAI_Client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": MIKA_SYSTEM_PROMPT},
+            *history,
+            {"role": "user", "content": user_message}
+        ],
+        max_tokens=400,
+        temperature=0.7,
+        stream=stream,
+        timeout=timeout
+    )
+
+
+def format_mika_html(text):
+    """Convert line breaks to HTML for display."""
+    return text.replace("\n", "<br>")
+
+
+def format_mika_stream(deltas):
+    """
+    Format streamed text deltas like format_mika_html(text.strip()).
+
+    Leading whitespace is dropped and trailing whitespace is held back
+    until more text follows, so the concatenated chunks equal the
+    formatted full reply.
+
+    Yields:
+        str: HTML chunks
+    """
+    started = False
+    pending = ""
+
+    for delta in deltas:
+        if not delta:
+            continue
+
+        text = pending + delta
+        if not started:
+            text = text.lstrip()
+            if not text:
+                continue
+            started = True
+
+        body = text.rstrip()
+        pending = text[len(body):]
+        if body:
+            yield format_mika_html(body)
+
+
+def mika_expression(user_message):
+    """Pick Mika's expression from the user's message."""
+    msg_lower = user_message.lower()
+
+    if any(word in msg_lower for word in ["angry", "mad", "frustrated", "terrible", "hate" , "?????"]):
+        return "sad"
+    if any(word in msg_lower for word in ["sad", "disappointed", "problem", "issue", "wrong"]):
+        return "sad"
+    if any(word in msg_lower for word in ["thank", "thanks", "awesome", "great", "love", "perfect", "شكر"]):
+        return "love"
+    if any(word in msg_lower for word in ["how", "what", "why", "where", "?", "كيف", "ايش", "وين"]):
+        return "thinking"
+    return "happy"
+
+
+def save_mika_exchange(user_id, user_message, mika_response):
+    """
+    Save both sides of an exchange (errors are logged, not raised).
+    
+    With an open session known, the messages go to mika_message_buffer
+    and are written within MIKA_WRITE_DELAY_MS; otherwise (first chat,
+    or write-behind disabled) they are saved here in one commit together
+    with the new session.
+    """
+    try:
+        if app.config["MIKA_WRITE_BEHIND"]:
+            session_id = open_session_id(user_id, ai_session_cache)
+            if session_id is not None:
+                mika_message_buffer.add(session_id, "user", user_message)
+                mika_message_buffer.add(session_id, "assistant", mika_response)
+                return
+
+        user_msg = AIMessage(role="user", content=user_message)
+        bot_msg = AIMessage(role="assistant", content=mika_response)
+        assign_open_session([user_msg, bot_msg], user_id, ai_session_cache)
+
+        db.session.add_all([user_msg, bot_msg])
+        db.session.commit()
+
+    except Exception as db_error:
+        db.session.rollback()
+        print(f"[Mika] DB save error: {db_error}")
 
 
 # -----------------------------------------------------------------------------
-# 29.2 Mika Chat Endpoint
+# 29.6 Mika Chat Endpoint
 # -----------------------------------------------------------------------------
 
 @csrf.exempt
@@ -4768,14 +6631,21 @@ def mika_chat():
     Accepts JSON with:
         - message: User's message (required)
     
+    Questions about the user's orders or shipping group are answered from
+    the database, and fixed BeautyFlow questions (owners, cities,
+    shipping...) from the local FAQ index, without calling OpenAI.
+    Other messages are sent with the session's recent turns and rolling
+    summary (see mika_history).
+    
     Returns:
-        JSON: {ok, response, expression}
+        JSON: {ok, response, expression, source} - source is "faq",
+              "order_status" or "group_status" for local answers
     """
     user_id = session.get("user_id")
     if not user_id:
         return jsonify({
             "ok": True,
-            "response": "Hi there! 💕 I'm Mika, your BeautyFlow assistant. To chat with me and get personalized help, please <a href='/login' style='color:#e84a7f;font-weight:600;'>login</a> or <a href='/signup' style='color:#e84a7f;font-weight:600;'>create an account</a> first! I can't wait to help you discover amazing beauty products! ✨",
+            "response": MIKA_LOGIN_REPLY,
             "expression": "happy"
         }), 200
 
@@ -4789,69 +6659,37 @@ def mika_chat():
 
         print(f"[Mika] User {user_id}: {user_message[:100]}")
 
-        # Call OpenAI API
-        response = OpenAI_Client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": MIKA_SYSTEM_PROMPT},
-                {"role": "user", "content": user_message}
-            ],
-            max_tokens=400,
-            temperature=0.7
-        )
-
-        mika_response = response.choices[0].message.content.strip()
-
-        # Convert line breaks to HTML for display
-        mika_response = mika_response.replace("\n\n", "<br><br>").replace("\n", "<br>")
+        # Order/group status and fixed BeautyFlow questions are answered locally
+        local_response, source = mika_local_answer(user_id, user_message)
+        if local_response:
+            save_mika_exchange(user_id, user_message, local_response)
+            return jsonify({
+                "ok": True,
+                "response": local_response,
+                "expression": mika_expression(user_message),
+                "source": source
+            })
 
-        # Detect expression based on message content
-        expression = "happy"  # Default expression
-        msg_lower = user_message.lower()
+        # Call OpenAI API (rate-limited, waits for a slot)
+        # Chat completions are read-only, so they are safe to retry;
+        # an open circuit falls through to the fallback reply below
+        chat_admission.admit(user_id)
+        history = mika_history(user_id)
+        with chat_admission.slot(user_id):
+            response = resilient_call(
+                lambda timeout: mika_completion(user_message, timeout, history=history),
+                openai_chat_breaker,
+                retries=app.config["OPENAI_CHAT_RETRIES"],
+                is_transient=is_transient_openai_error,
+                deadline=app.config["OPENAI_CHAT_TIMEOUT"]
+            )
 
-        if any(word in msg_lower for word in ["angry", "mad", "frustrated", "terrible", "hate" , "?????"]):
-            expression = "sad"
-        elif any(word in msg_lower for word in ["sad", "disappointed", "problem", "issue", "wrong"]):
-            expression = "sad"
-        elif any(word in msg_lower for word in ["thank", "thanks", "awesome", "great", "love", "perfect", "شكر"]):
-            expression = "love"
-        elif any(word in msg_lower for word in ["how", "what", "why", "where", "?", "كيف", "ايش", "وين"]):
-            expression = "thinking"
+        mika_response = format_mika_html(response.choices[0].message.content.strip())
+        expression = mika_expression(user_message)
 
         print(f"[Mika] Response: {mika_response[:100]}...")
 
-        # Save conversation to database
-        try:
-            # Get or create AI session
-            mika_session = AISession.query.filter_by(
-                account_id=user_id,
-                status="OPEN"
-            ).first()
-
-            if not mika_session:
-                mika_session = AISession(account_id=user_id, status="OPEN")
-                db.session.add(mika_session)
-                db.session.flush()
-
-            # Save user message
-            user_msg = AIMessage(
-                session_id=mika_session.id,
-                role="user",
-                content=user_message
-            )
-            db.session.add(user_msg)
-
-            # Save bot response
-            bot_msg = AIMessage(
-                session_id=mika_session.id,
-                role="assistant",
-                content=mika_response
-            )
-            db.session.add(bot_msg)
-            db.session.commit()
-
-        except Exception as db_error:
-            print(f"[Mika] DB save error: {db_error}")
+        save_mika_exchange(user_id, user_message, mika_response)
 
         return jsonify({
             "ok": True,
@@ -4859,17 +6697,239 @@ def mika_chat():
             "expression": expression
         })
 
+    except AdmissionRejected as e:
+        print(f"[Mika] Rejected for user {user_id}: {e.reason}")
+        return admission_rejected_response(e)
+
     except Exception as e:
         print(f"[Mika] Error: {e}")
         return jsonify({
             "ok": True,
-            "response": "I apologize, I am having trouble right now. Please try again.",
+            "response": MIKA_FALLBACK_REPLY,
             "expression": "sad"
         })
 
 
+# -----------------------------------------------------------------------------
+# 29.7 Mika Streaming Chat Endpoint
+# -----------------------------------------------------------------------------
+
+@csrf.exempt
+@app.route("/mika/chat/stream", methods=["POST"])
+def mika_chat_stream():
+    """
+    Mika AI Chat with the reply streamed as it is generated.
+    
+    Accepts JSON with:
+        - message: User's message (required)
+    
+    Returns:
+        SSE stream:
+            event: token   data: {html}  - next formatted chunk of the reply
+            event: done    data: {response, expression}
+            event: error   data: {message, retry_after} - partial reply is discarded
+        JSON: same as /mika/chat when not logged in, empty, rate-limited
+              or answered locally (data intents, FAQ index)
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({
+            "ok": True,
+            "response": MIKA_LOGIN_REPLY,
+            "expression": "happy"
+        }), 200
+
+    data = request.get_json(silent=True) or {}
+    user_message = (data.get("message") or "").strip()
+
+    if not user_message:
+        return jsonify({"ok": False, "message": "Empty message"}), 400
+
+    # Local answers are instant, so they are returned as plain JSON
+    local_response, source = mika_local_answer(user_id, user_message)
+    if local_response:
+        save_mika_exchange(user_id, user_message, local_response)
+        return jsonify({
+            "ok": True,
+            "response": local_response,
+            "expression": mika_expression(user_message),
+            "source": source
+        })
+
+    try:
+        chat_admission.admit(user_id)
+    except AdmissionRejected as e:
+        print(f"[Mika] Rejected for user {user_id}: {e.reason}")
+        return admission_rejected_response(e)
+
+    print(f"[Mika] User {user_id} (stream): {user_message[:100]}")
+    expression = mika_expression(user_message)
+    history = mika_history(user_id)
+
+    def event(name, payload):
+        return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+
+    def deltas(stream):
+        for chunk in stream:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content
+
+    def generate():
+        chunks = []
+
+        try:
+            with chat_admission.slot(user_id):
+                # Retries are safe until the first token has been sent
+                stream = resilient_call(
+                    lambda timeout: mika_completion(user_message, timeout, stream=True, history=history),
+                    openai_chat_breaker,
+                    retries=app.config["OPENAI_CHAT_RETRIES"],
+                    is_transient=is_transient_openai_error,
+                    deadline=app.config["OPENAI_CHAT_TIMEOUT"]
+                )
+
+                for html in format_mika_stream(deltas(stream)):
+                    chunks.append(html)
+                    yield event("token", {"html": html})
+
+        except AdmissionRejected as e:
+            print(f"[Mika] Stream rejected for user {user_id}: {e.reason}")
+            yield event("error", {"message": "Too many messages", "retry_after": e.retry_after})
+            return
+
+        except Exception as e:
+            print(f"[Mika] Stream error: {e}")
+            if chunks:
+                yield event("error", {"message": "Stream interrupted"})
+                return
+            yield event("token", {"html": MIKA_FALLBACK_REPLY})
+            yield event("done", {"response": MIKA_FALLBACK_REPLY, "expression": "sad"})
+            return
+
+        mika_response = "".join(chunks)
+        print(f"[Mika] Response: {mika_response[:100]}...")
+
+        save_mika_exchange(user_id, user_message, mika_response)
+        yield event("done", {"response": mika_response, "expression": expression})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+
+# =============================================================================
+# 30. CLI COMMANDS
+# =============================================================================
+
+# -----------------------------------------------------------------------------
+# 30.1 Backfill Images
+# -----------------------------------------------------------------------------
+
+@app.cli.command("images-backfill")
+@click.option("--table", type=click.Choice(sorted(BACKFILL_TARGETS)), multiple=True,
+              help="Table to migrate (default: all).")
+@click.option("--batch-size", default=50, show_default=True,
+              help="Rows per keyset page and commit.")
+@click.option("--checkpoint", default=str(BACKEND_ROOT / "media" / ".backfill-checkpoint.json"),
+              show_default=True, help="Progress file used to resume.")
+@click.option("--reset", is_flag=True, help="Ignore saved progress and start over.")
+@click.option("--dry-run", is_flag=True, help="Decode and count only, write nothing.")
+@click.option("--derivatives/--no-derivatives", default=False,
+              help="Also pre-render listing thumbnails.")
+def images_backfill(table, batch_size, checkpoint, reset, dry_run, derivatives):
+    """
+    Move legacy base64 images from the database into the blob store.
+
+    Usage:
+        flask --app app images-backfill [--table products] [--batch-size 50]
+
+    Safe to interrupt: progress is checkpointed after every batch and the
+    next run resumes from the last committed id.
+    """
+    tables = list(table) or list(BACKFILL_TARGETS)
+    progress = BackfillCheckpoint(checkpoint)
+
+    if reset:
+        for name in tables:
+            progress.reset(name)
+
+    on_stored = image_derivatives.pregenerate if derivatives else None
+
+    for name in tables:
+        stats = backfill_table(
+            db.session,
+            image_store,
+            name,
+            progress,
+            batch_size=batch_size,
+            dry_run=dry_run,
+            on_stored=on_stored,
+            log=click.echo
+        )
+
+        seconds = max(stats["seconds"], 1e-6)
+        click.echo(
+            f"[BACKFILL] {name} done: {stats['rows']} rows, "
+            f"{stats['bytes'] / 1e6:.1f} MB, {stats['skipped']} skipped, "
+            f"{stats['rows'] / seconds:.1f} rows/s, "
+            f"{stats['bytes'] / 1e6 / seconds:.1f} MB/s"
+            + (" (dry run)" if dry_run else "")
+        )
+
+
+# -----------------------------------------------------------------------------
+# 30.2 Recover AI Jobs
+# -----------------------------------------------------------------------------
+
+@app.cli.command("jobs-recover")
+def jobs_recover():
+    """
+    Requeue stale RUNNING jobs and run every queued job once.
+
+    Usage:
+        flask --app app jobs-recover
+
+    For deployments with AI_JOBS_RECOVER=0; the command exits when the
+    scheduled jobs have finished.
+    """
+    scheduled = job_runner.recover()
+    click.echo(f"[JOBS] Running {scheduled} queued job(s)")
+
+
+# -----------------------------------------------------------------------------
+# 30.3 Fill SmartPicks Inventory
+# -----------------------------------------------------------------------------
+
+@app.cli.command("inventory-fill")
+@click.option("--target", type=int, default=None,
+              help="Designs to keep per vibe (default: AI_INVENTORY_TARGET).")
+def inventory_fill(target):
+    """
+    Top up the SmartPicks warm inventory once, ignoring the off-peak window.
+
+    Usage:
+        flask --app app inventory-fill [--target 4]
+
+    Meant for cron during off-peak hours when the in-process filler
+    (AI_INVENTORY_FILLER=1) is not used.
+    """
+    if target is not None:
+        inventory_filler.target = target
+
+    added = inventory_filler.fill_once(force=True)
+    levels = inventory_levels(SMARTPICKS_VIBE_STYLES)
+
+    for vibe, count in levels.items():
+        click.echo(f"[INVENTORY] {vibe}: {count} ready (+{added.get(vibe, 0)})")
+
+
 # =============================================================================
-# 30. RUN SERVER
+# 31. RUN SERVER
 # =============================================================================
 
 if __name__ == "__main__":
@@ -0,0 +1,43 @@
+"""Share generation images with their product
+
+Revision ID: 3f9c2a7d1b64
+Revises: eb52fa595d8e
+Create Date: 2026-10-17 10:12:41.318220
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d1b64'
+down_revision = 'eb52fa595d8e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Generation rows that duplicate their product's image now reference it
+    # through product_id instead of storing a second copy.
+    op.execute(sa.text(
+        """
+        UPDATE ai_generations AS g
+        SET image_url = NULL
+        FROM products AS p
+        WHERE g.product_id = p.id
+          AND g.image_url IS NOT NULL
+          AND g.image_url = p.image_primary
+        """
+    ))
+
+
+def downgrade():
+    op.execute(sa.text(
+        """
+        UPDATE ai_generations AS g
+        SET image_url = p.image_primary
+        FROM products AS p
+        WHERE g.product_id = p.id
+          AND g.image_url IS NULL
+        """
+    ))
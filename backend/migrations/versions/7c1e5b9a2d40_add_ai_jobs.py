@@ -0,0 +1,46 @@
+"""Add ai_jobs table
+
+Revision ID: 7c1e5b9a2d40
+Revises: 3f9c2a7d1b64
+Create Date: 2026-10-17 11:04:27.502913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e5b9a2d40'
+down_revision = '3f9c2a7d1b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'ai_jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('account_id', sa.BigInteger(), nullable=False),
+        sa.Column('kind', sa.String(length=30), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('payload_json', sa.JSON(), nullable=True),
+        sa.Column('result_json', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['account_id'], ['accounts.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('ai_jobs', schema=None) as batch_op:
+        batch_op.create_index('idx_ai_jobs_account_created', ['account_id', 'created_at'], unique=False)
+        batch_op.create_index('idx_ai_jobs_status', ['status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ai_jobs', schema=None) as batch_op:
+        batch_op.drop_index('idx_ai_jobs_status')
+        batch_op.drop_index('idx_ai_jobs_account_created')
+
+    op.drop_table('ai_jobs')
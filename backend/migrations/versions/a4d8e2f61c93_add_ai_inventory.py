@@ -0,0 +1,37 @@
+"""Add ai_inventory table
+
+Revision ID: a4d8e2f61c93
+Revises: 7c1e5b9a2d40
+Create Date: 2026-10-17 12:21:08.774105
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d8e2f61c93'
+down_revision = '7c1e5b9a2d40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'ai_inventory',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('vibe', sa.String(length=20), nullable=False),
+        sa.Column('prompt', sa.Text(), nullable=False),
+        sa.Column('image_ref', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('ai_inventory', schema=None) as batch_op:
+        batch_op.create_index('idx_ai_inventory_vibe', ['vibe', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ai_inventory', schema=None) as batch_op:
+        batch_op.drop_index('idx_ai_inventory_vibe')
+
+    op.drop_table('ai_inventory')
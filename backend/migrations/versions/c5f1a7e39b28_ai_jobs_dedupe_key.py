@@ -0,0 +1,37 @@
+"""Add in-flight dedupe key to ai_jobs
+
+Revision ID: c5f1a7e39b28
+Revises: a4d8e2f61c93
+Create Date: 2026-10-17 13:40:52.118630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f1a7e39b28'
+down_revision = 'a4d8e2f61c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ai_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('dedupe_key', sa.String(length=64), nullable=True))
+
+    # Only one QUEUED/RUNNING job per key; finished jobs release it
+    op.create_index(
+        'uq_ai_jobs_inflight_dedupe',
+        'ai_jobs',
+        ['dedupe_key'],
+        unique=True,
+        postgresql_where=sa.text("status IN ('QUEUED', 'RUNNING')")
+    )
+
+
+def downgrade():
+    op.drop_index('uq_ai_jobs_inflight_dedupe', table_name='ai_jobs')
+
+    with op.batch_alter_table('ai_jobs', schema=None) as batch_op:
+        batch_op.drop_column('dedupe_key')
@@ -0,0 +1,30 @@
+"""Index ai_sessions for the latest open session lookup
+
+Revision ID: d8b3f0a27c61
+Revises: c5f1a7e39b28
+Create Date: 2026-10-17 15:02:37.406215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8b3f0a27c61'
+down_revision = 'c5f1a7e39b28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ai_sessions', schema=None) as batch_op:
+        batch_op.create_index(
+            'idx_ai_sessions_account_status',
+            ['account_id', 'status', 'id'],
+            unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('ai_sessions', schema=None) as batch_op:
+        batch_op.drop_index('idx_ai_sessions_account_status')
@@ -0,0 +1,27 @@
+"""Extend the ai_messages session index with id for keyset history pages
+
+Revision ID: e2a6c94f1d07
+Revises: d8b3f0a27c61
+Create Date: 2026-10-17 16:18:05.552913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a6c94f1d07'
+down_revision = 'd8b3f0a27c61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created with create_all() already have the single-column index
+    op.execute('DROP INDEX IF EXISTS idx_ai_messages_session')
+    op.create_index('idx_ai_messages_session', 'ai_messages', ['session_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_ai_messages_session', table_name='ai_messages')
+    op.create_index('idx_ai_messages_session', 'ai_messages', ['session_id'], unique=False)
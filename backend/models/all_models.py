@@ -16,6 +16,7 @@ Version: 1.0.0
 
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import Enum as SAEnum, JSON, UniqueConstraint, Index
+from sqlalchemy.orm import deferred, undefer_group
 import enum
 
 # Initialize SQLAlchemy
@@ -258,7 +259,10 @@ class Product(db.Model):
     name = db.Column(db.String(160), nullable=False)
     sku = db.Column(db.String(80), unique=True, nullable=False)
     description = db.Column(db.Text)
-    image_primary = db.Column(db.Text)
+
+    # Deferred: legacy rows hold multi-MB base64 data URLs, so the image
+    # is only loaded by queries that opt in via query_with_image()
+    image_primary = deferred(db.Column(db.Text), group="image")
 
     # === Product Status ===
     origin = db.Column(
@@ -294,6 +298,11 @@ class Product(db.Model):
     # === Timestamps ===
     created_at = db.Column(db.DateTime, server_default=db.func.now())
 
+    @classmethod
+    def query_with_image(cls):
+        """Product query that also loads the deferred image column."""
+        return cls.query.options(undefer_group("image"))
+
 
 # =============================================================================
 # 5. ORDERS - 
@@ -517,6 +526,9 @@ class AIMessage(db.Model):
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
 
+    # === Relationships ===
+    session = db.relationship("AISession")
+
 
 # -----------------------------------------------------------------------------
 # 7.3 AI Generation
@@ -536,11 +548,65 @@ class AIGeneration(db.Model):
         db.BigInteger, 
         db.ForeignKey("products.id")
     )
-    image_url = db.Column(db.Text)
+
+    # Only set when the generation has no product; otherwise the image
+    # is shared with Product.image_primary (single stored copy)
+    image_url = deferred(db.Column(db.Text), group="image")
     prompt_json = db.Column(JSON)
     meta_json = db.Column(JSON)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
 
+    # === Relationships ===
+    session = db.relationship("AISession")
+    product = db.relationship("Product")
+
+
+# -----------------------------------------------------------------------------
+# 7.4 AI Job
+# -----------------------------------------------------------------------------
+
+class AIJob(db.Model):
+    """
+    Background AI generation job (see /ai/jobs).
+    Persisted so queued work survives a server restart.
+    """
+    __tablename__ = "ai_jobs"
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    account_id = db.Column(
+        db.BigInteger, 
+        db.ForeignKey("accounts.id"), 
+        nullable=False
+    )
+    kind = db.Column(db.String(30), nullable=False)  # packaging
+    status = db.Column(db.String(20), nullable=False, default="QUEUED")  # QUEUED / RUNNING / SUCCEEDED / FAILED
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    dedupe_key = db.Column(db.String(64))  # singleflight key, unique while in flight
+    payload_json = db.Column(JSON)
+    result_json = db.Column(JSON)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
+# -----------------------------------------------------------------------------
+# 7.5 AI Inventory Item
+# -----------------------------------------------------------------------------
+
+class AIInventoryItem(db.Model):
+    """
+    Pre-generated SmartPicks design waiting to be claimed.
+    Rows are deleted when a user claims them.
+    """
+    __tablename__ = "ai_inventory"
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    vibe = db.Column(db.String(20), nullable=False)
+    prompt = db.Column(db.Text, nullable=False)
+    image_ref = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
 
 # =============================================================================
 # 8. NOTIFICATIONS - 
@@ -610,8 +676,20 @@ Index("idx_products_owner", Product.owner_user_id)
 Index("idx_products_origin", Product.origin)
 
 # AI indexes
-Index("idx_ai_messages_session", AIMessage.session_id)
+# Backs the "latest OPEN session per account" lookup
+Index("idx_ai_sessions_account_status", AISession.account_id, AISession.status, AISession.id)
+# Keyset pages of a session's latest messages (Mika history)
+Index("idx_ai_messages_session", AIMessage.session_id, AIMessage.id)
 Index("idx_ai_generations_session", AIGeneration.session_id)
+Index("idx_ai_jobs_account_created", AIJob.account_id, AIJob.created_at)
+Index("idx_ai_jobs_status", AIJob.status)
+Index(
+    "uq_ai_jobs_inflight_dedupe",
+    AIJob.dedupe_key,
+    unique=True,
+    postgresql_where=AIJob.status.in_(["QUEUED", "RUNNING"])
+)
+Index("idx_ai_inventory_vibe", AIInventoryItem.vibe, AIInventoryItem.id)
 
 # Wishlist indexes
 Index("idx_wishlist_account", Wishlist.account_id)
\ No newline at end of file
@@ -0,0 +1,267 @@
+"""
+============================================================================
+BeautyFlow - Admission Control
+============================================================================
+Limits how hard BeautyFlow can hit the OpenAI API.
+
+Two layers, one controller per upstream (images, chat):
+
+1. Rate: token buckets per user and globally, checked when a request
+   arrives. An empty bucket is answered immediately with 429 and a
+   Retry-After hint.
+2. Concurrency: a global and per-user slot limit held around the actual
+   API call. Callers beyond either limit wait in a bounded queue. When
+   the queue is full, or the wait exceeds max_wait, they are rejected
+   instead of piling up.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+
+# =============================================================================
+# 2. ERRORS
+# =============================================================================
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is not admitted.
+
+    Attributes:
+        reason: "user_rate", "global_rate", "queue_full" or "wait_timeout"
+        retry_after: Suggested wait in whole seconds
+    """
+
+    def __init__(self, reason, retry_after=1):
+        super().__init__(f"Too many AI requests right now ({reason}), please try again shortly")
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+# =============================================================================
+# 3. TOKEN BUCKET
+# =============================================================================
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, up to `burst` stored.
+    Not thread-safe on its own; AdmissionController holds the lock.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now, count=1):
+        """
+        Take `count` tokens (capped at burst, so a batch larger than the
+        bucket can still be admitted once it is full).
+
+        Returns:
+            float: 0 if taken, otherwise seconds until enough tokens are available
+        """
+        # now may predate a bucket created after it was read
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+        count = min(count, self.burst)
+        if self.tokens >= count:
+            self.tokens -= count
+            return 0.0
+        return (count - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+    def give_back(self, count=1):
+        """Return tokens taken for a request that never ran."""
+        self.tokens = min(self.burst, self.tokens + min(count, self.burst))
+
+
+# =============================================================================
+# 4. ADMISSION CONTROLLER
+# =============================================================================
+
+class AdmissionController:
+    """
+    Rate + concurrency admission for one upstream API.
+
+    Args:
+        name: Label used in metrics (e.g. "images")
+        max_concurrency: Global in-flight calls
+        per_user_concurrency: In-flight calls per user
+        global_rate / global_burst: Global token bucket (requests/second)
+        user_rate / user_burst: Per-user token bucket (requests/second)
+        max_queue: Callers allowed to wait for a slot
+        max_wait: Seconds a caller may wait for a slot
+    """
+
+    # Idle per-user buckets are dropped after this many seconds
+    USER_IDLE_SECONDS = 3600
+
+    def __init__(self, name, max_concurrency=4, per_user_concurrency=2,
+                 global_rate=2.0, global_burst=10, user_rate=0.2, user_burst=3,
+                 max_queue=16, max_wait=30):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.per_user_concurrency = per_user_concurrency
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._cond = threading.Condition()
+        self._global_bucket = TokenBucket(global_rate, global_burst)
+        self._user_buckets = {}
+        self._inflight = 0
+        self._user_inflight = {}
+        self._waiting = 0
+
+        self._admitted = 0
+        self._rejected = {}
+        self._wait_total = 0.0
+
+    # -------------------------------------------------------------------------
+    # 4.1 Rate Check (request arrival)
+    # -------------------------------------------------------------------------
+
+    def admit(self, user_id=None, cost=1):
+        """
+        Charge a request against the per-user and global buckets.
+
+        Args:
+            user_id: Requesting user (None skips the per-user bucket)
+            cost: Upstream calls the request will make (e.g. batch size)
+
+        Raises:
+            AdmissionRejected: Bucket empty (answer 429 with retry_after)
+        """
+        now = time.monotonic()
+
+        with self._cond:
+            if user_id is not None:
+                bucket = self._user_buckets.get(user_id)
+                if bucket is None:
+                    self._prune_buckets(now)
+                    bucket = TokenBucket(self.user_rate, self.user_burst)
+                    self._user_buckets[user_id] = bucket
+
+                wait = bucket.take(now, cost)
+                if wait:
+                    self._reject("user_rate", wait)
+
+            wait = self._global_bucket.take(now, cost)
+            if wait:
+                # Give the user's tokens back; the request never ran
+                if user_id is not None:
+                    self._user_buckets[user_id].give_back(cost)
+                self._reject("global_rate", wait)
+
+    # -------------------------------------------------------------------------
+    # 4.2 Concurrency Slot (around the API call)
+    # -------------------------------------------------------------------------
+
+    @contextmanager
+    def slot(self, user_id=None):
+        """
+        Hold one concurrency slot for the duration of an upstream call.
+
+        Raises:
+            AdmissionRejected: Queue full or no slot freed up within max_wait
+        """
+        self._acquire(user_id)
+        try:
+            yield
+        finally:
+            self._release(user_id)
+
+    def _is_full(self, user_id):
+        if self._inflight >= self.max_concurrency:
+            return True
+        return user_id is not None and \
+            self._user_inflight.get(user_id, 0) >= self.per_user_concurrency
+
+    def _acquire(self, user_id):
+        started = time.monotonic()
+
+        with self._cond:
+            if self._is_full(user_id):
+                if self._waiting >= self.max_queue:
+                    self._reject("queue_full", self.max_wait)
+
+                self._waiting += 1
+                try:
+                    deadline = started + self.max_wait
+                    while self._is_full(user_id):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject("wait_timeout", self.max_wait)
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._inflight += 1
+            if user_id is not None:
+                self._user_inflight[user_id] = self._user_inflight.get(user_id, 0) + 1
+
+            self._admitted += 1
+            self._wait_total += time.monotonic() - started
+
+    def _release(self, user_id):
+        with self._cond:
+            self._inflight -= 1
+            if user_id is not None:
+                count = self._user_inflight.get(user_id, 1) - 1
+                if count > 0:
+                    self._user_inflight[user_id] = count
+                else:
+                    self._user_inflight.pop(user_id, None)
+            # Waiters may be blocked on different users' limits
+            self._cond.notify_all()
+
+    # -------------------------------------------------------------------------
+    # 4.3 Internals & Metrics
+    # -------------------------------------------------------------------------
+
+    def _reject(self, reason, retry_after):
+        self._rejected[reason] = self._rejected.get(reason, 0) + 1
+        raise AdmissionRejected(reason, retry_after)
+
+    def _prune_buckets(self, now):
+        idle = [
+            uid for uid, bucket in self._user_buckets.items()
+            if now - bucket.updated > self.USER_IDLE_SECONDS
+        ]
+        for uid in idle:
+            del self._user_buckets[uid]
+
+    def stats(self):
+        """
+        Return controller metrics.
+
+        Returns:
+            dict: {inflight, waiting, max_concurrency, max_queue, admitted,
+                   rejected, avg_wait_ms, active_users}
+        """
+        with self._cond:
+            return {
+                "inflight": self._inflight,
+                "waiting": self._waiting,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "admitted": self._admitted,
+                "rejected": dict(self._rejected),
+                "avg_wait_ms": round(self._wait_total / self._admitted * 1000, 1)
+                if self._admitted else 0.0,
+                "active_users": len(self._user_inflight),
+            }
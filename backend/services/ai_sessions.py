@@ -0,0 +1,168 @@
+"""
+============================================================================
+BeautyFlow - Open AI Session Lookup
+============================================================================
+Finds the account's open AISession for generation and chat records
+without a query per request.
+
+Committed session ids are cached per account for a short TTL. A miss
+runs one indexed "latest OPEN" query (idx_ai_sessions_account_status).
+When the account has no open session, a new one is attached to the
+records through their relationship, so it is inserted in the same flush
+as the records instead of needing a flush of its own.
+
+Only ids read back from the database are cached: a session created in
+a transaction that later rolls back can never end up in the cache.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import time
+import threading
+from collections import OrderedDict
+
+from models.all_models import db, AISession
+
+
+# =============================================================================
+# 2. CONSTANTS
+# =============================================================================
+
+# Key in db.session.info holding sessions created in the current session
+PENDING_SESSIONS_KEY = "pending_ai_sessions"
+
+
+# =============================================================================
+# 3. SESSION ID CACHE
+# =============================================================================
+
+class OpenSessionCache:
+    """
+    Thread-safe LRU + TTL cache of account id -> open AISession id.
+    """
+
+    def __init__(self, max_entries=4096, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries = OrderedDict()  # account_id -> (cached_at, session_id)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, account_id):
+        """Return the cached session id, or None."""
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(account_id)
+
+            if entry and now - entry[0] > self.ttl:
+                del self._entries[account_id]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(account_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, account_id, session_id):
+        with self._lock:
+            self._entries[account_id] = (time.monotonic(), session_id)
+            self._entries.move_to_end(account_id)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, account_id):
+        """Forget an account's session (e.g. after closing it)."""
+        with self._lock:
+            self._entries.pop(account_id, None)
+
+    def stats(self):
+        """
+        Return cache metrics.
+
+        Returns:
+            dict: {entries, hits, misses, hit_rate, ttl}
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "ttl": self.ttl,
+            }
+
+
+# =============================================================================
+# 4. SESSION ASSIGNMENT
+# =============================================================================
+
+def latest_open_session_id(account_id):
+    """Id of the account's most recent OPEN session, or None (one indexed query)."""
+    return (
+        db.session.query(AISession.id)
+        .filter_by(account_id=account_id, status="OPEN")
+        .order_by(AISession.id.desc())
+        .limit(1)
+        .scalar()
+    )
+
+
+def open_session_id(account_id, cache):
+    """
+    Id of the account's open session (cached), or None when it has none.
+    Never creates a session.
+    """
+    session_id = cache.get(account_id)
+    if session_id is None:
+        session_id = latest_open_session_id(account_id)
+        if session_id is not None:
+            cache.put(account_id, session_id)
+    return session_id
+
+
+def assign_open_session(records, account_id, cache):
+    """
+    Point AIGeneration / AIMessage records at the account's open session.
+
+    Does not flush: the records (and a new session, if one is needed)
+    are written by the caller's next flush or commit.
+
+    Args:
+        records: Records with session_id / session attributes
+        account_id: Owner account ID
+        cache: OpenSessionCache
+    """
+    pending_sessions = db.session.info.setdefault(PENDING_SESSIONS_KEY, {})
+
+    # A session created earlier in this transaction (e.g. a SmartPicks batch)
+    pending = pending_sessions.get(account_id)
+    if pending is not None and pending in db.session:
+        for record in records:
+            record.session = pending
+        return
+
+    session_id = open_session_id(account_id, cache)
+    if session_id is not None:
+        for record in records:
+            record.session_id = session_id
+        return
+
+    new_session = AISession(account_id=account_id, status="OPEN")
+    pending_sessions[account_id] = new_session
+    for record in records:
+        record.session = new_session
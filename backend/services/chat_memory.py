@@ -0,0 +1,197 @@
+"""
+============================================================================
+BeautyFlow - Chat Memory
+============================================================================
+Bounded multi-turn context for Mika.
+
+Each request loads one keyset page of the session's latest messages
+(session_id, id DESC). The newest turns that fit the token budget are
+sent verbatim; turns older than that are folded into a rolling summary
+in the background, and the cached summary stands in for them. Older
+turns the summary does not cover yet are sent verbatim too, so nothing
+drops out of context between folds. The prompt is therefore bounded by
+the page size however long the session gets.
+
+Summaries live in process memory (LRU). After a restart a session
+starts without one and the next fold rebuilds it from the loaded page.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import math
+import threading
+import traceback
+from collections import OrderedDict
+
+
+# =============================================================================
+# 2. CONSTANTS
+# =============================================================================
+
+# Rough tokens per character for English chat text (no tokenizer needed)
+CHARS_PER_TOKEN = 4
+
+# Per-message framing overhead in the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+# =============================================================================
+# 3. TOKEN BUDGETING
+# =============================================================================
+
+def estimate_tokens(text):
+    """Approximate token count of a chat message."""
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN) + MESSAGE_OVERHEAD_TOKENS
+
+
+def pack_history(messages, token_budget, max_messages):
+    """
+    Keep the newest messages that fit the budget.
+
+    Args:
+        messages: [(id, role, content)] newest first
+        token_budget: Max estimated tokens for the kept messages
+        max_messages: Max number of kept messages
+
+    Returns:
+        tuple: (kept, overflow) - both oldest first; overflow is what
+               did not fit
+    """
+    used = 0
+    kept = 0
+
+    for _, _, content in messages[:max_messages]:
+        cost = estimate_tokens(content)
+        if used + cost > token_budget:
+            break
+        used += cost
+        kept += 1
+
+    return list(reversed(messages[:kept])), list(reversed(messages[kept:]))
+
+
+# =============================================================================
+# 4. CONVERSATION MEMORY
+# =============================================================================
+
+class ConversationMemory:
+    """
+    Token-budgeted history with a rolling summary per session.
+
+    Args:
+        summarize: Callable(previous_summary, [(id, role, content)]) -> str
+        executor: Executor running the summary updates
+        token_budget: Tokens for verbatim history
+        max_messages: Max verbatim messages (2 per turn)
+        fold_after: Unsummarized overflow messages that trigger a fold
+        max_sessions: Summaries kept in memory
+    """
+
+    def __init__(self, summarize, executor, token_budget=1200, max_messages=12,
+                 fold_after=6, max_sessions=2048):
+        self.summarize = summarize
+        self.executor = executor
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.fold_after = fold_after
+        self.max_sessions = max_sessions
+
+        self._summaries = OrderedDict()  # session_id -> (through_id, text)
+        self._folding = set()
+        self._lock = threading.Lock()
+
+        self.folds = 0
+
+    @property
+    def page_size(self):
+        """Messages to load per request: the window plus one fold batch."""
+        return self.max_messages + self.fold_after * 2
+
+    def summary(self, session_id):
+        """Return (through_id, text) for a session, or (0, "")."""
+        with self._lock:
+            entry = self._summaries.get(session_id)
+            if entry is None:
+                return 0, ""
+            self._summaries.move_to_end(session_id)
+            return entry
+
+    def context(self, session_id, messages):
+        """
+        Build the context for the next completion.
+
+        Args:
+            session_id: AISession id
+            messages: [(id, role, content)] newest first (one keyset page)
+
+        Returns:
+            tuple: (summary text, messages oldest first) - the packed
+                   window plus older turns the summary does not cover yet
+        """
+        kept, overflow = pack_history(messages, self.token_budget, self.max_messages)
+        through_id, text = self.summary(session_id)
+
+        # Older turns not folded yet stay verbatim; once enough pile up,
+        # fold them in the background
+        pending = [m for m in overflow if m[0] > through_id]
+        if len(pending) >= self.fold_after:
+            self._schedule_fold(session_id, pending)
+
+        return text, pending + kept
+
+    def _schedule_fold(self, session_id, pending):
+        with self._lock:
+            if session_id in self._folding:
+                return
+            self._folding.add(session_id)
+
+        try:
+            self.executor.submit(self._fold, session_id, pending)
+        except RuntimeError:
+            # Executor shut down
+            with self._lock:
+                self._folding.discard(session_id)
+
+    def _fold(self, session_id, pending):
+        try:
+            through_id, previous = self.summary(session_id)
+            text = (self.summarize(previous, pending) or "").strip()
+            if not text:
+                return
+
+            with self._lock:
+                self._summaries[session_id] = (max(through_id, pending[-1][0]), text)
+                self._summaries.move_to_end(session_id)
+                while len(self._summaries) > self.max_sessions:
+                    self._summaries.popitem(last=False)
+                self.folds += 1
+
+        except Exception as e:
+            print(f"[MEMORY] Summary failed for session {session_id}: {e}")
+            traceback.print_exc()
+
+        finally:
+            with self._lock:
+                self._folding.discard(session_id)
+
+    def stats(self):
+        """
+        Return memory metrics.
+
+        Returns:
+            dict: {sessions, folding, folds, token_budget, max_messages}
+        """
+        with self._lock:
+            return {
+                "sessions": len(self._summaries),
+                "folding": len(self._folding),
+                "folds": self.folds,
+                "token_budget": self.token_budget,
+                "max_messages": self.max_messages,
+            }
@@ -0,0 +1,246 @@
+"""
+============================================================================
+BeautyFlow - Image Derivatives
+============================================================================
+Resized WebP/AVIF variants of stored images for listing pages.
+Variants are rendered at generation time or lazily on first request,
+then cached on disk next to the blob store.
+
+Listing URLs carry no extension (/media/<hash>/<size>): the format is
+negotiated from the image request's Accept header, so browsers that
+decode AVIF get it and the rest get WebP.
+
+Pillow is optional: without it every variant URL falls back to the
+original image.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import io
+import os
+import tempfile
+from pathlib import Path
+
+from services.image_store import parse_ref, media_url, is_valid_digest, MEDIA_URL_PREFIX
+
+# Optional: Pillow for resizing/encoding
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Optional: AVIF plugin for Pillow versions without native AVIF
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+
+# =============================================================================
+# 2. CONSTANTS
+# =============================================================================
+
+# Allowed square bounding boxes (px)
+DERIVATIVE_SIZES = (128, 256, 512)
+
+# Supported output formats -> (Pillow format, MIME type)
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "avif": ("AVIF", "image/avif"),
+}
+
+# Negotiation preference (smallest files first)
+NEGOTIATION_ORDER = ("avif", "webp")
+
+# Variant sizes used by listing pages
+THUMB_SMALL = 128      # order lists, checkout summary
+THUMB_CARD = 256       # history / favorites / cart cards
+THUMB_LARGE = 512      # product detail previews
+
+
+# =============================================================================
+# 3. HELPER FUNCTIONS
+# =============================================================================
+
+def derivatives_available():
+    """Check whether Pillow is installed."""
+    return Image is not None
+
+
+def supported_formats():
+    """
+    List derivative formats the installed Pillow can encode.
+
+    Returns:
+        list: Format keys (e.g. ["webp", "avif"])
+    """
+    if Image is None:
+        return []
+    Image.init()
+    return [
+        key for key, (pil_format, _) in DERIVATIVE_FORMATS.items()
+        if pil_format in Image.SAVE
+    ]
+
+
+def variant_url(value, size, fmt=None):
+    """
+    Build the URL of a resized variant for a stored image value.
+
+    Falls back to the original image URL for legacy values or when
+    Pillow is not installed.
+
+    Args:
+        value: Column value (blob reference or legacy URL)
+        size: One of DERIVATIVE_SIZES
+        fmt: Output format key, or None for the negotiated URL (default)
+
+    Returns:
+        str: Variant URL, original URL, or None
+    """
+    digest = parse_ref(value)
+    if not digest or Image is None:
+        return media_url(value)
+    if fmt is None:
+        return f"{MEDIA_URL_PREFIX}/{digest}/{size}"
+    return f"{MEDIA_URL_PREFIX}/{digest}/{size}.{fmt}"
+
+
+# =============================================================================
+# 4. DERIVATIVE CACHE
+# =============================================================================
+
+class DerivativeCache:
+    """
+    Renders and caches resized variants of blobs.
+    Files live at <root>/<ab>/<digest>/<size>.<fmt>.
+    """
+
+    def __init__(self, blob_store, root, formats=("webp",), quality=80):
+        self.blob_store = blob_store
+        self.root = Path(root)
+        self.quality = quality
+
+        available = supported_formats()
+        self.formats = [fmt for fmt in formats if fmt in available]
+
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def negotiate(self, accept):
+        """
+        Pick the variant format for a request.
+
+        Formats the client lists explicitly win in NEGOTIATION_ORDER;
+        a client listing none (e.g. "*/*") gets the first configured
+        format.
+
+        Args:
+            accept: Parsed Accept header (werkzeug MIMEAccept or
+                    [(mimetype, quality)])
+
+        Returns:
+            str: Format key, or None when no format is available
+        """
+        listed = {value for value, quality in accept if quality > 0}
+        for fmt in NEGOTIATION_ORDER:
+            if fmt in self.formats and DERIVATIVE_FORMATS[fmt][1] in listed:
+                return fmt
+        return self.formats[0] if self.formats else None
+
+    def is_supported(self, size, fmt):
+        """Check that a size/format pair can be served."""
+        return size in DERIVATIVE_SIZES and fmt in self.formats
+
+    def path_for(self, digest, size, fmt):
+        """Build the on-disk path of a variant."""
+        if not is_valid_digest(digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return self.root / digest[:2] / digest / f"{size}.{fmt}"
+
+    def get_path(self, digest, size, fmt):
+        """
+        Return the path of a variant, rendering it on first request.
+
+        Args:
+            digest: Source blob digest
+            size: Target bounding box (px)
+            fmt: Output format key
+
+        Returns:
+            Path: Variant file, or None if the source blob is missing
+        """
+        if not self.is_supported(size, fmt):
+            return None
+
+        path = self.path_for(digest, size, fmt)
+        if path.is_file():
+            return path
+
+        return self.render(digest, size, fmt)
+
+    def render(self, digest, size, fmt):
+        """Render one variant from the source blob and cache it."""
+        data = self.blob_store.get(digest)
+        if data is None:
+            return None
+
+        pil_format, _ = DERIVATIVE_FORMATS[fmt]
+
+        with Image.open(io.BytesIO(data)) as img:
+            img.thumbnail((size, size), Image.LANCZOS)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA")
+            buf = io.BytesIO()
+            img.save(buf, format=pil_format, quality=self.quality)
+
+        path = self.path_for(digest, size, fmt)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Atomic write: concurrent renders of the same variant are harmless
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(buf.getvalue())
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        return path
+
+    def pregenerate(self, value):
+        """
+        Render all sizes/formats for a newly stored image.
+        Errors are logged and ignored; variants are retried lazily.
+
+        Args:
+            value: Blob reference ("sha256:<hex>")
+
+        Returns:
+            int: Number of variants rendered
+        """
+        digest = parse_ref(value)
+        if not digest or not self.formats:
+            return 0
+
+        rendered = 0
+        for fmt in self.formats:
+            for size in DERIVATIVE_SIZES:
+                try:
+                    if self.get_path(digest, size, fmt):
+                        rendered += 1
+                except Exception as e:
+                    print(f"[MEDIA] Derivative {digest[:12]} {size}.{fmt} failed: {e}")
+        return rendered
+
+    @staticmethod
+    def content_type(fmt):
+        """Return MIME type for a format key."""
+        return DERIVATIVE_FORMATS[fmt][1]
@@ -0,0 +1,207 @@
+"""
+============================================================================
+BeautyFlow - FAQ Answer Index
+============================================================================
+Answers fixed BeautyFlow questions (owners, "BF", cost sharing,
+delivery days, cities...) locally instead of calling the LLM.
+
+Entries come from the Mika knowledge block, the help page FAQ and the
+supported cities table. They are indexed once at startup with BM25;
+a lookup tokenizes the question and scores the few matching entries
+(well under a millisecond for the current corpus).
+
+Only confident matches are answered: the best entry must score above
+a threshold, clearly beat the runner-up, and its question or keywords
+must contain most of the user's words (answer text alone is not enough,
+so "best mascara for oily skin" does not hit the design steps). Anything
+else returns None and goes to the LLM.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import re
+import math
+import html
+from collections import Counter
+
+
+# =============================================================================
+# 2. CONSTANTS
+# =============================================================================
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Confidence rules (see FaqIndex.answer)
+FAQ_MIN_SCORE = 3.0
+FAQ_MIN_MARGIN = 1.3
+FAQ_MIN_COVERAGE = 0.6
+FAQ_MAX_QUERY_TERMS = 12
+
+# Words that carry no meaning for matching
+STOPWORDS = frozenset("""
+a an the and or but if of to in on at by for with from about as into
+is are was were be been being am do does did doing have has had
+i me my we our you your it its they them their he she his her
+what which who whom whose when where why how
+this that these those there here can could would should will shall may might
+please tell know want need get much many any some
+""".split())
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+# help.html FAQ markup: question span, then the answer paragraph
+_HELP_FAQ_RE = re.compile(
+    r'class="faq-question">\s*<span>(.*?)</span>.*?class="faq-answer">\s*<p>(.*?)</p>',
+    re.S
+)
+
+
+# =============================================================================
+# 3. TEXT HELPERS
+# =============================================================================
+
+def stem(word):
+    """Light English suffix stripping ("cities" -> "city", "owns" -> "own")."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 4 and word.endswith("ed"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Lowercased, stemmed content words."""
+    return [
+        stem(token)
+        for token in _TOKEN_RE.findall((text or "").lower())
+        if token not in STOPWORDS
+    ]
+
+
+def clean_html(fragment):
+    """Strip tags and collapse whitespace."""
+    return " ".join(html.unescape(_TAG_RE.sub(" ", fragment)).split())
+
+
+def help_page_entries(page_html):
+    """
+    Extract the FAQ of help.html.
+
+    Returns:
+        list: [(question, answer)]
+    """
+    return [
+        (clean_html(question), clean_html(answer))
+        for question, answer in _HELP_FAQ_RE.findall(page_html or "")
+    ]
+
+
+# =============================================================================
+# 4. FAQ INDEX
+# =============================================================================
+
+class FaqIndex:
+    """
+    BM25 index over FAQ entries.
+
+    Each entry is (question, answer, keywords): question and keywords are
+    indexed with the answer, and the answer is what gets returned.
+    """
+
+    def __init__(self, entries=(), min_score=FAQ_MIN_SCORE, min_margin=FAQ_MIN_MARGIN,
+                 min_coverage=FAQ_MIN_COVERAGE):
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.min_coverage = min_coverage
+
+        self.entries = []
+        self._topics = []  # per entry: terms of question + keywords
+        self._postings = {}  # term -> [(entry index, term frequency)]
+        self._lengths = []
+        self._idf = {}
+
+        for entry in entries:
+            self.add(*entry)
+        self.build()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, question, answer, keywords=""):
+        """Add one entry (call build() afterwards)."""
+        terms = Counter(tokenize(f"{question} {keywords} {answer}"))
+        index = len(self.entries)
+
+        self.entries.append({"question": question, "answer": answer})
+        self._topics.append(frozenset(tokenize(f"{question} {keywords}")))
+        self._lengths.append(sum(terms.values()))
+        for term, count in terms.items():
+            self._postings.setdefault(term, []).append((index, count))
+
+    def build(self):
+        """Compute IDF weights for the current entries."""
+        total = len(self.entries)
+        self._avg_length = (sum(self._lengths) / total) if total else 0.0
+        self._idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def search(self, query, limit=2):
+        """
+        Score entries for a query.
+
+        Returns:
+            tuple: ([(score, entry index)] best first, query terms)
+        """
+        terms = set(tokenize(query))
+        scores = {}
+
+        for term in terms:
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for index, count in self._postings[term]:
+                norm = 1 - BM25_B + BM25_B * self._lengths[index] / self._avg_length
+                scores[index] = scores.get(index, 0.0) + \
+                    idf * count * (BM25_K1 + 1) / (count + BM25_K1 * norm)
+
+        ranked = sorted(((score, index) for index, score in scores.items()), reverse=True)
+        return ranked[:limit], terms
+
+    def answer(self, query):
+        """
+        Answer a question when the best match is unambiguous.
+
+        Returns:
+            dict: {question, answer, score} or None to fall through to the LLM
+        """
+        ranked, terms = self.search(query)
+        if not ranked or not terms or len(terms) > FAQ_MAX_QUERY_TERMS:
+            return None
+
+        score, index = ranked[0]
+        if score < self.min_score:
+            return None
+        if len(ranked) > 1 and score < ranked[1][0] * self.min_margin:
+            return None
+
+        matched = len(terms & self._topics[index])
+        if matched / len(terms) < self.min_coverage:
+            return None
+
+        entry = self.entries[index]
+        return {"question": entry["question"], "answer": entry["answer"], "score": round(score, 3)}
@@ -0,0 +1,171 @@
+"""
+============================================================================
+BeautyFlow - Generation Cache
+============================================================================
+Reuses packaging renders for prompts that resolve to the same design.
+
+Entries are keyed on the canonicalized spec (product type, formula,
+coverage, finish, skin type, packaging description, vibe) plus the
+normalized prompt text, and hold up to pool_size image references.
+Until the pool is full every request still generates a new image, which
+is then added as a variant; afterwards requests are served from the pool.
+
+The cache lives in process memory with LRU + TTL eviction. The images
+themselves stay in the blob store, so a lost entry only costs a miss.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+# =============================================================================
+# 2. CONSTANTS
+# =============================================================================
+
+# Spec fields that identify a design
+CACHE_SPEC_FIELDS = (
+    "product_type", "formula", "coverage", "finish",
+    "skin_type", "packaging_desc", "vibe",
+)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+# =============================================================================
+# 3. HELPER FUNCTIONS
+# =============================================================================
+
+def normalize_prompt(prompt):
+    """Lowercase and collapse whitespace so cosmetic edits share a key."""
+    return _WHITESPACE_RE.sub(" ", (prompt or "").strip().lower())
+
+
+def make_cache_key(specs, prompt, vibe=None, quality=None):
+    """
+    Build the cache key for a design.
+
+    Args:
+        specs: Extracted design spec dict
+        prompt: Raw prompt text
+        vibe: Optional style
+        quality: Optional render quality (drafts never stand in for finals)
+
+    Returns:
+        str: sha256 hex digest
+    """
+    canonical = {
+        field: str(specs.get(field) or "").strip().lower()
+        for field in CACHE_SPEC_FIELDS
+    }
+    if vibe:
+        canonical["vibe"] = str(vibe).strip().lower()
+    if quality:
+        canonical["quality"] = str(quality).strip().lower()
+    canonical["prompt"] = normalize_prompt(prompt)
+
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# =============================================================================
+# 4. GENERATION CACHE
+# =============================================================================
+
+class GenerationCache:
+    """
+    Thread-safe LRU + TTL cache of image references per design key.
+    """
+
+    def __init__(self, max_entries=512, ttl=7 * 24 * 3600, pool_size=1):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.pool_size = max(1, pool_size)
+
+        self._entries = OrderedDict()  # key -> (created_at, [refs])
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Return a cached image reference, or None when a new render is needed.
+
+        A key whose pool is not full yet counts as a miss so the caller
+        adds another variant.
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry and now - entry[0] > self.ttl:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+
+            if not entry or len(entry[1]) < self.pool_size:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return random.choice(entry[1])
+
+    def put(self, key, image_ref):
+        """Add a rendered image to the key's variant pool."""
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                entry = (time.monotonic(), [])
+                self._entries[key] = entry
+
+            if image_ref not in entry[1] and len(entry[1]) < self.pool_size:
+                entry[1].append(image_ref)
+
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key, image_ref):
+        """Drop a reference whose blob is no longer available."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and image_ref in entry[1]:
+                entry[1].remove(image_ref)
+
+    def stats(self):
+        """
+        Return cache metrics.
+
+        Returns:
+            dict: {entries, hits, misses, evictions, hit_rate, pool_size, ttl}
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "pool_size": self.pool_size,
+                "ttl": self.ttl,
+            }
@@ -0,0 +1,180 @@
+"""
+============================================================================
+BeautyFlow - Image Backfill
+============================================================================
+Moves legacy base64 data URLs out of the database into the blob store.
+
+Rows are walked in keyset-paginated batches (id > last_id ORDER BY id),
+only ids are fetched per page and each image is loaded one row at a time,
+so memory stays bounded by a single image regardless of table size.
+Progress is checkpointed to a JSON file after every committed batch.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import os
+import json
+import time
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import text
+
+from services.image_store import decode_data_url
+
+
+# =============================================================================
+# 2. CONSTANTS
+# =============================================================================
+
+# Tables and image columns that may still hold data URLs
+BACKFILL_TARGETS = {
+    "products": "image_primary",
+    "ai_generations": "image_url",
+}
+
+
+# =============================================================================
+# 3. CHECKPOINT
+# =============================================================================
+
+class BackfillCheckpoint:
+    """
+    Last processed id per table, persisted as JSON.
+    Saved atomically so an interrupted run never leaves a torn file.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.state = {}
+        if self.path.is_file():
+            self.state = json.loads(self.path.read_text() or "{}")
+
+    def last_id(self, table):
+        return int(self.state.get(table, 0))
+
+    def save(self, table, last_id):
+        self.state[table] = int(last_id)
+        self._write()
+
+    def reset(self, table=None):
+        if table:
+            self.state.pop(table, None)
+        else:
+            self.state = {}
+        self._write()
+
+    def _write(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+
+# =============================================================================
+# 4. BACKFILL
+# =============================================================================
+
+def backfill_table(session, store, table, checkpoint, batch_size=50,
+                   dry_run=False, on_stored=None, log=print):
+    """
+    Migrate one table's data URLs into the blob store.
+
+    Args:
+        session: SQLAlchemy session
+        store: BlobStore to write images into
+        table: Key of BACKFILL_TARGETS
+        checkpoint: BackfillCheckpoint for resume
+        batch_size: Rows per keyset page / commit
+        dry_run: Decode and hash only, no writes
+        on_stored: Optional callback(ref) after each stored image
+        log: Output function
+
+    Returns:
+        dict: {rows, bytes, skipped, seconds, last_id}
+    """
+    column = BACKFILL_TARGETS[table]
+
+    page_sql = text(
+        f"SELECT id FROM {table} "
+        f"WHERE id > :last_id AND {column} LIKE 'data:%' "
+        f"ORDER BY id LIMIT :limit"
+    )
+    row_sql = text(f"SELECT {column} FROM {table} WHERE id = :id")
+    update_sql = text(f"UPDATE {table} SET {column} = :ref WHERE id = :id")
+
+    last_id = checkpoint.last_id(table)
+    stats = {"rows": 0, "bytes": 0, "skipped": 0, "seconds": 0.0, "last_id": last_id}
+    started = time.monotonic()
+    batch_no = 0
+
+    log(f"[BACKFILL] {table}.{column}: resuming after id {last_id}")
+
+    while True:
+        ids = [r[0] for r in session.execute(
+            page_sql, {"last_id": last_id, "limit": batch_size}
+        )]
+        if not ids:
+            break
+
+        batch_no += 1
+        batch_bytes = 0
+        batch_started = time.monotonic()
+
+        for row_id in ids:
+            # One image in memory at a time
+            value = session.execute(row_sql, {"id": row_id}).scalar()
+            try:
+                data, _ = decode_data_url(value)
+            except ValueError as e:
+                # Corrupt base64 (binascii.Error): skip it so the checkpoint moves on
+                log(f"[BACKFILL] {table} id {row_id}: undecodable data URL skipped ({e})")
+                data = None
+            value = None
+
+            if data is None:
+                stats["skipped"] += 1
+                continue
+
+            batch_bytes += len(data)
+
+            if not dry_run:
+                ref = store.put(data)
+                session.execute(update_sql, {"ref": ref, "id": row_id})
+                if on_stored:
+                    on_stored(ref)
+            data = None
+
+            stats["rows"] += 1
+
+        last_id = ids[-1]
+
+        if dry_run:
+            session.rollback()
+        else:
+            session.commit()
+            checkpoint.save(table, last_id)
+
+        stats["bytes"] += batch_bytes
+        stats["last_id"] = last_id
+
+        elapsed = time.monotonic() - started
+        batch_elapsed = max(time.monotonic() - batch_started, 1e-6)
+        log(
+            f"[BACKFILL] {table} batch {batch_no}: {len(ids)} rows, "
+            f"last_id={last_id}, {batch_bytes / 1e6:.1f} MB "
+            f"({len(ids) / batch_elapsed:.1f} rows/s, "
+            f"{batch_bytes / 1e6 / batch_elapsed:.1f} MB/s) | "
+            f"total {stats['rows']} rows in {elapsed:.1f}s"
+        )
+
+    stats["seconds"] = time.monotonic() - started
+    return stats
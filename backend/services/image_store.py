@@ -0,0 +1,303 @@
+"""
+============================================================================
+BeautyFlow - Image Blob Store
+============================================================================
+Content-addressed storage for AI-generated images.
+Images are written once under their sha256 digest and the database only
+keeps a short reference ("sha256:<hex>") instead of a base64 data URL.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import os
+import base64
+import hashlib
+import tempfile
+from pathlib import Path
+
+
+# =============================================================================
+# 2. CONSTANTS
+# =============================================================================
+
+# Prefix used for references stored in the database
+REF_PREFIX = "sha256:"
+
+# URL prefix of the media endpoint that serves blobs
+MEDIA_URL_PREFIX = "/media"
+
+# Magic bytes used to detect the content type of a stored blob
+CONTENT_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+# =============================================================================
+# 3. HELPER FUNCTIONS - REFERENCES
+# =============================================================================
+
+def make_ref(digest):
+    """Build the database reference for a blob digest."""
+    return f"{REF_PREFIX}{digest}"
+
+
+def parse_ref(value):
+    """
+    Extract the sha256 digest from a stored reference.
+
+    Args:
+        value: Column value (reference, data URL, URL or None)
+
+    Returns:
+        str: Hex digest, or None if value is not a blob reference
+    """
+    if not value or not value.startswith(REF_PREFIX):
+        return None
+    digest = value[len(REF_PREFIX):]
+    return digest if is_valid_digest(digest) else None
+
+
+def is_valid_digest(digest):
+    """Check that digest is a lowercase 64-char sha256 hex string."""
+    return (
+        isinstance(digest, str)
+        and len(digest) == 64
+        and all(c in "0123456789abcdef" for c in digest)
+    )
+
+
+def media_url(value):
+    """
+    Convert a stored image value into a URL the browser can load.
+
+    Legacy values (data URLs, absolute URLs, static paths) are returned
+    unchanged so rows that were not migrated yet keep working.
+
+    Args:
+        value: Column value from Product.image_primary / AIGeneration.image_url
+
+    Returns:
+        str: URL for <img src>, or None if there is no image
+    """
+    if not value:
+        return None
+    digest = parse_ref(value)
+    if digest:
+        return f"{MEDIA_URL_PREFIX}/{digest}"
+    return value
+
+
+def decode_data_url(value):
+    """
+    Decode a base64 data URL.
+
+    Args:
+        value: "data:<type>;base64,<payload>" string
+
+    Returns:
+        tuple: (bytes, content_type) or (None, None) if not a data URL
+    """
+    if not value or not value.startswith("data:"):
+        return None, None
+
+    header, _, payload = value.partition(",")
+    if ";base64" not in header:
+        return None, None
+
+    content_type = header[len("data:"):].split(";")[0] or "application/octet-stream"
+    return base64.b64decode(payload), content_type
+
+
+def sniff_content_type(head):
+    """
+    Detect image content type from the first bytes of a blob.
+
+    Args:
+        head: First bytes of the blob (16 bytes is enough)
+
+    Returns:
+        str: MIME type, "application/octet-stream" if unknown
+    """
+    for signature, content_type in CONTENT_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    return "application/octet-stream"
+
+
+# =============================================================================
+# 4. BLOB STORE BACKENDS
+# =============================================================================
+
+# -----------------------------------------------------------------------------
+# 4.1 Base Store
+# -----------------------------------------------------------------------------
+
+class BlobStore:
+    """
+    Interface for content-addressed blob backends.
+    Subclasses implement the raw read/write methods.
+    """
+
+    def put(self, data):
+        """
+        Store bytes and return their database reference.
+
+        Args:
+            data: Raw image bytes
+
+        Returns:
+            str: Reference in the form "sha256:<hex>"
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.exists(digest):
+            self._write(digest, data)
+        return make_ref(digest)
+
+    def put_data_url(self, value):
+        """Decode a data URL and store it. Returns None if not a data URL."""
+        data, _ = decode_data_url(value)
+        if data is None:
+            return None
+        return self.put(data)
+
+    def get(self, digest):
+        """Return blob bytes or None if missing."""
+        raise NotImplementedError
+
+    def exists(self, digest):
+        """Check whether a blob is stored."""
+        raise NotImplementedError
+
+    def size(self, digest):
+        """Return blob size in bytes or None if missing."""
+        raise NotImplementedError
+
+    def content_type(self, digest):
+        """Return detected MIME type of a stored blob."""
+        data = self.get(digest)
+        return sniff_content_type(data[:16]) if data else None
+
+    def local_path(self, digest):
+        """Return a filesystem path for the blob, if the backend has one."""
+        return None
+
+    def delete(self, digest):
+        """Remove a blob. Missing blobs are ignored."""
+        raise NotImplementedError
+
+    def _write(self, digest, data):
+        raise NotImplementedError
+
+
+# -----------------------------------------------------------------------------
+# 4.2 Local Filesystem Store
+# -----------------------------------------------------------------------------
+
+class LocalBlobStore(BlobStore):
+    """
+    Stores blobs on local disk as <root>/<ab>/<cd>/<digest>.
+    Writes go to a temp file first and are renamed into place,
+    so readers never see a partially written image.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, digest):
+        """Build the on-disk path for a digest."""
+        if not is_valid_digest(digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def get(self, digest):
+        try:
+            return self.path_for(digest).read_bytes()
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def exists(self, digest):
+        try:
+            return self.path_for(digest).is_file()
+        except ValueError:
+            return False
+
+    def size(self, digest):
+        try:
+            return self.path_for(digest).stat().st_size
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def content_type(self, digest):
+        try:
+            with open(self.path_for(digest), "rb") as f:
+                return sniff_content_type(f.read(16))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def local_path(self, digest):
+        return self.path_for(digest) if self.exists(digest) else None
+
+    def delete(self, digest):
+        try:
+            self.path_for(digest).unlink()
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def _write(self, digest, data):
+        path = self.path_for(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+# =============================================================================
+# 5. FACTORY
+# =============================================================================
+
+# Registered backends by config name
+BLOB_STORE_BACKENDS = {
+    "local": LocalBlobStore,
+}
+
+
+def create_blob_store(backend, **options):
+    """
+    Create a blob store from configuration.
+
+    Args:
+        backend: Backend name (e.g. "local")
+        **options: Backend constructor arguments (e.g. root="/var/media")
+
+    Returns:
+        BlobStore: Configured store instance
+    """
+    try:
+        store_cls = BLOB_STORE_BACKENDS[backend]
+    except KeyError:
+        raise RuntimeError(
+            f"Unknown IMAGE_STORE_BACKEND '{backend}'. "
+            f"Available: {', '.join(sorted(BLOB_STORE_BACKENDS))}"
+        )
+    return store_cls(**options)
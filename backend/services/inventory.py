@@ -0,0 +1,252 @@
+"""
+============================================================================
+BeautyFlow - SmartPicks Warm Inventory
+============================================================================
+Keeps a pool of ready-made SmartPicks designs per vibe.
+
+A background filler renders designs off-peak until every vibe holds its
+target count. Clicking a vibe then claims pooled rows (a DELETE under
+SKIP LOCKED) and turns them into products without waiting for OpenAI.
+
+Every process may run a filler, but a fill pass holds a Postgres
+advisory lock: only one process renders at a time, and the others skip
+the pass instead of overshooting the target from stale levels.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import threading
+import traceback
+from datetime import datetime
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+from models.all_models import db, AIInventoryItem
+
+
+# =============================================================================
+# 2. CONSTANTS
+# =============================================================================
+
+# Advisory lock key held during a fill pass (any constant bigint)
+FILL_LOCK_KEY = 0x4246494E56  # "BFINV"
+
+
+# =============================================================================
+# 3. HELPER FUNCTIONS
+# =============================================================================
+
+def parse_hours_window(value):
+    """
+    Parse an off-peak window like "0-7" (UTC hours, inclusive).
+
+    Args:
+        value: "start-end" string, empty for "any time"
+
+    Returns:
+        tuple: (start, end) or None
+    """
+    value = (value or "").strip()
+    if not value:
+        return None
+
+    start, _, end = value.partition("-")
+    start, end = int(start), int(end or start)
+    if not (0 <= start <= 23 and 0 <= end <= 23):
+        raise ValueError(f"Invalid hours window: {value!r}")
+    return start, end
+
+
+def in_hours_window(window, now=None):
+    """Check whether now (UTC) falls inside a window; wraps past midnight."""
+    if window is None:
+        return True
+
+    hour = (now or datetime.utcnow()).hour
+    start, end = window
+    if start <= end:
+        return start <= hour <= end
+    return hour >= start or hour <= end
+
+
+def inventory_levels(vibes):
+    """
+    Count unclaimed designs per vibe.
+
+    Returns:
+        dict: {vibe: count}
+    """
+    rows = (
+        db.session.query(AIInventoryItem.vibe, db.func.count(AIInventoryItem.id))
+        .filter(AIInventoryItem.vibe.in_(list(vibes)))
+        .group_by(AIInventoryItem.vibe)
+        .all()
+    )
+    levels = {vibe: 0 for vibe in vibes}
+    levels.update(dict(rows))
+    return levels
+
+
+def claim_inventory(vibe, count):
+    """
+    Take count pooled designs for a vibe inside the current transaction.
+
+    Rows are locked with SKIP LOCKED so concurrent claims never hand out
+    the same design. Nothing is claimed unless count rows are available.
+    The caller commits (or rolls back) together with the new products.
+
+    Returns:
+        list: [(prompt, image_ref)] or [] when the pool is short
+    """
+    items = (
+        AIInventoryItem.query
+        .filter_by(vibe=vibe)
+        .order_by(AIInventoryItem.id)
+        .limit(count)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+    if len(items) < count:
+        return []
+
+    claimed = [(item.prompt, item.image_ref) for item in items]
+    for item in items:
+        db.session.delete(item)
+    db.session.flush()
+    return claimed
+
+
+@contextmanager
+def advisory_lock(key):
+    """
+    Try a Postgres session advisory lock without waiting.
+
+    The lock lives on its own connection, so the caller's session can
+    commit freely while holding it.
+
+    Yields:
+        bool: True when this process holds the lock
+    """
+    conn = db.engine.connect()
+    acquired = False
+    try:
+        acquired = bool(conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar())
+        yield acquired
+    finally:
+        try:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+        finally:
+            conn.close()
+
+
+# =============================================================================
+# 4. INVENTORY FILLER
+# =============================================================================
+
+class InventoryFiller:
+    """
+    Background thread that tops up the pool for each vibe.
+
+    render_fn(vibe) must return (prompt, image_ref) for one new design;
+    renders run on the given executor so a refill costs about one
+    generation of wall time per round.
+    """
+
+    def __init__(self, app, render_fn, executor, vibes, target=4,
+                 interval=300, window=None):
+        self.app = app
+        self.render_fn = render_fn
+        self.executor = executor
+        self.vibes = list(vibes)
+        self.target = target
+        self.interval = interval
+        self.window = window
+
+        self._wake = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the filler thread (idempotent, safe from concurrent requests)."""
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._loop,
+                    name="ai-inventory",
+                    daemon=True
+                )
+                self._thread.start()
+
+    def wake(self):
+        """Ask for a refill pass now (still honours the off-peak window)."""
+        self._wake.set()
+
+    def fill_once(self, force=False):
+        """
+        Render missing designs for every vibe. Call inside an app context.
+        Skipped while another process holds the fill lock.
+
+        Args:
+            force: Ignore the off-peak window
+
+        Returns:
+            dict: {vibe: designs added}
+        """
+        if not force and not in_hours_window(self.window):
+            return {}
+
+        with advisory_lock(FILL_LOCK_KEY) as acquired:
+            if not acquired:
+                print("[INVENTORY] Another process is filling, pass skipped")
+                return {}
+            return self._fill()
+
+    def _fill(self):
+        levels = inventory_levels(self.vibes)
+        added = {}
+
+        for vibe in self.vibes:
+            missing = self.target - levels.get(vibe, 0)
+            if missing <= 0:
+                continue
+
+            futures = [self.executor.submit(self.render_fn, vibe) for _ in range(missing)]
+
+            added[vibe] = 0
+            for future in futures:
+                try:
+                    prompt, image_ref = future.result()
+                except Exception as e:
+                    print(f"[INVENTORY] Render for {vibe} failed: {e}")
+                    continue
+
+                db.session.add(AIInventoryItem(vibe=vibe, prompt=prompt, image_ref=image_ref))
+                added[vibe] += 1
+
+            db.session.commit()
+            print(f"[INVENTORY] {vibe}: +{added[vibe]} (target {self.target})")
+
+        return added
+
+    def _loop(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    try:
+                        self.fill_once()
+                    finally:
+                        db.session.remove()
+            except Exception:
+                traceback.print_exc()
+
+            self._wake.wait(self.interval)
+            self._wake.clear()
@@ -0,0 +1,446 @@
+"""
+============================================================================
+BeautyFlow - Background Jobs
+============================================================================
+Runs slow AI generations outside the request thread.
+
+The ai_jobs table is the queue: a request inserts a QUEUED row and gets
+the job id back immediately, a bounded thread pool picks rows up, and
+clients poll or subscribe for the result. Rows are claimed with a
+conditional UPDATE, so several processes can share one table without
+running the same job twice.
+
+Identical in-flight requests are coalesced (singleflight): a job may
+carry a dedupe key, and a partial unique index on (dedupe_key) over
+QUEUED/RUNNING rows acts as the cross-process lock. A second request
+with the same key joins the existing job instead of creating another.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import time
+import uuid
+import json
+import hashlib
+import threading
+import traceback
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import IntegrityError
+
+from models.all_models import db, AIJob
+from services.generation_cache import normalize_prompt
+
+
+# =============================================================================
+# 2. CONSTANTS
+# =============================================================================
+
+JOB_QUEUED = "QUEUED"
+JOB_RUNNING = "RUNNING"
+JOB_SUCCEEDED = "SUCCEEDED"
+JOB_FAILED = "FAILED"
+
+# Statuses after which a job never changes again
+JOB_TERMINAL_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+# Statuses covered by the in-flight dedupe index
+JOB_INFLIGHT_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+
+# =============================================================================
+# 3. ERRORS & HELPERS
+# =============================================================================
+
+class JobQueueFull(Exception):
+    """Raised when the worker pool already holds max_pending jobs."""
+
+
+class JobNotFound(Exception):
+    """Raised when a waited-on job row no longer exists."""
+
+
+def make_dedupe_key(account_id, kind, prompt, **extra):
+    """
+    Build the singleflight key for a job.
+
+    Args:
+        account_id: Owner account ID
+        kind: Job kind
+        prompt: Prompt text (normalized before hashing)
+        **extra: Other request fields that change the result
+
+    Returns:
+        str: sha256 hex digest
+    """
+    payload = json.dumps(
+        {
+            "account_id": account_id,
+            "kind": kind,
+            "prompt": normalize_prompt(prompt),
+            **{k: v for k, v in extra.items() if v is not None},
+        },
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def serialize_job(job):
+    """
+    Convert an AIJob row into the JSON shape returned to clients.
+
+    Args:
+        job: AIJob instance
+
+    Returns:
+        dict: {id, kind, status, result, error, created_at, started_at, finished_at}
+    """
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "result": job.result_json,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+# =============================================================================
+# 4. JOB RUNNER
+# =============================================================================
+
+class JobRunner:
+    """
+    Bounded worker pool backed by the ai_jobs table.
+
+    Handlers are registered per job kind and called as
+    handler(account_id, payload) -> JSON-serializable result.
+    """
+
+    def __init__(self, app, max_workers=4, max_pending=32,
+                 stale_after=600, max_attempts=2):
+        self.app = app
+        self.handlers = {}
+        self.max_pending = max_pending
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="ai-job"
+        )
+        self._lock = threading.Lock()
+        self._inflight = set()
+        self._changed = threading.Condition()
+        self._thread = None
+
+    # -------------------------------------------------------------------------
+    # 4.1 Registration & Submission
+    # -------------------------------------------------------------------------
+
+    def register(self, kind):
+        """Decorator registering the handler for a job kind."""
+        def decorator(fn):
+            self.handlers[kind] = fn
+            return fn
+        return decorator
+
+    def enqueue(self, account_id, kind, payload, dedupe_key=None, admit=None):
+        """
+        Persist a new job and schedule it, or join an identical one.
+
+        Args:
+            account_id: Owner account ID
+            kind: Registered job kind
+            payload: JSON-serializable handler input
+            dedupe_key: Optional singleflight key (see make_dedupe_key)
+            admit: Optional callable run only when a new job is created
+                (after the dedupe lookup and queue check), e.g. a rate
+                limit charge; its exceptions propagate
+
+        Returns:
+            tuple: (AIJob, created) - created is False when an in-flight
+                job with the same dedupe key was joined
+
+        Raises:
+            JobQueueFull: Pool is at capacity (caller should answer 429)
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        if dedupe_key:
+            existing = self.find_inflight(dedupe_key)
+            if existing:
+                return existing, False
+
+        if self.pending() >= self.max_pending:
+            raise JobQueueFull()
+
+        if admit is not None:
+            admit()
+
+        job = AIJob(
+            id=uuid.uuid4().hex,
+            account_id=account_id,
+            kind=kind,
+            status=JOB_QUEUED,
+            dedupe_key=dedupe_key,
+            payload_json=payload
+        )
+        db.session.add(job)
+
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Lost the race to another request (possibly another process)
+            db.session.rollback()
+            existing = self.find_inflight(dedupe_key) if dedupe_key else None
+            if existing:
+                return existing, False
+            raise
+
+        self._submit(job.id)
+        return job, True
+
+    def find_inflight(self, dedupe_key):
+        """Return the QUEUED/RUNNING job holding a dedupe key, if any."""
+        return AIJob.query.filter(
+            AIJob.dedupe_key == dedupe_key,
+            AIJob.status.in_(JOB_INFLIGHT_STATUSES)
+        ).first()
+
+    def wait(self, job_id, timeout):
+        """
+        Block until a job reaches a terminal status.
+
+        Args:
+            job_id: AIJob id
+            timeout: Seconds to wait
+
+        Returns:
+            AIJob: Finished job, or None on timeout
+
+        Raises:
+            JobNotFound: The job row is gone (deleted or never committed)
+        """
+        deadline = time.monotonic() + timeout
+
+        while True:
+            # End the previous read so each pass sees fresh state
+            db.session.rollback()
+            job = db.session.get(AIJob, job_id)
+
+            if job is None:
+                raise JobNotFound(job_id)
+            if job.status in JOB_TERMINAL_STATUSES:
+                return job
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+
+            self.wait_for_change(min(1.0, remaining))
+
+    def pending(self):
+        """Number of jobs scheduled in this process and not finished."""
+        with self._lock:
+            return len(self._inflight)
+
+    def _submit(self, job_id):
+        with self._lock:
+            if job_id in self._inflight or len(self._inflight) >= self.max_pending:
+                return False
+            self._inflight.add(job_id)
+        self._executor.submit(self._run, job_id)
+        return True
+
+    # -------------------------------------------------------------------------
+    # 4.2 Execution
+    # -------------------------------------------------------------------------
+
+    def _run(self, job_id):
+        try:
+            with self.app.app_context():
+                try:
+                    self._execute(job_id)
+                finally:
+                    db.session.remove()
+        except Exception:
+            traceback.print_exc()
+        finally:
+            with self._lock:
+                self._inflight.discard(job_id)
+            self.notify()
+
+        # A slot is free again: pick up rows left waiting in the table
+        try:
+            with self.app.app_context():
+                try:
+                    self._pump()
+                finally:
+                    db.session.remove()
+        except Exception:
+            traceback.print_exc()
+
+    def _execute(self, job_id):
+        # Atomic claim: only one worker (in any process) moves QUEUED -> RUNNING
+        claimed = AIJob.query.filter_by(id=job_id, status=JOB_QUEUED).update(
+            {
+                "status": JOB_RUNNING,
+                "started_at": datetime.utcnow(),
+                "attempts": AIJob.attempts + 1,
+            },
+            synchronize_session=False
+        )
+        db.session.commit()
+
+        if not claimed:
+            return
+
+        self.notify()
+
+        job = db.session.get(AIJob, job_id)
+        handler = self.handlers.get(job.kind)
+        account_id = job.account_id
+        payload = job.payload_json or {}
+        started = time.monotonic()
+
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for job kind '{job.kind}'")
+            result = handler(account_id, payload)
+            status, error = JOB_SUCCEEDED, None
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"[JOBS] Job {job_id} failed:")
+            traceback.print_exc()
+            result, status, error = None, JOB_FAILED, str(e)
+
+        job = db.session.get(AIJob, job_id)
+        job.status = status
+        job.result_json = result
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+        print(f"[JOBS] {job.kind} {job_id} {status} in {time.monotonic() - started:.1f}s")
+
+    def _pump(self):
+        """Schedule QUEUED rows while this process has free slots."""
+        free = self.max_pending - self.pending()
+        if free <= 0:
+            return 0
+
+        with self._lock:
+            busy = set(self._inflight)
+
+        rows = (
+            AIJob.query
+            .with_entities(AIJob.id)
+            .filter(AIJob.status == JOB_QUEUED)
+            .order_by(AIJob.created_at)
+            .limit(free + len(busy))
+            .all()
+        )
+
+        scheduled = 0
+        for (job_id,) in rows:
+            if job_id not in busy and self._submit(job_id):
+                scheduled += 1
+        return scheduled
+
+    # -------------------------------------------------------------------------
+    # 4.3 Recovery & Notification
+    # -------------------------------------------------------------------------
+
+    def recover(self):
+        """
+        Resume work left behind by dead workers (this or another process).
+
+        RUNNING jobs started more than stale_after ago and not running in
+        this process are requeued (or failed once max_attempts is
+        reached), then QUEUED rows are scheduled.
+        Call inside an app context.
+
+        Returns:
+            int: Number of jobs scheduled
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+
+        with self._lock:
+            busy = set(self._inflight)
+
+        stale = [
+            job for job in AIJob.query.filter(
+                AIJob.status == JOB_RUNNING,
+                AIJob.started_at < cutoff
+            ).all()
+            if job.id not in busy
+        ]
+
+        for job in stale:
+            if job.attempts >= self.max_attempts:
+                job.status = JOB_FAILED
+                job.error = "Interrupted: the worker stopped before finishing"
+                job.finished_at = datetime.utcnow()
+            else:
+                job.status = JOB_QUEUED
+        db.session.commit()
+
+        scheduled = self._pump()
+        if stale or scheduled:
+            print(f"[JOBS] Recovered {len(stale)} stale job(s), scheduled {scheduled}")
+        return scheduled
+
+    def start(self, interval=60):
+        """
+        Start the recovery thread (idempotent): recover() now and then
+        every interval seconds, so a job whose worker died mid-run is
+        picked up again without waiting for a restart.
+
+        Only call from a serving process - CLI commands importing the app
+        must not run queued generations.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._recover_loop,
+                args=(interval,),
+                name="ai-job-recovery",
+                daemon=True
+            )
+        self._thread.start()
+
+    def _recover_loop(self, interval):
+        while True:
+            try:
+                with self.app.app_context():
+                    try:
+                        self.recover()
+                    finally:
+                        db.session.remove()
+            except Exception:
+                traceback.print_exc()
+            time.sleep(interval)
+
+    def notify(self):
+        """Wake up clients waiting in wait_for_change()."""
+        with self._changed:
+            self._changed.notify_all()
+
+    def wait_for_change(self, timeout):
+        """Block until any job changes state in this process, or timeout."""
+        with self._changed:
+            self._changed.wait(timeout)
@@ -0,0 +1,289 @@
+"""
+============================================================================
+BeautyFlow - Chat Message Write-Behind Buffer
+============================================================================
+Takes AIMessage inserts off the chat request path.
+
+Requests append rows to an in-memory queue and return immediately. A
+background thread writes the queue with one multi-row INSERT whenever
+it holds max_batch rows or its oldest row has waited max_delay seconds.
+When the writer is not running or the queue is full, add() flushes on
+the caller's thread instead (back-pressure).
+
+A failed batch is requeued and retried with exponential backoff. After
+MAX_FLUSH_ATTEMPTS it is written row by row, so one bad row (e.g. a
+session deleted meanwhile) only drops itself. When no row gets in at
+all the database is down, not the rows: everything stays queued
+(up to max_pending, then oldest first out) and keeps backing off.
+stop() drains the queue; it is registered with atexit so a normal
+shutdown loses nothing.
+
+Rows need an existing session_id: callers resolve the open AISession
+first (see services/ai_sessions.py).
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import time
+import atexit
+import threading
+import traceback
+from collections import deque
+
+from models.all_models import db, AIMessage
+
+
+# =============================================================================
+# 2. CONSTANTS
+# =============================================================================
+
+# Multi-row attempts per batch before falling back to row-by-row inserts
+MAX_FLUSH_ATTEMPTS = 5
+
+# A row failing this often while nothing else gets in is dropped anyway
+MAX_ROW_ATTEMPTS = 30
+
+# Backoff between failed attempts: 0.5s, 1s, 2s, 4s... capped
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_MAX = 30.0
+
+
+# =============================================================================
+# 3. MESSAGE BUFFER
+# =============================================================================
+
+class MessageBuffer:
+    """
+    Batched, asynchronous AIMessage writer.
+
+    Args:
+        app: Flask app (flushes run in its app context)
+        max_batch: Flush once this many rows are queued
+        max_delay: Flush once the oldest row is this old (seconds)
+        max_pending: Queue bound; add() flushes inline when it is full
+    """
+
+    def __init__(self, app, max_batch=50, max_delay=0.2, max_pending=5000):
+        self.app = app
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+
+        self._rows = deque()  # (queued_at, attempts, row dict)
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self._failures = 0  # consecutive failed batches (drives the backoff)
+
+        self.flushed = 0
+        self.batches = 0
+        self.dropped = 0
+
+    def start(self):
+        """Start the writer thread (idempotent) and flush on interpreter exit."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._loop,
+                name="ai-message-writer",
+                daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def add(self, session_id, role, content):
+        """
+        Queue one message.
+
+        Normally returns without touching the database. When the writer
+        thread is not started or max_pending rows are queued, it flushes
+        the queue on the caller's thread before returning.
+        """
+        with self._cond:
+            self._rows.append((time.monotonic(), 0, {
+                "session_id": session_id,
+                "role": role,
+                "content": content,
+            }))
+            queued = len(self._rows)
+            # First row starts the max_delay clock; a full batch flushes now
+            if queued == 1 or queued >= self.max_batch:
+                self._cond.notify()
+
+        # Writer not started or falling behind: write on the caller's thread
+        if self._thread is None or queued >= self.max_pending:
+            self.flush()
+            self._trim()
+
+    def pending(self):
+        with self._cond:
+            return len(self._rows)
+
+    def flush(self):
+        """
+        Write everything queued so far, one multi-row INSERT per batch.
+
+        Returns:
+            int: Rows written
+        """
+        written = 0
+
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    batch = [self._rows.popleft() for _ in range(min(self.max_batch, len(self._rows)))]
+                if not batch:
+                    return written
+
+                if not self._write(batch):
+                    return written
+                written += len(batch)
+
+    def stop(self, timeout=5.0):
+        """Stop the writer thread and drain the queue."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        """
+        Return buffer metrics.
+
+        Returns:
+            dict: {pending, flushed, batches, dropped, max_batch, max_delay}
+        """
+        with self._cond:
+            return {
+                "pending": len(self._rows),
+                "flushed": self.flushed,
+                "batches": self.batches,
+                "dropped": self.dropped,
+                "max_batch": self.max_batch,
+                "max_delay": self.max_delay,
+            }
+
+    def backoff(self):
+        """Seconds to wait before the next attempt after consecutive failures."""
+        with self._cond:
+            failures = self._failures
+        if not failures:
+            return 0.0
+        return min(RETRY_BACKOFF_BASE * 2 ** (failures - 1), RETRY_BACKOFF_MAX)
+
+    def _write(self, batch):
+        """
+        Insert one batch: as one INSERT for the first MAX_FLUSH_ATTEMPTS
+        attempts, then row by row.
+
+        Returns:
+            bool: False when rows were requeued (database failing)
+        """
+        if max(attempts for _, attempts, _ in batch) < MAX_FLUSH_ATTEMPTS:
+            try:
+                self._insert([row for _, _, row in batch])
+            except Exception as e:
+                print(f"[MESSAGES] Batch of {len(batch)} failed: {e}")
+                self._requeue(batch)
+                return False
+
+            self._record(len(batch), 0)
+            return True
+
+        # Isolate the bad rows instead of failing the whole batch again
+        failed = []
+        for item in batch:
+            try:
+                self._insert([item[2]])
+            except Exception as e:
+                print(f"[MESSAGES] Message for session {item[2]['session_id']} failed: {e}")
+                failed.append(item)
+
+        if len(failed) < len(batch):
+            self._record(len(batch) - len(failed), len(failed))
+            return True
+
+        # Nothing got in: the database is unavailable, keep the rows
+        keep = [item for item in failed if item[1] + 1 < MAX_ROW_ATTEMPTS]
+        self._requeue(keep)
+        self._record(0, len(failed) - len(keep))
+        return False
+
+    def _insert(self, rows):
+        with self.app.app_context():
+            try:
+                db.session.execute(AIMessage.__table__.insert().values(rows))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+
+    def _requeue(self, batch):
+        """Put failed rows back at the front, one attempt older."""
+        with self._cond:
+            self._rows.extendleft(reversed([
+                (queued_at, attempts + 1, row) for queued_at, attempts, row in batch
+            ]))
+            self._failures += 1
+
+    def _record(self, written, dropped):
+        with self._cond:
+            self.flushed += written
+            self.dropped += dropped
+            if written:
+                self.batches += 1
+                self._failures = 0
+
+        if dropped:
+            print(f"[MESSAGES] Dropped {dropped} message(s)")
+
+    def _trim(self):
+        """Drop the oldest rows beyond max_pending (database down for long)."""
+        with self._cond:
+            excess = len(self._rows) - self.max_pending
+            for _ in range(max(excess, 0)):
+                self._rows.popleft()
+
+        if excess > 0:
+            self._record(0, excess)
+
+    def _loop(self):
+        while True:
+            try:
+                with self._cond:
+                    while not self._stopping:
+                        if len(self._rows) >= self.max_batch:
+                            break
+                        if self._rows:
+                            wait = self._rows[0][0] + self.max_delay - time.monotonic()
+                            if wait <= 0:
+                                break
+                            self._cond.wait(wait)
+                        else:
+                            self._cond.wait()
+
+                    if self._stopping:
+                        return
+
+                self.flush()
+
+                # Database failing: back off before retrying the requeued rows
+                deadline = time.monotonic() + self.backoff()
+                with self._cond:
+                    while not self._stopping and time.monotonic() < deadline:
+                        self._cond.wait(deadline - time.monotonic())
+
+            except Exception:
+                traceback.print_exc()
+                time.sleep(self.max_delay)
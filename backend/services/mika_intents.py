@@ -0,0 +1,162 @@
+"""
+============================================================================
+BeautyFlow - Mika Intent Router
+============================================================================
+Recognizes chat messages about the user's own data ("where is my
+order", "how many people are in my group") so they can be answered
+from the database with a templated reply instead of the LLM, which
+cannot see orders or groups.
+
+Classification is a handful of compiled patterns: a message needs a
+reference to the user's own order/group ("my"/"our", or an order
+number) plus a status phrase ("where is", "status", "track"...); a
+BF- order number alone is enough. Requests to cancel or change an
+order are never routed. Anything else returns None and keeps the
+normal Mika flow. A routed message never reaches the LLM, so precision
+wins over recall; tools/check_mika_intents.py pins the rules down
+against a corpus.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import re
+
+
+# =============================================================================
+# 2. CONSTANTS
+# =============================================================================
+
+INTENT_ORDER_STATUS = "order_status"
+INTENT_GROUP_STATUS = "group_status"
+
+# Order numbers as shown to users (BF-000123 / BF-SHP-000123)
+ORDER_NUMBER_RE = re.compile(r"\bbf-(?:shp-)?0*(\d+)\b")
+
+# "order #123" / "order number 123" / "order no. 123" - only counts together
+# with a status question ("I want to order #1 best seller" does not)
+_ORDER_NUMBER_BARE_RE = re.compile(r"\border\s*(?:#|(?:number|no\.?)\s*#?)\s*(\d+)\b")
+
+# Possessives only: "the order page" / "the delivery app" are not the user's data
+_ORDER_REF_RE = re.compile(r"\b(?:my|our)\s+(?:last\s+|latest\s+|recent\s+)?(?:order|package|parcel|shipment|delivery)s?\b")
+# Status phrases only: bare "where"/"when"/"update" also start questions
+# about cancelling or changing an order
+_ORDER_ASK_RE = re.compile(
+    r"\b(?:status|track|tracking|arrive|arriving|arrival|delivered|shipped|eta|late|"
+    r"on\s+the\s+way|any\s+updates?|where(?:'s|\s+is|\s+are)|when\s+(?:will|is|are|does|do)\s+(?:my|our|it))\b"
+)
+
+# Requests to act on an order - the LLM (and support) handle these
+_ORDER_EXCLUDE_RE = re.compile(
+    r"\b(?:cancel\w*|change\w*|modify|edit|address|return\w*|refund\w*|place|placed|wrong)\b"
+)
+
+_GROUP_REF_RE = re.compile(r"\b(?:my|our)\s+(?:shipping\s+|cost[\s-]sharing\s+)?group\b")
+_GROUP_ASK_RE = re.compile(
+    r"\b(?:how many|who|members?|people|spots?|full|complete|ready|status|left|"
+    r"joined|expire|expires|save|saving|savings|fee|cost)\b"
+)
+
+
+# =============================================================================
+# 3. CLASSIFIER
+# =============================================================================
+
+def classify_intent(message):
+    """
+    Detect a data intent in a chat message.
+
+    Returns:
+        tuple: (intent, slots) - slots has "order_id" for a numbered order;
+               (None, {}) when the message is not about the user's data
+    """
+    text = (message or "").lower()
+
+    if _GROUP_REF_RE.search(text) and _GROUP_ASK_RE.search(text):
+        return INTENT_GROUP_STATUS, {}
+
+    # Cancel / change / address requests are not status questions
+    if _ORDER_EXCLUDE_RE.search(text):
+        return None, {}
+
+    number = ORDER_NUMBER_RE.search(text)
+    if number:
+        return INTENT_ORDER_STATUS, {"order_id": int(number.group(1))}
+
+    asks_status = _ORDER_ASK_RE.search(text)
+
+    number = _ORDER_NUMBER_BARE_RE.search(text)
+    if number and asks_status:
+        return INTENT_ORDER_STATUS, {"order_id": int(number.group(1))}
+
+    if asks_status and _ORDER_REF_RE.search(text):
+        return INTENT_ORDER_STATUS, {}
+
+    return None, {}
+
+
+# =============================================================================
+# 4. REPLY TEMPLATES
+# =============================================================================
+# Each template takes the JSON payload of the matching API endpoint.
+
+def order_reply(order):
+    """Reply for an /api/orders/<id> payload."""
+    tracking = order.get("tracking") or {}
+    status = order["delivery_status"].rstrip("!.")
+    lines = [f"Your order {order['order_number']} from {order['date_formatted']}: {status}."]
+
+    if tracking.get("stage_status") == "delivered":
+        lines.append(f"It was delivered to {order['city_name']}.")
+    else:
+        lines.append(
+            f"It is {tracking.get('total_progress', 0)}% of the way to {order['city_name']}, "
+            f"about {order['days_remaining']:g} days left (estimated {order['delivery_estimate']})."
+        )
+
+    lines.append(f"Tracking number: {order['tracking_number']}. You can follow every step in Account > Orders.")
+    return "\n".join(lines)
+
+
+def no_orders_reply():
+    return "You don't have any orders yet. Once you check out, I can tell you where your order is."
+
+
+def order_not_found_reply(order_id):
+    return f"I couldn't find order BF-{order_id:06d} on your account. Please check the number in Account > Orders."
+
+
+def group_reply(data):
+    """Reply for an /api/groups/my-group payload."""
+    if not data.get("in_group"):
+        return "You are not in a shipping group right now. You can join or start one on the Cost-Sharing page and save up to 80% on shipping."
+
+    group = data["group"]
+    you = data.get("your_info") or {}
+
+    lines = [f"Your {group['city_name']} group has {group['members_count']} of 5 members."]
+
+    if group.get("is_complete"):
+        lines.append("The group is complete, so shipping can begin.")
+    else:
+        spots = group["spots_left"]
+        time_left = group.get("time_left")
+        if time_left == "Expired":
+            lines.append(f"{spots} spot{'s' if spots != 1 else ''} left, and the group has expired.")
+        elif time_left:
+            lines.append(f"{spots} spot{'s' if spots != 1 else ''} left, {time_left} remaining.")
+        else:
+            lines.append(f"{spots} spot{'s' if spots != 1 else ''} left.")
+
+    if you.get("shipping_fee") is not None and you.get("shipping_fee_solo"):
+        lines.append(
+            f"Your shared shipping fee is {you['shipping_fee']:g} SAR instead of "
+            f"{you['shipping_fee_solo']:g} SAR solo ({you.get('savings_percent', 0):g}% saved)."
+        )
+
+    return "\n".join(lines)
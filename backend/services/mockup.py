@@ -0,0 +1,226 @@
+"""
+============================================================================
+BeautyFlow - Packaging Mockups
+============================================================================
+Procedural packaging previews drawn locally in a few milliseconds.
+
+One simple template per product type (bullet, tube, compact, bottle,
+spray), colored by vibe and shaded by finish. Used as an instant
+placeholder while the real image is generated, as the final image in
+fast mode, and as a fallback while OpenAI is unavailable.
+
+Pillow is optional: without it mockups are disabled and callers keep
+the OpenAI-only behaviour.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import io
+import hashlib
+
+# Optional: Pillow for drawing
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+
+# =============================================================================
+# 2. CONSTANTS
+# =============================================================================
+
+# Default canvas size (px)
+MOCKUP_SIZE = 512
+
+# Product type -> template
+PRODUCT_TEMPLATES = {
+    "LIPSTICK": "bullet",
+    "MASCARA": "tube",
+    "EYELINER": "tube",
+    "BLUSH": "compact",
+    "EYESHADOW": "compact",
+    "HIGHLIGHTER": "compact",
+    "BRONZER": "compact",
+    "FOUNDATION": "bottle",
+    "PRIMER": "bottle",
+    "SETTING_SPRAY": "spray",
+}
+
+# Vibe -> (background, body, accent) RGB
+VIBE_PALETTES = {
+    "luxury": ((246, 241, 232), (24, 22, 22), (201, 162, 77)),
+    "cute": ((255, 240, 245), (248, 187, 208), (255, 255, 255)),
+    "minimal": ((245, 245, 245), (255, 255, 255), (60, 60, 60)),
+    "natural": ((240, 235, 222), (196, 164, 122), (92, 122, 74)),
+    "bold": ((250, 250, 250), (200, 16, 46), (20, 20, 20)),
+}
+
+# Finish -> highlight opacity (0 = flat)
+FINISH_SHEEN = {
+    "MATTE": 0,
+    "NATURAL": 40,
+    "SATIN": 70,
+    "DEWY": 110,
+    "GLOWY": 140,
+}
+
+
+# =============================================================================
+# 3. HELPER FUNCTIONS
+# =============================================================================
+
+def mockups_available():
+    """Check whether Pillow is installed."""
+    return Image is not None
+
+
+def mockup_palette(vibe, seed=""):
+    """
+    Pick colors for a mockup.
+
+    Known vibes use their palette; anything else gets a stable pastel
+    palette derived from the seed, so the same prompt looks the same.
+
+    Returns:
+        tuple: (background, body, accent) RGB tuples
+    """
+    palette = VIBE_PALETTES.get((vibe or "").lower())
+    if palette:
+        return palette
+
+    digest = hashlib.sha256(seed.encode("utf-8")).digest()
+    body = tuple(90 + b % 140 for b in digest[0:3])
+    accent = tuple(max(0, c - 70) for c in body)
+    return (248, 246, 244), body, accent
+
+
+# =============================================================================
+# 4. TEMPLATES
+# =============================================================================
+# Each template draws on a square canvas of side s, centered horizontally,
+# and returns the body box used for the finish highlight.
+
+def _draw_bullet(draw, s, body, accent):
+    base = (s * 0.38, s * 0.48, s * 0.62, s * 0.86)
+    draw.rounded_rectangle(base, radius=s * 0.02, fill=body)
+    draw.rectangle((s * 0.38, s * 0.46, s * 0.62, s * 0.50), fill=accent)
+    draw.rounded_rectangle((s * 0.42, s * 0.30, s * 0.58, s * 0.46), radius=s * 0.02, fill=accent)
+    draw.polygon(
+        [(s * 0.44, s * 0.30), (s * 0.56, s * 0.30), (s * 0.56, s * 0.20), (s * 0.44, s * 0.25)],
+        fill=body
+    )
+    return base
+
+
+def _draw_tube(draw, s, body, accent):
+    cap = (s * 0.43, s * 0.14, s * 0.57, s * 0.50)
+    tube = (s * 0.43, s * 0.50, s * 0.57, s * 0.88)
+    draw.rounded_rectangle(cap, radius=s * 0.05, fill=body)
+    draw.rectangle((s * 0.43, s * 0.48, s * 0.57, s * 0.52), fill=accent)
+    draw.rounded_rectangle(tube, radius=s * 0.05, fill=accent)
+    return cap
+
+
+def _draw_compact(draw, s, body, accent):
+    lid = (s * 0.20, s * 0.22, s * 0.80, s * 0.78)
+    draw.ellipse(lid, fill=body)
+    draw.ellipse((s * 0.30, s * 0.32, s * 0.70, s * 0.68), outline=accent, width=max(2, int(s * 0.012)))
+    draw.ellipse((s * 0.44, s * 0.46, s * 0.56, s * 0.54), fill=accent)
+    return lid
+
+
+def _draw_bottle(draw, s, body, accent):
+    bottle = (s * 0.32, s * 0.36, s * 0.68, s * 0.88)
+    draw.rounded_rectangle(bottle, radius=s * 0.06, fill=body)
+    draw.rectangle((s * 0.45, s * 0.26, s * 0.55, s * 0.36), fill=accent)
+    draw.rounded_rectangle((s * 0.40, s * 0.18, s * 0.60, s * 0.27), radius=s * 0.02, fill=accent)
+    draw.rectangle((s * 0.36, s * 0.58, s * 0.64, s * 0.70), fill=accent)
+    return bottle
+
+
+def _draw_spray(draw, s, body, accent):
+    bottle = (s * 0.34, s * 0.32, s * 0.66, s * 0.90)
+    draw.rounded_rectangle(bottle, radius=s * 0.10, fill=body)
+    draw.rectangle((s * 0.44, s * 0.20, s * 0.56, s * 0.32), fill=accent)
+    draw.rectangle((s * 0.56, s * 0.22, s * 0.62, s * 0.26), fill=accent)
+    draw.rectangle((s * 0.38, s * 0.56, s * 0.62, s * 0.66), fill=accent)
+    return bottle
+
+
+TEMPLATE_DRAWERS = {
+    "bullet": _draw_bullet,
+    "tube": _draw_tube,
+    "compact": _draw_compact,
+    "bottle": _draw_bottle,
+    "spray": _draw_spray,
+}
+
+
+# =============================================================================
+# 5. RENDERER
+# =============================================================================
+
+def render_mockup(product_type, finish="NATURAL", vibe=None, seed="", size=MOCKUP_SIZE):
+    """
+    Draw a packaging mockup.
+
+    Args:
+        product_type: Product type (e.g. "LIPSTICK"); unknown types use the bottle
+        finish: Finish (e.g. "MATTE", "GLOWY") controlling the sheen
+        vibe: Optional SmartPicks vibe selecting the palette
+        seed: Text used for colors when the vibe is unknown (e.g. prompt)
+        size: Square canvas size in px
+
+    Returns:
+        bytes: PNG image
+
+    Raises:
+        RuntimeError: Pillow is not installed
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required for mockups")
+
+    background, body, accent = mockup_palette(vibe, seed)
+    template = PRODUCT_TEMPLATES.get((product_type or "").upper(), "bottle")
+
+    img = Image.new("RGB", (size, size), background)
+    draw = ImageDraw.Draw(img)
+
+    # Soft floor shadow
+    draw.ellipse(
+        (size * 0.25, size * 0.86, size * 0.75, size * 0.94),
+        fill=tuple(max(0, c - 25) for c in background)
+    )
+
+    box = TEMPLATE_DRAWERS[template](draw, size, body, accent)
+
+    # Finish: a vertical highlight strip on the body
+    sheen = FINISH_SHEEN.get((finish or "").upper(), FINISH_SHEEN["NATURAL"])
+    if sheen:
+        overlay = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+        x0, y0, x1, y1 = box
+        width = (x1 - x0) * 0.12
+        left = x0 + (x1 - x0) * 0.18
+        ImageDraw.Draw(overlay).rounded_rectangle(
+            (left, y0 + (y1 - y0) * 0.08, left + width, y1 - (y1 - y0) * 0.08),
+            radius=width / 2,
+            fill=(255, 255, 255, sheen)
+        )
+        img = Image.alpha_composite(img.convert("RGBA"), overlay).convert("RGB")
+        draw = ImageDraw.Draw(img)
+
+    # Brand mark under the product
+    font = ImageFont.load_default()
+    label = "BEAUTYFLOW"
+    text_width = draw.textlength(label, font=font)
+    draw.text(((size - text_width) / 2, size * 0.95), label, fill=(120, 120, 120), font=font)
+
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
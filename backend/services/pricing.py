@@ -0,0 +1,148 @@
+"""
+============================================================================
+BeautyFlow - Pricing Grid
+============================================================================
+Precomputed prices for every AI product spec combination.
+
+Price = base price (product type) x formula x coverage x finish x skin
+multipliers, rounded to the nearest 5 SAR and capped at MAX_PRICE. All
+combinations (10 x 6 x 3 x 5 x 5 = 4,500) are computed once at startup
+into a flat unsigned-short array, so a quote is a few dict lookups and
+one array index.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+from array import array
+
+from services.prompt_specs import SPEC_DEFAULTS
+
+
+# =============================================================================
+# 2. CONSTANTS
+# =============================================================================
+
+# Spec fields in grid order (first varies slowest)
+PRICING_FIELDS = ("product_type", "formula", "coverage", "finish", "skin_type")
+
+# Base price for unknown product types (SAR)
+DEFAULT_BASE_PRICE = 50
+
+
+# =============================================================================
+# 3. PRICE GRID
+# =============================================================================
+
+class PriceGrid:
+    """
+    Flat lookup table of final prices.
+
+    Args:
+        base_prices: {product_type: base price}
+        formula_mult / coverage_mult / finish_mult / skin_mult: {value: multiplier}
+        max_price: Price cap (SAR)
+        defaults: Values for missing spec fields (default: SPEC_DEFAULTS,
+                  the values a saved product gets)
+    """
+
+    def __init__(self, base_prices, formula_mult, coverage_mult, finish_mult,
+                 skin_mult, max_price, defaults=SPEC_DEFAULTS):
+        self.base_prices = dict(base_prices)
+        self.max_price = max_price
+        self.defaults = {field: str(defaults[field]).upper() for field in PRICING_FIELDS}
+        self._tables = (
+            self.base_prices,
+            dict(formula_mult),
+            dict(coverage_mult),
+            dict(finish_mult),
+            dict(skin_mult),
+        )
+
+        # Value -> position per dimension, and strides for the flat index
+        self._positions = [
+            {value: i for i, value in enumerate(table)}
+            for table in self._tables
+        ]
+        self._strides = []
+        stride = 1
+        for table in reversed(self._tables):
+            self._strides.insert(0, stride)
+            stride *= len(table)
+
+        self._prices = array("H", [0]) * stride
+        self._fill()
+
+    def _fill(self, dimension=0, offset=0, factor=1.0):
+        table = self._tables[dimension]
+        stride = self._strides[dimension]
+
+        for i, multiplier in enumerate(table.values()):
+            value = factor * multiplier
+            if dimension + 1 < len(self._tables):
+                self._fill(dimension + 1, offset + i * stride, value)
+            else:
+                self._prices[offset + i] = self.compute(value)
+
+    def compute(self, raw_price):
+        """Round to the nearest 5 and apply the cap."""
+        return min(round(raw_price / 5) * 5, self.max_price)
+
+    def __len__(self):
+        return len(self._prices)
+
+    def options(self):
+        """
+        List the valid values per spec field.
+
+        Returns:
+            dict: {field: [values]}
+        """
+        return {
+            field: list(table)
+            for field, table in zip(PRICING_FIELDS, self._tables)
+        }
+
+    def quote(self, spec):
+        """
+        Price one spec.
+
+        Missing fields take the defaults, so a quote matches the price
+        saved for the product. Unknown values fall back to the base price
+        default / a x1.0 multiplier, like the original inline calculation.
+
+        Args:
+            spec: dict with PRICING_FIELDS
+
+        Returns:
+            dict: {base_price, final_price}
+        """
+        values = self.normalize(spec)
+        base_price = self.base_prices.get(values[0], DEFAULT_BASE_PRICE)
+
+        index = 0
+        for value, positions, stride in zip(values, self._positions, self._strides):
+            position = positions.get(value)
+            if position is None:
+                return {"base_price": base_price, "final_price": self._compute_slow(values)}
+            index += position * stride
+
+        return {"base_price": base_price, "final_price": self._prices[index]}
+
+    def normalize(self, spec):
+        """Spec values in grid order, upper-cased, defaults for missing fields."""
+        return [
+            str(spec.get(field) or self.defaults[field]).strip().upper()
+            for field in PRICING_FIELDS
+        ]
+
+    def _compute_slow(self, values):
+        price = self.base_prices.get(values[0], DEFAULT_BASE_PRICE)
+        for value, table in zip(values[1:], self._tables[1:]):
+            price *= table.get(value, 1)
+        return self.compute(price)
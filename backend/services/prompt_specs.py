@@ -0,0 +1,250 @@
+"""
+============================================================================
+BeautyFlow - Prompt Spec Extraction
+============================================================================
+Turns a design prompt into a structured product spec in one pass.
+
+Every keyword table (product type, formula, coverage, finish, skin
+type, vibe) is compiled into one word-boundary regex, so "oil" no
+longer matches "oily" and "full" no longer matches "colorful". Within
+a field the earliest keyword in the prompt wins; vibes keep the fixed
+priority used for product naming (luxury > cute > natural > bold) and
+are read from the packaging description when there is one.
+
+Benchmark and reference corpus: tools/bench_prompt_specs.py
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import re
+
+
+# =============================================================================
+# 2. KEYWORD TABLES
+# =============================================================================
+
+# Field -> {keyword: value}; two-word keywords match across spaces/hyphens
+SPEC_KEYWORDS = {
+    "product_type": {
+        "lipstick": "LIPSTICK",
+        "mascara": "MASCARA",
+        "blush": "BLUSH",
+        "foundation": "FOUNDATION",
+        "eyeliner": "EYELINER",
+        "eye liner": "EYELINER",
+        "eyeshadow": "EYESHADOW",
+        "eye shadow": "EYESHADOW",
+        "highlighter": "HIGHLIGHTER",
+        "bronzer": "BRONZER",
+        "primer": "PRIMER",
+        "setting spray": "SETTING_SPRAY",
+        "setting mist": "SETTING_SPRAY",
+    },
+    "formula": {
+        "water": "WATER",
+        "oil": "OIL",
+        "cream": "CREAM",
+        "gel": "GEL",
+        "powder": "POWDER",
+        "silicone": "SILICONE",
+    },
+    "coverage": {
+        "sheer": "SHEER",
+        "medium": "MEDIUM",
+        "full": "FULL",
+    },
+    "finish": {
+        "matte": "MATTE",
+        "natural": "NATURAL",
+        "dewy": "DEWY",
+        "glowy": "GLOWY",
+        "satin": "SATIN",
+    },
+    "skin_type": {
+        "normal": "NORMAL",
+        "oily": "OILY",
+        "dry": "DRY",
+        "combination": "COMBINATION",
+        "sensitive": "SENSITIVE",
+    },
+}
+
+# Vibe -> keywords (checked in this priority order)
+VIBE_KEYWORDS = {
+    "luxury": ("luxury", "gold", "elegant", "premium", "black"),
+    "cute": ("cute", "pink", "heart", "kawaii", "pastel"),
+    "natural": ("natural", "organic", "green", "eco"),
+    "bold": ("bold", "dark", "edgy", "red", "strong"),
+}
+
+VIBE_PRIORITY = tuple(VIBE_KEYWORDS)
+
+# Values used when a field is not mentioned
+SPEC_DEFAULTS = {
+    "product_type": "LIPSTICK",
+    "formula": "CREAM",
+    "coverage": "MEDIUM",
+    "finish": "NATURAL",
+    "skin_type": "NORMAL",
+}
+
+PACKAGING_MARKER = "Packaging:"
+
+
+# =============================================================================
+# 3. COMPILED EXTRACTOR
+# =============================================================================
+
+_SEPARATOR = r"[\s_-]+"
+_SEPARATOR_RE = re.compile(_SEPARATOR)
+
+
+def _normalize_keyword(keyword):
+    return _SEPARATOR_RE.sub(" ", keyword.strip().lower())
+
+
+def _trie_pattern(keywords):
+    """
+    Build a regex alternation shaped like a trie of the keywords.
+
+    Shared prefixes are factored out ("oil|oily" -> "oil(?:y)?"), so the
+    regex engine branches once per character instead of retrying every
+    keyword at every position.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        branches = []
+        for ch, child in sorted(node.items()):
+            if ch:
+                head = _SEPARATOR if ch == " " else re.escape(ch)
+                branches.append(head + build(child))
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class SpecExtractor:
+    """
+    Single-pass keyword extractor.
+
+    All keywords are compiled into one trie-shaped regex wrapped in word
+    boundaries (with an optional plural "s"/"es"). One scan of the
+    lowercased prompt yields only the keyword hits, each resolved to its
+    (field, value) pairs with a dict lookup.
+    """
+
+    def __init__(self, spec_keywords=SPEC_KEYWORDS, vibe_keywords=VIBE_KEYWORDS,
+                 defaults=SPEC_DEFAULTS):
+        self.defaults = dict(defaults)
+        self.fields = tuple(spec_keywords)
+        self._lookup = {}
+
+        for field, table in spec_keywords.items():
+            for keyword, value in table.items():
+                self._add(keyword, field, value)
+
+        for vibe, keywords in vibe_keywords.items():
+            for keyword in keywords:
+                self._add(keyword, "vibe", vibe)
+
+        self._pattern = re.compile(rf"\b({_trie_pattern(self._lookup)})(?:e?s)?\b")
+
+    def _add(self, keyword, field, value):
+        self._lookup.setdefault(_normalize_keyword(keyword), []).append((field, value))
+
+    def _scan(self, text, found, vibes, pos=0, endpos=None):
+        """Record the first hit per field (and every vibe) in text[pos:endpos]."""
+        if endpos is None:
+            endpos = len(text)
+
+        for hit in self._pattern.findall(text, pos, endpos):
+            if not hit.isalpha():
+                hit = _normalize_keyword(hit)
+            for field, value in self._lookup[hit]:
+                if field == "vibe":
+                    if vibes is not None:
+                        vibes.add(value)
+                elif field not in found:
+                    found[field] = value
+
+    def extract(self, prompt_raw):
+        """
+        Extract the structured spec from a prompt.
+
+        Args:
+            prompt_raw: Design prompt text
+
+        Returns:
+            dict: {product_type, formula, coverage, finish, skin_type,
+                   packaging_desc, vibe} - vibe is None when not detected
+        """
+        prompt_raw = prompt_raw or ""
+        lower = prompt_raw.lower()
+
+        found = {}
+        vibes = set()
+        packaging_desc = ""
+        marker = prompt_raw.find(PACKAGING_MARKER)
+
+        if marker >= 0:
+            # Packaging description runs up to the next period; vibes are
+            # only read from it when the prompt has one
+            desc_start = marker + len(PACKAGING_MARKER)
+            desc_end = prompt_raw.find(".", desc_start)
+            if desc_end < 0:
+                desc_end = len(prompt_raw)
+            packaging_desc = prompt_raw[desc_start:desc_end].strip()
+
+            self._scan(lower, found, None, 0, marker)
+            self._scan(lower, found, vibes, desc_start, desc_end)
+            self._scan(lower, found, None, desc_end)
+        else:
+            self._scan(lower, found, vibes)
+
+        spec = {field: found.get(field, self.defaults.get(field)) for field in self.fields}
+        spec["packaging_desc"] = packaging_desc
+        spec["vibe"] = next((v for v in VIBE_PRIORITY if v in vibes), None)
+        return spec
+
+    def detect_vibe(self, text, default=None):
+        """
+        Detect the vibe of free text (e.g. a packaging description).
+
+        Returns:
+            str: Highest-priority vibe mentioned, or default
+        """
+        vibes = set()
+        self._scan((text or "").lower(), {}, vibes)
+        return next((v for v in VIBE_PRIORITY if v in vibes), default)
+
+
+# =============================================================================
+# 4. MODULE API
+# =============================================================================
+
+_extractor = SpecExtractor()
+
+
+def extract_specs(prompt_raw):
+    """Extract a structured spec with the shared compiled extractor."""
+    return _extractor.extract(prompt_raw)
+
+
+def detect_vibe(text, default=None):
+    """Detect the vibe of free text with the shared compiled extractor."""
+    return _extractor.detect_vibe(text, default)
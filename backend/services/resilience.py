@@ -0,0 +1,198 @@
+"""
+============================================================================
+BeautyFlow - Upstream Resilience
+============================================================================
+Deadlines, retries and circuit breakers for OpenAI and Twilio calls.
+
+- Deadline: every call gets a total time budget; retries never start
+  once the budget is spent.
+- Retries: only for operations that are safe to repeat, with capped
+  exponential backoff and full jitter.
+- Circuit breaker: after failure_threshold consecutive failures the
+  upstream is skipped for reset_timeout seconds, so callers fall back
+  immediately instead of waiting on a degraded service. One trial call
+  is then let through (half-open) to probe recovery.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import time
+import random
+import threading
+
+
+# =============================================================================
+# 2. CONSTANTS & ERRORS
+# =============================================================================
+
+BREAKER_CLOSED = "CLOSED"
+BREAKER_OPEN = "OPEN"
+BREAKER_HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is temporarily unavailable")
+        self.name = name
+        self.retry_after = retry_after
+
+
+# =============================================================================
+# 3. CIRCUIT BREAKER
+# =============================================================================
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker (thread-safe).
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = BREAKER_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_running = False
+
+        self.total_failures = 0
+        self.short_circuited = 0
+
+    def before_call(self):
+        """
+        Check whether a call may proceed.
+
+        Raises:
+            CircuitOpen: Upstream is being skipped
+        """
+        with self._lock:
+            if self._state == BREAKER_OPEN:
+                elapsed = time.monotonic() - self._opened_at
+                if elapsed < self.reset_timeout:
+                    self.short_circuited += 1
+                    raise CircuitOpen(self.name, self.reset_timeout - elapsed)
+                self._state = BREAKER_HALF_OPEN
+                self._probe_running = False
+
+            if self._state == BREAKER_HALF_OPEN:
+                if self._probe_running:
+                    self.short_circuited += 1
+                    raise CircuitOpen(self.name, 1)
+                self._probe_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._state = BREAKER_CLOSED
+            self._failures = 0
+            self._probe_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self.total_failures += 1
+            self._probe_running = False
+
+            if self._state == BREAKER_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != BREAKER_OPEN:
+                    print(f"[RESILIENCE] {self.name} circuit opened after {self._failures} failure(s)")
+                self._state = BREAKER_OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self):
+        """
+        Return breaker state.
+
+        Returns:
+            dict: {state, consecutive_failures, total_failures, short_circuited}
+        """
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "total_failures": self.total_failures,
+                "short_circuited": self.short_circuited,
+            }
+
+
+# =============================================================================
+# 4. RESILIENT CALL
+# =============================================================================
+
+def backoff_delay(attempt, base_delay=0.5, max_delay=4.0):
+    """Full-jitter exponential backoff for retry number `attempt` (1-based)."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+
+def resilient_call(fn, breaker, retries=0, is_transient=None, deadline=None,
+                   base_delay=0.5, max_delay=4.0, is_retryable=None):
+    """
+    Call fn(timeout) through a circuit breaker with optional retries.
+
+    Only transient errors (timeouts, connection errors, 5xx, 429) count
+    against the breaker and are retried; anything else (bad input,
+    content policy) means the upstream is healthy and is raised as is.
+
+    Args:
+        fn: Callable(timeout) doing the upstream request; timeout is the
+            remaining deadline in seconds (None when unlimited)
+        breaker: CircuitBreaker for this upstream
+        retries: Extra attempts (use 0 for non-idempotent operations)
+        is_transient: Callable(exception) -> bool (default: every error)
+        deadline: Total seconds for all attempts (None: no limit)
+        base_delay / max_delay: Backoff bounds in seconds
+        is_retryable: Callable(exception) -> bool narrowing which transient
+            errors are retried (default: all of them). For billed,
+            non-idempotent calls pass a check for errors where the
+            request was never processed.
+
+    Returns:
+        Whatever fn returns
+
+    Raises:
+        CircuitOpen: Breaker is open
+        Exception: Last error from fn
+    """
+    started = time.monotonic()
+    attempt = 0
+
+    while True:
+        remaining = None
+        if deadline is not None:
+            remaining = deadline - (time.monotonic() - started)
+
+        breaker.before_call()
+        try:
+            result = fn(remaining)
+        except Exception as e:
+            if is_transient is not None and not is_transient(e):
+                breaker.record_success()
+                raise
+
+            breaker.record_failure()
+            attempt += 1
+
+            if attempt > retries:
+                raise
+            if is_retryable is not None and not is_retryable(e):
+                raise
+
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            if deadline is not None and time.monotonic() - started + delay >= deadline:
+                raise
+
+            print(f"[RESILIENCE] {breaker.name} attempt {attempt} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+            continue
+
+        breaker.record_success()
+        return result
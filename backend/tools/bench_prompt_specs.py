@@ -0,0 +1,176 @@
+"""
+============================================================================
+BeautyFlow - Prompt Spec Benchmark
+============================================================================
+Checks services/prompt_specs.py against the reference corpus and times
+it against the previous substring-loop extractor.
+
+Corpus: tools/data/prompt_specs_corpus.jsonl, one JSON object per line:
+    {"prompt": "...", "expect": {field: value, ...}}
+Only the fields listed in "expect" are compared.
+
+Usage:
+    python tools/bench_prompt_specs.py [--iterations 2000]
+
+Exits with status 1 when the compiled extractor misses a corpus case.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import sys
+import json
+import timeit
+import argparse
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.prompt_specs import extract_specs  # noqa: E402
+
+CORPUS_PATH = BACKEND_DIR / "tools" / "data" / "prompt_specs_corpus.jsonl"
+
+
+# =============================================================================
+# 2. LEGACY EXTRACTOR (baseline)
+# =============================================================================
+# The substring loops extract_design_specs() and generate_product_name()
+# used before the compiled extractor, kept here as the timing baseline.
+
+def legacy_extract(prompt_raw):
+    prompt_upper = prompt_raw.upper()
+    prompt_lower = prompt_raw.lower()
+
+    product_type = "LIPSTICK"
+    for pt in ["LIPSTICK", "MASCARA", "BLUSH", "FOUNDATION", "EYELINER",
+               "EYESHADOW", "HIGHLIGHTER", "BRONZER", "PRIMER"]:
+        if pt in prompt_upper:
+            product_type = pt
+            break
+    if "SETTING" in prompt_upper:
+        product_type = "SETTING_SPRAY"
+
+    formula = "CREAM"
+    for keyword, value in {"water": "WATER", "oil": "OIL", "gel": "GEL",
+                           "powder": "POWDER", "silicone": "SILICONE"}.items():
+        if keyword in prompt_lower:
+            formula = value
+            break
+
+    coverage = "MEDIUM"
+    if "sheer" in prompt_lower:
+        coverage = "SHEER"
+    elif "full" in prompt_lower:
+        coverage = "FULL"
+
+    finish = "NATURAL"
+    for keyword, value in {"matte": "MATTE", "dewy": "DEWY",
+                           "glowy": "GLOWY", "satin": "SATIN"}.items():
+        if keyword in prompt_lower:
+            finish = value
+            break
+
+    skin_type = "NORMAL"
+    for keyword, value in {"oily": "OILY", "dry": "DRY", "combination": "COMBINATION",
+                           "sensitive": "SENSITIVE"}.items():
+        if keyword in prompt_lower:
+            skin_type = value
+            break
+
+    packaging_desc = ""
+    if "Packaging:" in prompt_raw:
+        packaging_desc = prompt_raw.split("Packaging:")[-1].split(".")[0].strip()
+
+    vibe = None
+    desc = (packaging_desc or prompt_raw).lower()
+    if any(word in desc for word in ["luxury", "gold", "elegant", "premium", "black"]):
+        vibe = "luxury"
+    elif any(word in desc for word in ["cute", "pink", "heart", "kawaii", "pastel"]):
+        vibe = "cute"
+    elif any(word in desc for word in ["natural", "organic", "green", "eco"]):
+        vibe = "natural"
+    elif any(word in desc for word in ["bold", "dark", "edgy", "red", "strong"]):
+        vibe = "bold"
+
+    return {
+        "product_type": product_type,
+        "formula": formula,
+        "coverage": coverage,
+        "finish": finish,
+        "skin_type": skin_type,
+        "packaging_desc": packaging_desc,
+        "vibe": vibe,
+    }
+
+
+# =============================================================================
+# 3. CORPUS CHECK
+# =============================================================================
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def check(extract, corpus):
+    """
+    Compare an extractor against the corpus.
+
+    Returns:
+        list: [(prompt, field, expected, got)] mismatches
+    """
+    mismatches = []
+    for case in corpus:
+        spec = extract(case["prompt"])
+        for field, expected in case["expect"].items():
+            if spec.get(field) != expected:
+                mismatches.append((case["prompt"], field, expected, spec.get(field)))
+    return mismatches
+
+
+# =============================================================================
+# 4. MAIN
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prompt spec extraction")
+    parser.add_argument("--iterations", type=int, default=2000,
+                        help="Passes over the corpus per extractor")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    prompts = [case["prompt"] for case in corpus]
+    checks = sum(len(case["expect"]) for case in corpus)
+
+    results = {}
+    for name, extract in (("compiled", extract_specs), ("legacy", legacy_extract)):
+        mismatches = check(extract, corpus)
+        seconds = timeit.timeit(
+            lambda: [extract(p) for p in prompts],
+            number=args.iterations
+        )
+        per_call_us = seconds / (args.iterations * len(prompts)) * 1e6
+        results[name] = (mismatches, per_call_us)
+
+        print(f"{name:>9}: {checks - len(mismatches)}/{checks} fields correct, "
+              f"{per_call_us:.2f} us/prompt")
+
+    compiled_us = results["compiled"][1]
+    legacy_us = results["legacy"][1]
+    print(f"  speedup: {legacy_us / compiled_us:.2f}x over {len(prompts)} prompts")
+
+    mismatches = results["compiled"][0]
+    for prompt, field, expected, got in mismatches:
+        print(f"  MISS {field}: expected {expected!r}, got {got!r} <- {prompt[:70]!r}")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
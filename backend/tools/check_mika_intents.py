@@ -0,0 +1,83 @@
+"""
+============================================================================
+BeautyFlow - Mika Intent Corpus Check
+============================================================================
+Checks services/mika_intents.py against the reference corpus. Messages
+routed to an intent are answered from the database and never reach the
+LLM, so the corpus holds near misses ("the order page", "order #1 best
+seller") as well as real status questions.
+
+Corpus: tools/data/mika_intents_corpus.jsonl, one JSON object per line:
+    {"message": "...", "expect": {"intent": "order_status" | "group_status" | null,
+                                  "order_id": 123}}
+"order_id" is only compared when listed.
+
+Usage:
+    python tools/check_mika_intents.py
+
+Exits with status 1 when a corpus case is misclassified.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import sys
+import json
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.mika_intents import classify_intent  # noqa: E402
+
+CORPUS_PATH = BACKEND_DIR / "tools" / "data" / "mika_intents_corpus.jsonl"
+
+
+# =============================================================================
+# 2. CORPUS CHECK
+# =============================================================================
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def check(corpus):
+    """
+    Classify every corpus message.
+
+    Returns:
+        list: [(message, expected, got)] mismatches
+    """
+    mismatches = []
+    for case in corpus:
+        intent, slots = classify_intent(case["message"])
+        got = {"intent": intent, **slots}
+        expected = case["expect"]
+        if any(got.get(field) != value for field, value in expected.items()):
+            mismatches.append((case["message"], expected, got))
+    return mismatches
+
+
+# =============================================================================
+# 3. MAIN
+# =============================================================================
+
+def main():
+    corpus = load_corpus()
+    mismatches = check(corpus)
+
+    print(f"{len(corpus) - len(mismatches)}/{len(corpus)} messages classified correctly")
+    for message, expected, got in mismatches:
+        print(f"  MISS expected {expected}, got {got} <- {message!r}")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+============================================================================
+BeautyFlow - Price Grid Check
+============================================================================
+Checks services/pricing.py PriceGrid quotes against the slow per-field
+calculation, and that a spec with missing fields is priced exactly like
+the same spec with SPEC_DEFAULTS filled in (the product that gets saved).
+
+The grid below is synthetic: every default value has a multiplier other
+than 1, so a missing field priced at x1.0 shows up as a mismatch.
+
+Usage:
+    python tools/check_pricing.py
+
+Exits with status 1 when a quote is wrong.
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import sys
+from itertools import product
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.pricing import PriceGrid, PRICING_FIELDS  # noqa: E402
+from services.prompt_specs import SPEC_DEFAULTS  # noqa: E402
+
+
+# =============================================================================
+# 2. TEST GRID
+# =============================================================================
+
+BASE_PRICES = {"LIPSTICK": 60, "FOUNDATION": 90}
+FORMULA_MULT = {"CREAM": 1.10, "MATTE": 0.95}
+COVERAGE_MULT = {"MEDIUM": 1.20, "FULL": 1.35}
+FINISH_MULT = {"NATURAL": 0.90, "GLOSSY": 1.15}
+SKIN_MULT = {"NORMAL": 1.05, "DRY": 1.25}
+MAX_PRICE = 150
+
+GRID = PriceGrid(BASE_PRICES, FORMULA_MULT, COVERAGE_MULT, FINISH_MULT, SKIN_MULT, MAX_PRICE)
+
+
+# =============================================================================
+# 3. CHECKS
+# =============================================================================
+
+def spec_cases():
+    """Full specs over the grid values plus one unknown value per field."""
+    tables = [BASE_PRICES, FORMULA_MULT, COVERAGE_MULT, FINISH_MULT, SKIN_MULT]
+    choices = [list(table) + ["UNKNOWN"] for table in tables]
+    for values in product(*choices):
+        yield dict(zip(PRICING_FIELDS, values))
+
+
+def check():
+    """
+    Compare grid quotes with the slow path and with explicit defaults.
+
+    Returns:
+        list: [(spec, expected, got)] mismatches
+    """
+    mismatches = []
+
+    for spec in spec_cases():
+        values = GRID.normalize(spec)
+        expected = GRID._compute_slow(values)
+        got = GRID.quote(spec)["final_price"]
+        if got != expected:
+            mismatches.append((spec, expected, got))
+
+        # Drop each field in turn: it must price as its default
+        for field in PRICING_FIELDS:
+            for missing in (None, ""):
+                partial = {**spec, field: missing}
+                expected = GRID.quote({**spec, field: SPEC_DEFAULTS[field]})
+                got = GRID.quote(partial)
+                if got != expected:
+                    mismatches.append((partial, expected, got))
+
+    expected = GRID.quote(SPEC_DEFAULTS)
+    got = GRID.quote({})
+    if got != expected:
+        mismatches.append(({}, expected, got))
+
+    return mismatches
+
+
+def main():
+    for field in PRICING_FIELDS:
+        assert field in SPEC_DEFAULTS, f"SPEC_DEFAULTS has no {field}"
+
+    mismatches = check()
+    for spec, expected, got in mismatches:
+        print(f"MISMATCH {spec}: expected {expected}, got {got}")
+
+    print(f"{len(mismatches)} mismatch(es)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+"""
+============================================================================
+BeautyFlow - Fake OpenAI Server
+============================================================================
+Local stand-in for the OpenAI endpoints BeautyFlow uses, for load and
+latency testing without API credit.
+
+Endpoints:
+    POST /v1/images/generations   deterministic PNG per prompt (b64_json)
+    POST /v1/chat/completions     deterministic reply, stream=true supported
+    GET  /v1/models               minimal model list
+    GET  /_stats                  request / error counters
+
+Latency per endpoint is drawn from a distribution:
+    fixed:S                 always S seconds
+    uniform:A,B             between A and B seconds
+    lognormal:MEDIAN,SIGMA  long-tailed, like the real API
+
+Usage:
+    python tools/fake_openai.py --port 8001 \\
+        --image-latency lognormal:8,0.4 --chat-latency lognormal:1.2,0.5 \\
+        --error-rate 0.02
+
+    # then start BeautyFlow against it
+    OPENAI_BASE_URL=http://localhost:8001/v1 python app.py
+
+Author: BeautyFlow Team
+Version: 1.0.0
+============================================================================
+"""
+
+# =============================================================================
+# 1. IMPORTS
+# =============================================================================
+
+import json
+import math
+import time
+import zlib
+import base64
+import random
+import struct
+import hashlib
+import argparse
+import threading
+
+from flask import Flask, Response, jsonify, request
+
+
+# =============================================================================
+# 2. CONFIGURATION
+# =============================================================================
+
+app = Flask(__name__)
+
+CONFIG = {
+    "image_latency": ("fixed", (0.0,)),
+    "chat_latency": ("fixed", (0.0,)),
+    "error_rate": 0.0,
+    "error_statuses": (500, 429),
+    "stream_token_delay": 0.02,
+}
+
+STATS = {"images": 0, "chat": 0, "errors": 0}
+STATS_LOCK = threading.Lock()
+
+# Canned chat replies; one is chosen deterministically per message
+CHAT_REPLIES = [
+    "Hi! I'm Mika 💕 BeautyFlow lets you design custom packaging with AI "
+    "and share import costs with a group.\n\nHow can I help you today?",
+    "Great question! Orders usually arrive within 7-14 days after your "
+    "group ships. You can track them from your account page.",
+    "Cost sharing splits shipping, customs and SFDA fees between up to 5 "
+    "people in the same city, so everyone pays less.",
+]
+
+
+# =============================================================================
+# 3. HELPER FUNCTIONS
+# =============================================================================
+
+def parse_latency(value):
+    """
+    Parse a latency spec like "lognormal:8,0.4".
+
+    Returns:
+        tuple: (kind, params)
+    """
+    kind, _, params = value.partition(":")
+    numbers = tuple(float(p) for p in params.split(",") if p.strip())
+
+    expected = {"fixed": 1, "uniform": 2, "lognormal": 2}
+    if kind not in expected or len(numbers) != expected[kind]:
+        raise argparse.ArgumentTypeError(f"Invalid latency spec: {value!r}")
+    return kind, numbers
+
+
+def sample_latency(spec):
+    """Draw one latency (seconds) from a parsed spec."""
+    kind, params = spec
+    if kind == "fixed":
+        return params[0]
+    if kind == "uniform":
+        return random.uniform(*params)
+    median, sigma = params
+    return random.lognormvariate(math.log(max(median, 1e-3)), sigma)
+
+
+def maybe_fail():
+    """Return an OpenAI-style error response for the configured error rate."""
+    if random.random() >= CONFIG["error_rate"]:
+        return None
+
+    with STATS_LOCK:
+        STATS["errors"] += 1
+
+    status = random.choice(CONFIG["error_statuses"])
+    error_type = "rate_limit_exceeded" if status == 429 else "server_error"
+    response = jsonify({
+        "error": {
+            "message": f"Injected {status} from fake OpenAI server",
+            "type": error_type,
+            "code": error_type,
+        }
+    })
+    if status == 429:
+        response.headers["Retry-After"] = "1"
+    return response, status
+
+
+def make_png(width, height, seed_bytes):
+    """
+    Build a deterministic gradient PNG without Pillow.
+
+    Args:
+        width, height: Image size in px
+        seed_bytes: Bytes that pick the colors (e.g. prompt hash)
+
+    Returns:
+        bytes: PNG file
+    """
+    top = seed_bytes[0:3]
+    bottom = seed_bytes[3:6]
+
+    rows = []
+    for y in range(height):
+        t = y / max(height - 1, 1)
+        pixel = bytes(int(top[i] + (bottom[i] - top[i]) * t) for i in range(3))
+        rows.append(b"\x00" + pixel * width)
+
+    def chunk(tag, data):
+        body = tag + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(b"".join(rows), 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+def parse_size(value, default=1024):
+    """Parse "1024x1024" into (width, height)."""
+    try:
+        width, height = (int(v) for v in (value or "").split("x"))
+        return width, height
+    except ValueError:
+        return default, default
+
+
+# =============================================================================
+# 4. ENDPOINTS
+# =============================================================================
+
+@app.route("/v1/images/generations", methods=["POST"])
+def images_generations():
+    data = request.get_json(silent=True) or {}
+    prompt = data.get("prompt") or ""
+    count = int(data.get("n") or 1)
+    width, height = parse_size(data.get("size"))
+
+    with STATS_LOCK:
+        STATS["images"] += 1
+
+    time.sleep(sample_latency(CONFIG["image_latency"]))
+
+    failure = maybe_fail()
+    if failure:
+        return failure
+
+    images = []
+    for i in range(count):
+        digest = hashlib.sha256(f"{prompt}|{i}".encode("utf-8")).digest()
+        png = make_png(width, height, digest)
+        images.append({"b64_json": base64.b64encode(png).decode("ascii")})
+
+    return jsonify({"created": int(time.time()), "data": images})
+
+
+@app.route("/v1/chat/completions", methods=["POST"])
+def chat_completions():
+    data = request.get_json(silent=True) or {}
+    messages = data.get("messages") or []
+    model = data.get("model") or "gpt-4o-mini"
+    last = messages[-1]["content"] if messages else ""
+
+    with STATS_LOCK:
+        STATS["chat"] += 1
+
+    time.sleep(sample_latency(CONFIG["chat_latency"]))
+
+    failure = maybe_fail()
+    if failure:
+        return failure
+
+    digest = hashlib.sha256(str(last).encode("utf-8")).digest()
+    reply = CHAT_REPLIES[digest[0] % len(CHAT_REPLIES)]
+    completion_id = f"chatcmpl-fake{digest.hex()[:20]}"
+    created = int(time.time())
+
+    if data.get("stream"):
+        def generate():
+            for index, word in enumerate(reply.split(" ")):
+                token = word if index == 0 else " " + word
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                time.sleep(CONFIG["stream_token_delay"])
+
+            done = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return Response(generate(), mimetype="text/event-stream")
+
+    prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+    completion_tokens = len(reply.split())
+
+    return jsonify({
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": reply},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    })
+
+
+@app.route("/v1/models", methods=["GET"])
+def models():
+    return jsonify({
+        "object": "list",
+        "data": [
+            {"id": "gpt-image-1", "object": "model", "owned_by": "fake"},
+            {"id": "gpt-4o-mini", "object": "model", "owned_by": "fake"},
+        ],
+    })
+
+
+@app.route("/_stats", methods=["GET"])
+def stats():
+    with STATS_LOCK:
+        return jsonify(dict(STATS))
+
+
+# =============================================================================
+# 5. RUN SERVER
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI server for BeautyFlow load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--image-latency", type=parse_latency, default="fixed:0",
+                        help="Latency spec for image generations (e.g. lognormal:8,0.4)")
+    parser.add_argument("--chat-latency", type=parse_latency, default="fixed:0",
+                        help="Latency spec for chat completions (e.g. uniform:0.5,2)")
+    parser.add_argument("--stream-token-delay", type=float, default=0.02,
+                        help="Seconds between streamed chat tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with an error (0-1)")
+    parser.add_argument("--error-status", type=int, action="append",
+                        help="Status codes used for injected errors (default: 500 and 429)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Random seed for reproducible latency/error sequences")
+    args = parser.parse_args()
+
+    CONFIG["image_latency"] = args.image_latency
+    CONFIG["chat_latency"] = args.chat_latency
+    CONFIG["stream_token_delay"] = args.stream_token_delay
+    CONFIG["error_rate"] = args.error_rate
+    if args.error_status:
+        CONFIG["error_statuses"] = tuple(args.error_status)
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    print(f"[FAKE OPENAI] Listening on http://{args.host}:{args.port}/v1")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
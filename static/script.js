@@ -207,29 +207,31 @@ document.addEventListener("DOMContentLoaded", () => {
     if (!vibeButtons.length || !cardImages.length) return;
 
     // -------------------------------------------------------------------------
-    // 3.1 Build AI Prompt Based on Vibe
+    // 3.1 Pick a Design Spec per Card
     // -------------------------------------------------------------------------
     
+    // The server builds the image prompt from the spec and the vibe's style
+    const SPEC_OPTIONS = {
+        product_type: ["LIPSTICK", "MASCARA", "BLUSH", "FOUNDATION", "EYELINER",
+                       "EYESHADOW", "HIGHLIGHTER", "BRONZER", "PRIMER", "SETTING_SPRAY"],
+        formula: ["WATER", "OIL", "CREAM", "GEL", "POWDER", "SILICONE"],
+        coverage: ["SHEER", "MEDIUM", "FULL"],
+        finish: ["MATTE", "NATURAL", "DEWY", "GLOWY", "SATIN"],
+        skin_type: ["NORMAL", "OILY", "DRY", "COMBINATION", "SENSITIVE"]
+    };
+
     /**
-     * Generate AI prompt for product image based on vibe.
+     * Pick a random design spec so each card shows a different product.
      * 
-     * @param {string} vibe - Selected vibe (cute/luxury/minimal)
-     * @param {number} index - Card index for variation
-     * @returns {string} - Complete prompt for AI generation
+     * @returns {Object} - Spec for /ai/generate (packaging text comes from the vibe)
      */
-    function buildPrompt(vibe, index) {
-        const base = "High-quality product photo of 3 makeup products, studio lighting, no text, white background. ";
-        
-        if (vibe === "cute") {
-            return base + "Cute pastel kawaii style, soft pink colors. Variation #" + (index + 1);
-        }
-        
-        if (vibe === "luxury") {
-            return base + "Luxury black and gold packaging. Variation #" + (index + 1);
-        }
-        
-        // Default: minimal
-        return base + "Ultra minimal white and beige packaging. Variation #" + (index + 1);
+    function randomSpec() {
+        const spec = {};
+        Object.keys(SPEC_OPTIONS).forEach((field) => {
+            const values = SPEC_OPTIONS[field];
+            spec[field] = values[Math.floor(Math.random() * values.length)];
+        });
+        return spec;
     }
 
     // -------------------------------------------------------------------------
@@ -259,18 +261,26 @@ document.addEventListener("DOMContentLoaded", () => {
         try {
             // Generate image for each card
             for (let i = 0; i < cardImages.length; i++) {
-                const prompt = buildPrompt(vibe, i);
+                const spec = randomSpec();
                 
-                // Make API request
-                const res = await fetch("/ai/generate", {
-                    method: "POST",
-                    headers: { "Content-Type": "application/json" },
-                    body: JSON.stringify({
-                        prompt: prompt,
-                        context: "smartpicks",
-                        vibe: vibe
-                    })
-                });
+                // Make API request (waits and retries when the server answers 429)
+                let res;
+                for (let attempt = 0; ; attempt++) {
+                    res = await fetch("/ai/generate", {
+                        method: "POST",
+                        headers: { "Content-Type": "application/json" },
+                        body: JSON.stringify({
+                            spec: spec,
+                            context: "smartpicks",
+                            vibe: vibe
+                        })
+                    });
+                    if (res.status !== 429 || attempt >= 2) break;
+
+                    const wait = Math.min(parseInt(res.headers.get("Retry-After"), 10) || 5, 15);
+                    cardImages[i].innerHTML = "Busy, retrying...";
+                    await new Promise((resolve) => setTimeout(resolve, wait * 1000));
+                }
 
                 const data = await res.json().catch(() => ({}));
 